@@ -0,0 +1,349 @@
+"""
+Alert Engine for Coal Mine Safety Dashboard
+Stateful alerts driven by each tick's threshold classification
+
+Every tick the engine receives the fleet's (helmets x channels) level matrix
+from the ThresholdEngine and only does per-alert work for cells that changed:
+- a channel reaching its min_level opens an alert: WARNING by default,
+  CAUTION for oxygen (ALERT_MIN_LEVELS), which has always alarmed as soon
+  as it drops below its 19.5% safe minimum
+- level changes on an open alert update its severity and peak
+- an alert closes after clear_ticks consecutive ticks below min_level
+  (hysteresis, so a value hovering on a threshold does not flap)
+- alerts open longer than EMERGENCY_CONFIG["alert_escalation_time"] are
+  escalated, and again after every further period
+
+Alerts live in a bounded AlertStore (DASHBOARD_CONFIG["alert_retention"])
+indexed by helmet, severity and zone, so lookups such as "open critical alerts
+in Tunnel B" touch only the matching alerts.
+"""
+
+import heapq
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from config import DASHBOARD_CONFIG, EMERGENCY_CONFIG
+from threshold_engine import CAUTION, WARNING, level_name
+
+CLEAR_TICKS = 3  # consecutive ticks below min_level before an alert closes
+
+# Channels that alert below WARNING; O2 < "safe" (19.5%) is already an alarm
+ALERT_MIN_LEVELS = {"o2": CAUTION}
+
+
+def zone_keys(location):
+    """'Tunnel B-1' -> ('Tunnel B-1', 'Tunnel B'); other locations map to themselves"""
+    if "-" in location:
+        return (location, location.rsplit("-", 1)[0])
+    return (location,)
+
+
+class Alert:
+    """One alert on one helmet channel"""
+
+    __slots__ = (
+        "alert_id",
+        "helmet_id",
+        "channel",
+        "zone",
+        "level",
+        "peak_level",
+        "value",
+        "opened_at",
+        "updated_at",
+        "closed_at",
+        "escalations",
+    )
+
+    def __init__(self, alert_id, helmet_id, channel, zone, level, value, now):
+        self.alert_id = alert_id
+        self.helmet_id = helmet_id
+        self.channel = channel
+        self.zone = zone
+        self.level = level
+        self.peak_level = level
+        self.value = value
+        self.opened_at = now
+        self.updated_at = now
+        self.closed_at = None
+        self.escalations = 0
+
+    @property
+    def is_open(self):
+        return self.closed_at is None
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["severity"] = level_name(self.level)
+        data["is_open"] = self.is_open
+        return data
+
+
+class AlertStore:
+    """Bounded alert history with helmet, severity and zone indexes"""
+
+    def __init__(self, capacity=DASHBOARD_CONFIG["alert_retention"]):
+        self.capacity = capacity
+        self.alerts = OrderedDict()  # alert_id -> Alert, oldest first
+        self.closed = deque()  # closed alert ids, oldest first
+        self.open_ids = set()
+        self.by_helmet = {}
+        self.by_level = {}
+        self.by_zone = {}
+        self.evicted = 0
+
+    def _index(self, index, key, alert_id):
+        index.setdefault(key, set()).add(alert_id)
+
+    def _unindex(self, index, key, alert_id):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(alert_id)
+            if not ids:
+                del index[key]
+
+    def add(self, alert):
+        self.alerts[alert.alert_id] = alert
+        self.open_ids.add(alert.alert_id)
+        self._index(self.by_helmet, alert.helmet_id, alert.alert_id)
+        self._index(self.by_level, alert.level, alert.alert_id)
+        for key in zone_keys(alert.zone):
+            self._index(self.by_zone, key, alert.alert_id)
+
+        while len(self.alerts) > self.capacity:
+            # Closed alerts are evicted first; open ones only if nothing else is left
+            while self.closed and self.closed[0] not in self.alerts:
+                self.closed.popleft()
+            victim = self.closed[0] if self.closed else next(iter(self.alerts))
+            self.remove(victim)
+            self.evicted += 1
+
+    def set_level(self, alert, level):
+        if level != alert.level:
+            self._unindex(self.by_level, alert.level, alert.alert_id)
+            self._index(self.by_level, level, alert.alert_id)
+            alert.level = level
+            alert.peak_level = max(alert.peak_level, level)
+
+    def close(self, alert, now):
+        alert.closed_at = now
+        self.open_ids.discard(alert.alert_id)
+        self.closed.append(alert.alert_id)
+
+    def remove(self, alert_id):
+        alert = self.alerts.pop(alert_id)
+        self.open_ids.discard(alert_id)
+        if self.closed and self.closed[0] == alert_id:
+            self.closed.popleft()
+        self._unindex(self.by_helmet, alert.helmet_id, alert_id)
+        self._unindex(self.by_level, alert.level, alert_id)
+        for key in zone_keys(alert.zone):
+            self._unindex(self.by_zone, key, alert_id)
+
+    def query(self, helmet_id=None, level=None, zone=None, open_only=False):
+        """Alerts matching every given filter, newest first
+
+        Starts from the smallest matching index set, so the cost is O(k) in
+        the number of candidate alerts rather than a scan of the store.
+        """
+        candidates = []
+        if helmet_id is not None:
+            candidates.append(self.by_helmet.get(helmet_id, set()))
+        if level is not None:
+            candidates.append(self.by_level.get(level, set()))
+        if zone is not None:
+            candidates.append(self.by_zone.get(zone, set()))
+        if open_only:
+            candidates.append(self.open_ids)
+        if not candidates:
+            return list(reversed(self.alerts.values()))
+
+        candidates.sort(key=len)
+        ids = candidates[0]
+        for other in candidates[1:]:
+            ids = [alert_id for alert_id in ids if alert_id in other]
+        return sorted(
+            (self.alerts[alert_id] for alert_id in ids),
+            key=lambda alert: alert.alert_id,
+            reverse=True,
+        )
+
+    def stats(self):
+        return {
+            "stored": len(self.alerts),
+            "open": len(self.open_ids),
+            "capacity": self.capacity,
+            "evicted": self.evicted,
+        }
+
+
+class AlertEngine:
+    """Opens, updates, closes and escalates alerts from per-tick levels"""
+
+    def __init__(
+        self,
+        channels,
+        helmet_zones,
+        min_level=WARNING,
+        channel_min_levels=ALERT_MIN_LEVELS,
+        clear_ticks=CLEAR_TICKS,
+        escalation_time=EMERGENCY_CONFIG["alert_escalation_time"],
+        retention=DASHBOARD_CONFIG["alert_retention"],
+    ):
+        self.channels = list(channels)
+        self.helmet_zones = dict(helmet_zones)  # helmet_id -> location
+        # (channels,) level at which each channel opens an alert
+        self.min_levels = np.array(
+            [channel_min_levels.get(c, min_level) for c in self.channels],
+            dtype=np.int8,
+        )
+        self.clear_ticks = clear_ticks
+        self.escalation_time = escalation_time
+        self.store = AlertStore(retention)
+        self.lock = threading.Lock()
+
+        self.helmet_ids = []
+        self.helmet_rows = {}
+        self.levels = np.zeros((0, len(self.channels)), dtype=np.int8)
+        self.open_alert = np.full((0, len(self.channels)), -1, dtype=np.int64)
+        self.below_ticks = np.zeros((0, len(self.channels)), dtype=np.int16)
+        self._escalations = []  # heap of (due_time, alert_id)
+        self._next_id = 1
+        self._last_ids = None
+        self._last_rows = None
+
+        self.opened = 0
+        self.closed = 0
+        self.escalated = 0
+        self.last_update_seconds = 0.0
+
+    def _rows_for(self, helmet_ids):
+        """Row per helmet id, cached while the caller passes the same tuple"""
+        if helmet_ids is self._last_ids:
+            return self._last_rows
+        for helmet_id in helmet_ids:
+            if helmet_id not in self.helmet_rows:
+                self.helmet_rows[helmet_id] = len(self.helmet_ids)
+                self.helmet_ids.append(helmet_id)
+        grow = len(self.helmet_ids) - len(self.levels)
+        if grow > 0:
+            shape = (grow, len(self.channels))
+            self.levels = np.vstack([self.levels, np.zeros(shape, np.int8)])
+            self.open_alert = np.vstack([self.open_alert, np.full(shape, -1)])
+            self.below_ticks = np.vstack([self.below_ticks, np.zeros(shape, np.int16)])
+
+        rows = np.fromiter(
+            (self.helmet_rows[h] for h in helmet_ids),
+            dtype=np.int64,
+            count=len(helmet_ids),
+        )
+        self._last_ids, self._last_rows = helmet_ids, rows
+        return rows
+
+    def update(self, helmet_ids, levels, values=None, now=None):
+        """Consume one tick of (helmets, channels) levels; returns changed alerts"""
+        started = time.perf_counter()
+        now = time.time() if now is None else now
+        levels = np.asarray(levels, dtype=np.int8)
+
+        with self.lock:
+            rows = self._rows_for(helmet_ids)
+            previous = self.levels[rows]
+            open_alert = self.open_alert[rows]
+            below = self.below_ticks[rows]
+
+            active = levels >= self.min_levels
+            has_open = open_alert >= 0
+
+            # Hysteresis: count consecutive quiet ticks on open alerts
+            below = np.where(has_open & ~active, below + 1, 0).astype(np.int16)
+
+            to_open = np.argwhere(active & ~has_open)
+            to_update = np.argwhere(active & has_open & (levels != previous))
+            to_close = np.argwhere(has_open & (below >= self.clear_ticks))
+
+            changed = []
+            for i, c in to_open:
+                helmet_id = helmet_ids[i]
+                alert = Alert(
+                    self._next_id,
+                    helmet_id,
+                    self.channels[c],
+                    self.helmet_zones.get(helmet_id, "Unknown"),
+                    int(levels[i, c]),
+                    None if values is None else float(values[i, c]),
+                    now,
+                )
+                self._next_id += 1
+                self.store.add(alert)
+                open_alert[i, c] = alert.alert_id
+                heapq.heappush(
+                    self._escalations, (now + self.escalation_time, alert.alert_id)
+                )
+                changed.append(alert)
+            self.opened += len(to_open)
+
+            for i, c in to_update:
+                alert = self.store.alerts.get(int(open_alert[i, c]))
+                if alert is None:
+                    continue
+                self.store.set_level(alert, int(levels[i, c]))
+                if values is not None:
+                    alert.value = float(values[i, c])
+                alert.updated_at = now
+                changed.append(alert)
+
+            for i, c in to_close:
+                alert = self.store.alerts.get(int(open_alert[i, c]))
+                if alert is not None:
+                    self.store.close(alert, now)
+                    changed.append(alert)
+                open_alert[i, c] = -1
+                below[i, c] = 0
+            self.closed += len(to_close)
+
+            changed.extend(self._escalate(now))
+
+            self.levels[rows] = levels
+            self.open_alert[rows] = open_alert
+            self.below_ticks[rows] = below
+
+        self.last_update_seconds = time.perf_counter() - started
+        return changed
+
+    def _escalate(self, now):
+        escalated = []
+        while self._escalations and self._escalations[0][0] <= now:
+            _, alert_id = heapq.heappop(self._escalations)
+            alert = self.store.alerts.get(alert_id)
+            if alert is None or not alert.is_open:
+                continue
+            alert.escalations += 1
+            alert.updated_at = now
+            heapq.heappush(self._escalations, (now + self.escalation_time, alert_id))
+            escalated.append(alert)
+        self.escalated += len(escalated)
+        return escalated
+
+    def query(self, helmet_id=None, level=None, zone=None, open_only=False):
+        with self.lock:
+            return self.store.query(helmet_id, level, zone, open_only)
+
+    def open_alerts(self, helmet_id=None):
+        return self.query(helmet_id=helmet_id, open_only=True)
+
+    def stats(self):
+        with self.lock:
+            stats = self.store.stats()
+        stats.update(
+            {
+                "opened": self.opened,
+                "closed": self.closed,
+                "escalated": self.escalated,
+                "last_update_ms": round(self.last_update_seconds * 1000, 3),
+            }
+        )
+        return stats
@@ -17,14 +17,33 @@ import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime
 import pandas as pd
-import random
 import numpy as np
 import time
 import json
+import os
 import threading
-from collections import deque
 import paho.mqtt.client as mqtt
 
+from alert_engine import AlertEngine
+from columnar_archive import ArchiveWriter
+from config import DASHBOARD_CONFIG
+from db_backup import BackupScheduler
+from evacuation import EvacuationEvaluator
+from feature_extractor import FeatureExtractor
+from fleet_simulator import FleetSimulator, BASE_SENSOR_DATA
+from history_query import HistoryQuery, register_routes
+from inference import InferenceService
+from micro_batcher import MicroBatcher
+from mqtt_ingest import MqttIngestor
+from persistence import PersistenceWriter
+from risk_ensemble import RiskEnsemble
+from sensor_store import SensorStore, SENSOR_CHANNELS
+from rolling_stats import RollingStats
+from rollups import RollupScheduler
+from sensor_ticker import SensorTicker, build_snapshot, thaw_readings
+from threshold_engine import OFFLINE, SAFE, ThresholdEngine
+from threshold_engine import level_color, level_name
+
 # Initialize Dash app with custom styling
 app = dash.Dash(
     __name__,
@@ -72,8 +91,8 @@ SAMPLE_HELMETS = {
 }
 
 # Real-time data storage and simulation parameters
-DATA_BUFFER_SIZE = 100  # Store last 100 readings per helmet
-UPDATE_INTERVAL = 2000  # 2 seconds in milliseconds
+DATA_BUFFER_SIZE = DASHBOARD_CONFIG["data_buffer_size"]  # Readings kept per helmet
+UPDATE_INTERVAL = DASHBOARD_CONFIG["update_interval"]  # 2 seconds in milliseconds
 
 # MQTT Configuration for Wokwi Connection
 MQTT_BROKER = "broker.hivemq.com"  # Free MQTT broker
@@ -85,101 +104,101 @@ MQTT_PASSWORD = None  # Add if your broker requires authentication
 # MQTT Connection Status
 mqtt_connected = False
 mqtt_client = None
-last_mqtt_message_time = None
-
-# Initialize data buffers for each helmet
-real_time_data = {}
-data_timestamps = {}
-for helmet_id in SAMPLE_HELMETS.keys():
-    real_time_data[helmet_id] = {
-        "co2": deque(maxlen=DATA_BUFFER_SIZE),
-        "ch4": deque(maxlen=DATA_BUFFER_SIZE),
-        "o2": deque(maxlen=DATA_BUFFER_SIZE),
-        "h2s": deque(maxlen=DATA_BUFFER_SIZE),
-        "temp": deque(maxlen=DATA_BUFFER_SIZE),
-        "humidity": deque(maxlen=DATA_BUFFER_SIZE),
-    }
-    data_timestamps[helmet_id] = deque(maxlen=DATA_BUFFER_SIZE)
-
-# MQTT received data buffer
-mqtt_received_data = {}
-
-# Base sensor readings for simulation (will vary around these values)
-BASE_SENSOR_DATA = {
-    "HELMET_001": {
-        "co2": 420,
-        "ch4": 0.8,
-        "o2": 20.5,
-        "h2s": 3,
-        "temp": 28,
-        "humidity": 72,
-    },
-    "HELMET_002": {
-        "co2": 450,
-        "ch4": 1.2,
-        "o2": 20.1,
-        "h2s": 5,
-        "temp": 30,
-        "humidity": 75,
-    },
-    "HELMET_003": {
-        "co2": 380,
-        "ch4": 0.5,
-        "o2": 20.8,
-        "h2s": 2,
-        "temp": 26,
-        "humidity": 68,
-    },
-    "HELMET_004": {
-        "co2": 520,
-        "ch4": 1.5,
-        "o2": 19.8,
-        "h2s": 7,
-        "temp": 32,
-        "humidity": 78,
-    },
-    "HELMET_005": {
-        "co2": 410,
-        "ch4": 0.9,
-        "o2": 20.3,
-        "h2s": 4,
-        "temp": 29,
-        "humidity": 71,
-    },
-    "HELMET_006": {"co2": 0, "ch4": 0, "o2": 0, "h2s": 0, "temp": 0, "humidity": 0},
-    "HELMET_007": {
-        "co2": 395,
-        "ch4": 0.6,
-        "o2": 20.6,
-        "h2s": 3,
-        "temp": 27,
-        "humidity": 70,
-    },
-    "HELMET_008": {
-        "co2": 370,
-        "ch4": 0.4,
-        "o2": 20.9,
-        "h2s": 2,
-        "temp": 25,
-        "humidity": 65,
-    },
-}
+MQTT_DATA_MAX_AGE = 10  # seconds - MQTT data older than this falls back to simulation
 
-# Sensor variation parameters for realistic simulation
-SENSOR_VARIATION = {
-    "co2": {"noise": 15, "drift": 0.02, "spike_chance": 0.05, "spike_magnitude": 100},
-    "ch4": {"noise": 0.1, "drift": 0.001, "spike_chance": 0.03, "spike_magnitude": 0.5},
-    "o2": {"noise": 0.2, "drift": 0.001, "spike_chance": 0.02, "spike_magnitude": -1.0},
-    "h2s": {"noise": 0.5, "drift": 0.01, "spike_chance": 0.04, "spike_magnitude": 5},
-    "temp": {"noise": 1.0, "drift": 0.005, "spike_chance": 0.01, "spike_magnitude": 5},
-    "humidity": {
-        "noise": 2.0,
-        "drift": 0.01,
-        "spike_chance": 0.02,
-        "spike_magnitude": 10,
-    },
+DEBUG = True  # Dash debug mode, including Werkzeug's auto-reloader
+
+# Columnar ring buffers holding the recent history of every helmet
+sensor_store = SensorStore(
+    capacity=DATA_BUFFER_SIZE,
+    channels=SENSOR_CHANNELS,
+    helmet_ids=SAMPLE_HELMETS.keys(),
+    max_helmets=DASHBOARD_CONFIG["max_helmets"],
+)
+
+# SQLite history (WAL, batched writes on a dedicated thread)
+persistence_writer = PersistenceWriter()
+persistence_writer.attach_store(sensor_store)
+
+# Day-partitioned columnar archive of the same buffers for offline analysis
+archive_writer = ArchiveWriter(channels=sensor_store.channels)
+archive_writer.attach_store(sensor_store)
+
+# 1-minute / 1-hour rollups and retention, run as writer jobs
+rollup_scheduler = RollupScheduler(persistence_writer)
+
+# Page-stepped online backups every backup_interval, interleaved with writes
+backup_scheduler = BackupScheduler(persistence_writer)
+
+# Downsampled range queries over raw + rollup tables (/api/history)
+history_query = HistoryQuery(persistence_writer.db_path)
+register_routes(app.server, history_query)
+
+# Online EWMA / rolling window / slope statistics, updated on every append
+rolling_stats = RollingStats(sensor_store)
+
+# config.py thresholds compiled once; classifies the whole fleet per tick
+threshold_engine = ThresholdEngine(sensor_store.channels)
+
+# 128 sensor-array features per helmet, updated from MQTT "resistance" arrays;
+# helmets that do not stream the array have no features and no AI risk
+feature_extractor = FeatureExtractor(sensor_store)
+
+# Trained risk classifiers, loaded once and run on the whole fleet per tick
+inference_service = InferenceService(feature_extractor)
+
+# AI_MODEL_CONFIG weighted ensemble of those classifiers -> low..critical risk
+risk_ensemble = RiskEnsemble()
+
+
+def score_risk(features):
+    """Feature matrix -> RiskAssessment, for the micro-batcher"""
+    probabilities = inference_service.predict_proba(features)
+    return risk_ensemble.combine(probabilities) if probabilities else None
+
+
+# Helmets streaming the sensor array are scored as their features change, in
+# batches bounded by micro_batch_size / micro_batch_wait_ms, not once per tick;
+# a result older than one tick is ignored in favour of the ticker's pass
+micro_batcher = MicroBatcher(score_risk, max_age=UPDATE_INTERVAL / 1000)
+
+
+def submit_ready_features(helmet_ids):
+    """Queue helmets whose features have enough samples to be scored"""
+    ready = [h for h, ok in zip(helmet_ids, feature_extractor.ready(helmet_ids)) if ok]
+    if ready:
+        micro_batcher.submit(ready, feature_extractor.features(ready))
+
+
+feature_extractor.subscribe(submit_ready_features)
+
+# Zone of every helmet, used to index alerts and evacuation counters
+HELMET_ZONES = {
+    helmet_id: info["location"] for helmet_id, info in SAMPLE_HELMETS.items()
 }
 
+# Stateful alerts (hysteresis, escalation) fed by each tick's levels
+alert_engine = AlertEngine(sensor_store.channels, HELMET_ZONES)
+
+# Per-zone evacuation triggers from EMERGENCY_CONFIG, updated incrementally
+evacuation_evaluator = EvacuationEvaluator(
+    sensor_store.channels, HELMET_ZONES, engine=threshold_engine
+)
+
+# Bounded, batched MQTT ingestion feeding the sensor store
+mqtt_ingestor = MqttIngestor(sensor_store, feature_extractor=feature_extractor)
+
+# Batched simulation engine used when no live MQTT data is available
+SIMULATED_HELMETS = list(SAMPLE_HELMETS.keys())
+simulated_rows = sensor_store.rows_for(SIMULATED_HELMETS)
+fleet_simulator = FleetSimulator.from_helmets(
+    SIMULATED_HELMETS,
+    BASE_SENSOR_DATA,
+    offline_ids=[
+        h for h, info in SAMPLE_HELMETS.items() if info["status"] == "OFFLINE"
+    ],
+)
+
 
 # MQTT Callback Functions
 def on_mqtt_connect(client, userdata, flags, rc):
@@ -207,50 +226,24 @@ def on_mqtt_disconnect(client, userdata, rc):
 
 
 def on_mqtt_message(client, userdata, msg):
-    """Handle incoming MQTT messages from Wokwi simulator"""
-    global mqtt_received_data, last_mqtt_message_time
-
-    try:
-        # Decode the message
-        message = msg.payload.decode("utf-8")
-        print(f"📨 Received MQTT message: {message}")
-
-        # Parse JSON data from Wokwi
-        sensor_data = json.loads(message)
-
-        # Update last message time
-        last_mqtt_message_time = datetime.now()
-
-        # Expected JSON format from Wokwi:
-        # {
-        #   "helmet_id": "HELMET_001",
-        #   "co2": 450,
-        #   "ch4": 1.2,
-        #   "o2": 20.5,
-        #   "h2s": 5,
-        #   "temp": 28.5,
-        #   "humidity": 72.3,
-        #   "timestamp": "2026-02-16T10:30:00"
-        # }
-
-        helmet_id = sensor_data.get("helmet_id", "HELMET_001")
-
-        # Store the received data
-        mqtt_received_data[helmet_id] = {
-            "co2": float(sensor_data.get("co2", 0)),
-            "ch4": float(sensor_data.get("ch4", 0)),
-            "o2": float(sensor_data.get("o2", 0)),
-            "h2s": float(sensor_data.get("h2s", 0)),
-            "temp": float(sensor_data.get("temp", 0)),
-            "humidity": float(sensor_data.get("humidity", 0)),
-        }
-
-        print(f"✅ Updated data for {helmet_id}: {mqtt_received_data[helmet_id]}")
-
-    except json.JSONDecodeError:
-        print(f"❌ Failed to parse JSON from MQTT message: {message}")
-    except Exception as e:
-        print(f"❌ Error processing MQTT message: {e}")
+    """Handle incoming MQTT messages from Wokwi simulator
+
+    Runs on the paho network thread, so it only enqueues the raw payload;
+    the ingestion worker parses it and appends it to the sensor store.
+
+    Expected JSON format from Wokwi (or a JSON array of these):
+    {
+      "helmet_id": "HELMET_001",
+      "co2": 450,
+      "ch4": 1.2,
+      "o2": 20.5,
+      "h2s": 5,
+      "temp": 28.5,
+      "humidity": 72.3,
+      "timestamp": "2026-02-16T10:30:00"
+    }
+    """
+    mqtt_ingestor.submit(msg.payload)
 
 
 def setup_mqtt_client():
@@ -281,141 +274,135 @@ def setup_mqtt_client():
         return False
 
 
-def generate_realistic_sensor_reading(helmet_id, sensor_type, previous_value=None):
-    """Generate realistic sensor readings with noise, drift, and occasional spikes"""
-    base_value = BASE_SENSOR_DATA[helmet_id][sensor_type]
-    variation = SENSOR_VARIATION[sensor_type]
-
-    # If helmet is offline, return 0
-    if SAMPLE_HELMETS[helmet_id]["status"] == "OFFLINE":
-        return 0
+def update_all_sensor_data():
+    """Simulate every helmet that has no recent MQTT data"""
+    timestamp_ms = int(datetime.now().timestamp() * 1000)
 
-    # Start with base value if no previous reading
-    if previous_value is None:
-        current_value = base_value
+    # Helmets with recent MQTT data are written by the ingestion worker
+    rows = simulated_rows
+    if mqtt_connected:
+        live = mqtt_ingestor.live_mask(rows, MQTT_DATA_MAX_AGE)
     else:
-        current_value = previous_value
+        live = np.zeros(len(rows), dtype=bool)
 
-    # Add random noise
-    noise = random.gauss(0, variation["noise"])
+    # Advance the whole simulated fleet in one vectorized step
+    new_readings = fleet_simulator.step(
+        sensor_store.latest(rows), sensor_store.counts[rows] > 0
+    )
 
-    # Add gradual drift
-    drift = random.gauss(0, variation["drift"] * base_value)
+    # Store the simulated part of the fleet in one vectorized append
+    sensor_store.append_many(rows[~live], new_readings[~live], timestamp_ms)
 
-    # Occasional spikes (simulating environmental events)
-    spike = 0
-    if random.random() < variation["spike_chance"]:
-        spike = random.gauss(0, variation["spike_magnitude"])
 
-    # Calculate new value
-    new_value = current_value + noise + drift + spike
+def get_current_readings(helmet_id):
+    """Get the most recent readings for a helmet"""
+    readings = sensor_store.latest_readings(helmet_id)
+    if readings is None:
+        # Return base data if no real-time data available
+        return BASE_SENSOR_DATA[helmet_id]
 
-    # Apply sensor-specific constraints
-    if sensor_type == "co2":
-        new_value = max(200, min(2000, new_value))  # CO2 physical limits
-    elif sensor_type == "ch4":
-        new_value = max(0, min(5, new_value))  # CH4 percentage limits
-    elif sensor_type == "o2":
-        new_value = max(15, min(22, new_value))  # O2 percentage limits
-    elif sensor_type == "h2s":
-        new_value = max(0, min(50, new_value))  # H2S ppm limits
-    elif sensor_type == "temp":
-        new_value = max(15, min(50, new_value))  # Temperature limits
-    elif sensor_type == "humidity":
-        new_value = max(30, min(95, new_value))  # Humidity limits
+    return readings
 
-    return round(new_value, 2)
 
+def run_sensor_tick(tick):
+    """One ticker step: ingest/simulate, then snapshot the fleet for callbacks"""
+    update_all_sensor_data()
+    snapshot = build_snapshot(
+        tick, sensor_store, SAMPLE_HELMETS.keys(), threshold_engine
+    )
+    changed_alerts = alert_engine.update(
+        snapshot.helmet_ids, snapshot.levels, snapshot.values
+    )
+    persistence_writer.submit_alerts(changed_alerts)
+    # Only helmets whose levels moved since the last snapshot can change a zone
+    previous = sensor_ticker.snapshot
+    evacuation_evaluator.update(
+        snapshot.levels,
+        threshold_engine.level_delta(
+            snapshot.levels, previous.levels if previous else None
+        ),
+    )
+    score_tick(snapshot.helmet_ids)
+    return snapshot
 
-def update_all_sensor_data():
-    """Update sensor data for all helmets - use MQTT data if available, otherwise simulate"""
-    current_time = datetime.now()
-
-    # Check if we have recent MQTT data (within last 10 seconds)
-    using_mqtt_data = False
-    if mqtt_connected and last_mqtt_message_time:
-        time_since_last_mqtt = (current_time - last_mqtt_message_time).total_seconds()
-        using_mqtt_data = time_since_last_mqtt <= 10
-
-    for helmet_id in SAMPLE_HELMETS.keys():
-        # Use MQTT data if available and recent
-        if using_mqtt_data and helmet_id in mqtt_received_data:
-            mqtt_data = mqtt_received_data[helmet_id]
-            # Use MQTT data directly
-            for sensor_type in ["co2", "ch4", "o2", "h2s", "temp", "humidity"]:
-                new_reading = mqtt_data.get(sensor_type, 0)
-                real_time_data[helmet_id][sensor_type].append(new_reading)
-        else:
-            # Fall back to simulation
-            for sensor_type in ["co2", "ch4", "o2", "h2s", "temp", "humidity"]:
-                # Get previous value if available
-                previous_value = None
-                if len(real_time_data[helmet_id][sensor_type]) > 0:
-                    previous_value = real_time_data[helmet_id][sensor_type][-1]
-
-                # Generate new reading
-                new_reading = generate_realistic_sensor_reading(
-                    helmet_id, sensor_type, previous_value
-                )
 
-                # Store in buffer
-                real_time_data[helmet_id][sensor_type].append(new_reading)
+# Ticks whose risk scoring raised; the snapshot is published regardless
+risk_tick_failures = 0
+# Helmets scored on the last tick (live sensor-array features) and the rest
+risk_coverage = {"scored_helmets": 0, "unscored_helmets": 0}
 
-        # Store timestamp
-        data_timestamps[helmet_id].append(current_time)
 
+def score_tick(helmet_ids):
+    """Risk-score helmets streaming the sensor array; the others get no score
 
-def get_current_readings(helmet_id):
-    """Get the most recent readings for a helmet"""
-    if helmet_id not in real_time_data or len(real_time_data[helmet_id]["co2"]) == 0:
-        # Return base data if no real-time data available
-        return BASE_SENSOR_DATA[helmet_id]
+    A model failure never blocks the sensor snapshot, it only clears the risk.
+    """
+    global risk_tick_failures
+    live_ids = [
+        h for h, ready in zip(helmet_ids, feature_extractor.ready(helmet_ids)) if ready
+    ]
+    risk_coverage["scored_helmets"] = len(live_ids)
+    risk_coverage["unscored_helmets"] = len(helmet_ids) - len(live_ids)
+    assessment = None
+    try:
+        probabilities = inference_service.score(live_ids)
+        if probabilities:
+            assessment = risk_ensemble.combine(probabilities, live_ids)
+    except Exception as e:
+        risk_tick_failures += 1
+        print(f"❌ Risk scoring failed: {e}")
+    if assessment is None:
+        risk_ensemble.clear()
 
+
+@app.server.route("/api/inference/stats")
+def inference_stats():
+    """Per-model batch latency of the risk classifiers"""
     return {
-        "co2": real_time_data[helmet_id]["co2"][-1],
-        "ch4": real_time_data[helmet_id]["ch4"][-1],
-        "o2": real_time_data[helmet_id]["o2"][-1],
-        "h2s": real_time_data[helmet_id]["h2s"][-1],
-        "temp": real_time_data[helmet_id]["temp"][-1],
-        "humidity": real_time_data[helmet_id]["humidity"][-1],
+        **inference_service.stats(),
+        **risk_coverage,
+        "tick_failures": risk_tick_failures,
     }
 
 
-# Initialize with some initial data and setup MQTT
-print("🔄 Setting up MQTT connection to Wokwi simulator...")
-setup_mqtt_client()
+@app.server.route("/api/inference/batching")
+def inference_batching():
+    """Micro-batch size and queue-wait histograms for tuning"""
+    return micro_batcher.stats()
 
-for _ in range(5):  # Generate 5 initial readings
-    update_all_sensor_data()
-    time.sleep(0.1)  # Small delay between initial readings
-
-
-def get_status_color(value, thresholds):
-    """Get color based on threshold values"""
-    if value == 0:
-        return "#6c757d"  # Gray for offline
-    elif value <= thresholds["safe"]:
-        return "#28a745"  # Green - Safe
-    elif value <= thresholds["warning"]:
-        return "#ffc107"  # Yellow - Warning
-    elif value <= thresholds["danger"]:
-        return "#fd7e14"  # Orange - Danger
-    else:
-        return "#dc3545"  # Red - Critical
 
+# Background ticker that owns ingestion and simulation
+sensor_ticker = SensorTicker(run_sensor_tick, UPDATE_INTERVAL)
+
+
+def start_services():
+    """Start writers, models, MQTT and the ticker in the serving process
+
+    Called from the __main__ block, never at import: inference pool workers
+    (spawn) re-import this module as __mp_main__ and must not start anything.
+    """
+    # Initialize with some initial data and setup MQTT
+    print("🔄 Setting up MQTT connection to Wokwi simulator...")
+    persistence_writer.start()
+    rollup_scheduler.start()
+    backup_scheduler.start()
+    archive_writer.start()
+    inference_service.load()
+    micro_batcher.start()
+    mqtt_ingestor.start()
+    setup_mqtt_client()
+
+    for _ in range(5):  # Generate 5 initial readings
+        sensor_ticker.tick()
+        time.sleep(0.1)  # Small delay between initial readings
+
+    sensor_ticker.start()
 
-def create_metric_card(title, value, unit, icon, thresholds, description=""):
-    """Create a metric display card with color coding"""
-    color = get_status_color(value, thresholds)
-    status_text = "OFFLINE" if value == 0 else "NORMAL"
 
-    if value > 0:
-        if value > thresholds["danger"]:
-            status_text = "CRITICAL"
-        elif value > thresholds["warning"]:
-            status_text = "WARNING"
-        elif value > thresholds["safe"]:
-            status_text = "CAUTION"
+def create_metric_card(title, value, unit, icon, level, description=""):
+    """Create a metric display card colored by its threshold level"""
+    color = level_color(level)
+    status_text = level_name(level)
 
     return html.Div(
         [
@@ -535,14 +522,24 @@ def create_helmet_status_card(helmet_id, helmet_info, gas_data):
     )
 
 
-# Gas thresholds for color coding (based on mining safety standards)
-GAS_THRESHOLDS = {
-    "co2": {"safe": 500, "warning": 800, "danger": 1200},  # ppm
-    "ch4": {"safe": 1.0, "warning": 1.5, "danger": 2.0},  # %
-    "o2": {"safe": 19.5, "warning": 19.0, "danger": 18.5},  # % (inverted logic)
-    "h2s": {"safe": 10, "warning": 15, "danger": 20},  # ppm
-    "temp": {"safe": 30, "warning": 35, "danger": 40},  # °C
-    "humidity": {"safe": 80, "warning": 90, "danger": 95},  # %
+def card_description(trend, channel, unit):
+    """Safe band of a channel plus its rate of change over the trend window"""
+    description = threshold_engine.describe(channel, unit)
+    if not trend:
+        return description
+    rate = trend[channel]["rate_per_min"]
+    arrow = "▲" if rate > 0 else "▼" if rate < 0 else "■"
+    return f"{description} · {arrow} {abs(rate):.2f}{unit}/min"
+
+
+# Banner labels for open alerts, per channel
+ALERT_LABELS = {
+    "co2": "CO₂ Alert",
+    "ch4": "Methane Alert",
+    "o2": "Low Oxygen Alert",
+    "h2s": "H₂S Alert",
+    "temp": "Heat Alert",
+    "humidity": "Humidity Alert",
 }
 
 # App Layout
@@ -605,7 +602,11 @@ app.layout = html.Div(
                             className="fas fa-exclamation-triangle",
                             style={"fontSize": "20px", "marginRight": "10px"},
                         ),
-                        html.Span("2 WARNINGS", style={"fontWeight": "bold"}),
+                        html.Span(
+                            id="open-alerts-count",
+                            children="0 WARNINGS",
+                            style={"fontWeight": "bold"},
+                        ),
                     ],
                     style={"color": "#ffc107", "padding": "10px 20px"},
                 ),
@@ -845,30 +846,30 @@ app.layout = html.Div(
         Output("last-update-time", "children"),
         Output("mqtt-status", "children"),
         Output("mqtt-status", "style"),
+        Output("open-alerts-count", "children"),
     ],
     [Input("interval-component", "n_intervals")],
 )
 def update_live_data(n_intervals):
-    """Update sensor data every interval and show MQTT status"""
-    # Generate new sensor readings
-    update_all_sensor_data()
+    """Publish the ticker's latest snapshot and show MQTT status"""
+    # Readings are produced by the background ticker; only read them here
+    snapshot = sensor_ticker.snapshot
 
-    # Get current time
-    current_time = datetime.now().strftime("%H:%M:%S")
+    # Get snapshot time
+    current_time = snapshot.created_at.strftime("%H:%M:%S")
 
-    # Prepare data for storage
-    current_data = {}
-    for helmet_id in SAMPLE_HELMETS.keys():
-        current_data[helmet_id] = get_current_readings(helmet_id)
+    # Prepare data for storage (a JSON-ready copy of the shared snapshot)
+    current_data = thaw_readings(snapshot.readings)
 
     # Determine MQTT status
     mqtt_status_text = "MQTT: DISCONNECTED"
     mqtt_status_style = {"fontWeight": "bold", "color": "#dc3545"}  # Red
 
     if mqtt_connected:
-        if last_mqtt_message_time:
-            time_since_last = (datetime.now() - last_mqtt_message_time).total_seconds()
-            if time_since_last <= 10:
+        last_message_time = mqtt_ingestor.last_message_time
+        if last_message_time:
+            time_since_last = (datetime.now() - last_message_time).total_seconds()
+            if time_since_last <= MQTT_DATA_MAX_AGE:
                 mqtt_status_text = "WOKWI: CONNECTED"
                 mqtt_status_style = {"fontWeight": "bold", "color": "#28a745"}  # Green
             else:
@@ -883,6 +884,7 @@ def update_live_data(n_intervals):
         f"Last updated: {current_time}",
         mqtt_status_text,
         mqtt_status_style,
+        f"{len(alert_engine.open_alerts())} WARNINGS",
     )
 
 
@@ -903,16 +905,26 @@ def update_dashboard(selected_helmet, live_data):
     data = live_data.get(selected_helmet, get_current_readings(selected_helmet))
     helmet_info = SAMPLE_HELMETS.get(selected_helmet, {})
 
-    # Check for alerts
-    alerts = []
-    if data["co2"] > GAS_THRESHOLDS["co2"]["warning"]:
-        alerts.append("CO₂ Alert")
-    if data["ch4"] > GAS_THRESHOLDS["ch4"]["warning"]:
-        alerts.append("Methane Alert")
-    if data["o2"] < 19.5:
-        alerts.append("Low Oxygen Alert")
-    if data["h2s"] > GAS_THRESHOLDS["h2s"]["warning"]:
-        alerts.append("H₂S Alert")
+    # Threshold levels were computed for the whole fleet by the ticker
+    levels = data.get("levels") or threshold_engine.classify_reading(data)
+
+    # Trend over the last minute of samples, maintained incrementally
+    trend = rolling_stats.trend(selected_helmet)
+
+    # Micro-batched risk for streaming helmets, else the ticker's fleet pass
+    risk = micro_batcher.result(selected_helmet) or risk_ensemble.assessment(
+        selected_helmet
+    )
+
+    # Open alerts are tracked by the alert engine on the ticker thread
+    alerts = [
+        ALERT_LABELS.get(alert.channel, f"{alert.channel} Alert")
+        + (" (ESCALATED)" if alert.escalations else "")
+        for alert in alert_engine.open_alerts(selected_helmet)
+    ]
+    zone = helmet_info.get("location")
+    if zone in evacuation_evaluator.evacuating_zones():
+        alerts.insert(0, f"EVACUATE {zone.upper()}")
 
     # Gas Metrics Cards with real-time data
     gas_cards = html.Div(
@@ -949,32 +961,32 @@ def update_dashboard(selected_helmet, live_data):
                         data["co2"],
                         "ppm",
                         "fa-smog",
-                        GAS_THRESHOLDS["co2"],
-                        "Safe: <500ppm",
+                        levels["co2"],
+                        card_description(trend, "co2", "ppm"),
                     ),
                     create_metric_card(
                         "Methane",
                         data["ch4"],
                         "%",
                         "fa-fire",
-                        GAS_THRESHOLDS["ch4"],
-                        "Safe: <1.0%",
+                        levels["ch4"],
+                        card_description(trend, "ch4", "%"),
                     ),
                     create_metric_card(
                         "Oxygen",
                         data["o2"],
                         "%",
                         "fa-lungs",
-                        {"safe": 21, "warning": 19.5, "danger": 19.0},
-                        "Safe: >19.5%",
+                        levels["o2"],
+                        card_description(trend, "o2", "%"),
                     ),
                     create_metric_card(
                         "Hydrogen Sulfide",
                         data["h2s"],
                         "ppm",
                         "fa-skull-crossbones",
-                        GAS_THRESHOLDS["h2s"],
-                        "Safe: <10ppm",
+                        levels["h2s"],
+                        card_description(trend, "h2s", "ppm"),
                     ),
                 ],
                 style={
@@ -996,23 +1008,23 @@ def update_dashboard(selected_helmet, live_data):
                         data["temp"],
                         "°C",
                         "fa-thermometer-half",
-                        GAS_THRESHOLDS["temp"],
-                        "Safe: <30°C",
+                        levels["temp"],
+                        card_description(trend, "temp", "°C"),
                     ),
                     create_metric_card(
                         "Humidity",
                         data["humidity"],
                         "%",
                         "fa-tint",
-                        GAS_THRESHOLDS["humidity"],
-                        "Safe: <80%",
+                        levels["humidity"],
+                        card_description(trend, "humidity", "%"),
                     ),
                     create_metric_card(
                         "Helmet Status",
                         1 if helmet_info["status"] == "ACTIVE" else 0,
                         helmet_info["status"],
                         "fa-hard-hat",
-                        {"safe": 1, "warning": 1, "danger": 1},
+                        SAFE if helmet_info["status"] == "ACTIVE" else OFFLINE,
                         f"Location: {helmet_info['location']}",
                     ),
                     create_metric_card(
@@ -1020,9 +1032,33 @@ def update_dashboard(selected_helmet, live_data):
                         0,
                         helmet_info["miner"],
                         "fa-user",
-                        {"safe": 1, "warning": 1, "danger": 1},
+                        OFFLINE,
                         "Assigned Worker",
                     ),
+                    (
+                        create_metric_card(
+                            "AI Risk",
+                            round(risk["score"], 2),
+                            risk["level"].upper(),
+                            "fa-brain",
+                            risk["threshold_level"],
+                            f"Class {risk['predicted_class']} · "
+                            f"{risk['confidence']:.0%} confidence",
+                        )
+                        if risk
+                        else create_metric_card(
+                            "AI Risk",
+                            0,
+                            "N/A",
+                            "fa-brain",
+                            OFFLINE,
+                            (
+                                "Models offline"
+                                if inference_service.error
+                                else "No live sensor-array data"
+                            ),
+                        )
+                    ),
                 ],
                 style={
                     "display": "grid",
@@ -1089,4 +1125,9 @@ if __name__ == "__main__":
 }"""
     )
 
-    app.run(debug=True, host="127.0.0.1", port=8050)
+    # With debug on, Werkzeug's reloader runs this script twice: a parent
+    # that only watches files and a child (WERKZEUG_RUN_MAIN=true) that
+    # serves. Only the serving process may own the database and archive.
+    if not DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_services()
+    app.run(debug=DEBUG, host="127.0.0.1", port=8050)
@@ -0,0 +1,336 @@
+"""
+Batch Ingestion Server for the HTTP to MQTT Bridge
+asyncio HTTP endpoint that accepts many readings per request
+
+Gateways that collect many helmets POST a whole window in one round trip:
+- application/json: a JSON array of readings (or a single object)
+- application/x-ndjson: one JSON reading per line
+- application/octet-stream: concatenated binary telemetry frames
+
+Accepted readings go into a bounded asyncio queue. A publisher task coalesces
+them into batched MQTT publishes (a JSON array per message, or concatenated
+frames for binary input), so one MQTT message carries up to
+BATCH_MAX_READINGS readings instead of one.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime
+
+from telemetry_codec import FRAME_SIZE, decode_frames, is_binary_payload
+
+BATCH_MAX_READINGS = 500  # readings per MQTT publish
+BATCH_MAX_DELAY = 0.05  # seconds to wait for a publish batch to fill
+QUEUE_MAX_READINGS = 100000  # readings buffered between HTTP and MQTT
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MAX_HEADER_BYTES = 16 * 1024
+MAX_REPORTED_ERRORS = 10
+
+SENSOR_FIELDS = ("co2", "ch4", "o2", "h2s", "temp", "humidity")
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+
+def validate_reading(reading):
+    """Return an error message for an invalid reading, None if it is valid"""
+    if not isinstance(reading, dict):
+        return "reading is not a JSON object"
+    if not isinstance(reading.get("helmet_id"), str):
+        return "missing helmet_id"
+    for field in SENSOR_FIELDS:
+        value = reading.get(field, 0)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return f"{field} is not a number"
+    return None
+
+
+def parse_batch_body(body, content_type):
+    """Split a request body into (json_readings, binary_frames, rejected, errors)"""
+    errors = []
+    rejected = 0
+
+    if content_type == "application/octet-stream":
+        if not is_binary_payload(body) or len(body) % FRAME_SIZE:
+            return [], b"", 1, ["body is not a whole number of telemetry frames"]
+        try:
+            decode_frames(body)
+        except ValueError as e:
+            return [], b"", len(body) // FRAME_SIZE, [str(e)]
+        return [], body, 0, []
+
+    if content_type in ("application/x-ndjson", "application/jsonl"):
+        candidates = []
+        for line_number, line in enumerate(body.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                candidates.append(json.loads(line))
+            except ValueError:
+                rejected += 1
+                errors.append(f"line {line_number}: invalid JSON")
+    else:
+        try:
+            candidates = json.loads(body)
+        except ValueError:
+            return [], b"", 1, ["body is not valid JSON"]
+        if not isinstance(candidates, list):
+            candidates = [candidates]
+
+    readings = []
+    stamp = datetime.now().isoformat()
+    for index, reading in enumerate(candidates):
+        error = validate_reading(reading)
+        if error:
+            rejected += 1
+            errors.append(f"reading {index}: {error}")
+            continue
+        reading.setdefault("timestamp", stamp)
+        readings.append(reading)
+
+    return readings, b"", rejected, errors
+
+
+class BatchPublisher:
+    """Coalesces queued readings into batched MQTT publishes"""
+
+    def __init__(
+        self, publish, max_readings=BATCH_MAX_READINGS, max_delay=BATCH_MAX_DELAY
+    ):
+        self.publish = publish  # callable(payload: bytes) -> bool
+        self.max_readings = max_readings
+        self.max_delay = max_delay
+        self.queue = None
+
+        self.queued = 0
+        self.published_readings = 0
+        self.published_messages = 0
+        self.failed_readings = 0
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=QUEUE_MAX_READINGS)
+        return asyncio.ensure_future(self._run())
+
+    def offer(self, readings, frames):
+        """Queue JSON readings and binary frames; returns how many were accepted"""
+        accepted = 0
+        items = [("json", reading) for reading in readings]
+        items += [
+            ("binary", frames[i : i + FRAME_SIZE])
+            for i in range(0, len(frames), FRAME_SIZE)
+        ]
+        for item in items:
+            try:
+                self.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                break
+            accepted += 1
+        self.queued += accepted
+        return accepted
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_readings:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # publish() talks to paho and may block on its socket lock
+            await loop.run_in_executor(None, self._publish_batch, batch)
+
+    def _publish_batch(self, batch):
+        readings = [value for kind, value in batch if kind == "json"]
+        frames = [value for kind, value in batch if kind == "binary"]
+        if readings:
+            self._publish(json.dumps(readings).encode("utf-8"), len(readings))
+        if frames:
+            self._publish(b"".join(frames), len(frames))
+
+    def _publish(self, payload, count):
+        try:
+            ok = self.publish(payload)
+        except Exception as e:
+            print(f"❌ Batch publish failed: {e}")
+            ok = False
+        if ok:
+            self.published_messages += 1
+            self.published_readings += count
+        else:
+            self.failed_readings += count
+
+    def stats(self):
+        return {
+            "queued_readings": self.queued,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "published_readings": self.published_readings,
+            "published_messages": self.published_messages,
+            "failed_readings": self.failed_readings,
+        }
+
+
+class BatchServer:
+    """Minimal asyncio HTTP/1.1 server exposing the batch ingestion endpoint"""
+
+    def __init__(self, publisher, status=None, host="0.0.0.0", port=8052):
+        self.publisher = publisher
+        self.status = status or (lambda: {})
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.loop = None
+
+    async def serve(self):
+        self.publisher.start()
+        server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES
+        )
+        async with server:
+            await server.serve_forever()
+
+    def start_in_thread(self):
+        """Run the server on its own event loop in a daemon thread"""
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self.serve())
+
+        thread = threading.Thread(target=run, name="batch-server", daemon=True)
+        thread.start()
+        return thread
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+
+                method, path, headers = _parse_head(head)
+                if method is None:
+                    await _respond(writer, 400, {"error": "malformed request"})
+                    break
+
+                length = headers.get("content-length")
+                if method == "POST" and length is None:
+                    await _respond(writer, 411, {"error": "Content-Length required"})
+                    break
+                try:
+                    length = int(length or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await _respond(writer, 400, {"error": "invalid Content-Length"})
+                    break
+                if length > MAX_BODY_BYTES:
+                    await _respond(writer, 413, {"error": "body too large"})
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self.route(method, path, headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await _respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, headers, body):
+        path = path.split("?", 1)[0]
+        if path == "/sensor_data/batch":
+            if method != "POST":
+                return 405, {"error": "use POST"}
+            content_type = headers.get("content-type", "application/json")
+            content_type = content_type.split(";", 1)[0].strip().lower()
+            return await self.ingest(body, content_type)
+        if path == "/status":
+            status = dict(self.status())
+            status["batch_server"] = self.stats()
+            return 200, status
+        return 404, {"error": "not found"}
+
+    async def ingest(self, body, content_type):
+        """Handle one batch POST and report accepted/rejected counts"""
+        started = time.perf_counter()
+        self.requests += 1
+        # Parsing up to MAX_BODY_BYTES of JSON would stall every connection
+        # on the loop; queueing stays on the loop (asyncio.Queue)
+        loop = asyncio.get_running_loop()
+        parsed = await loop.run_in_executor(None, parse_batch_body, body, content_type)
+        readings, frames, rejected, errors = parsed
+
+        offered = len(readings) + len(frames) // FRAME_SIZE
+        accepted = self.publisher.offer(readings, frames)
+        if accepted < offered:
+            rejected += offered - accepted
+            errors.append(f"{offered - accepted} reading(s) dropped: queue full")
+
+        self.accepted += accepted
+        self.rejected += rejected
+        result = {
+            "accepted": accepted,
+            "rejected": rejected,
+            "errors": errors[:MAX_REPORTED_ERRORS],
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+        if accepted == 0 and offered > 0:
+            return 503, result
+        if accepted == 0 and rejected:
+            return 400, result
+        return 200, result
+
+    def stats(self):
+        stats = {
+            "port": self.port,
+            "requests": self.requests,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+        }
+        stats.update(self.publisher.stats())
+        return stats
+
+
+def _parse_head(head):
+    try:
+        lines = head.decode("latin-1").split("\r\n")
+        method, path, _ = lines[0].split(" ", 2)
+    except ValueError:
+        return None, None, {}
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    return method.upper(), path, headers
+
+
+async def _respond(writer, status, payload, keep_alive=False):
+    body = json.dumps(payload).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {HTTP_REASONS.get(status, 'OK')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
@@ -0,0 +1,347 @@
+"""
+Store-and-Forward Spool for the HTTP to MQTT Bridge
+Append-only, memory-mapped segment files that hold payloads while the MQTT
+broker is unreachable and replay them once it comes back
+
+On disk (SPOOL_DIR):
+- segment_00000001.spool ... fixed-size, preallocated segment files
+    header: magic b"CMSP", version, write offset, record count (16 bytes)
+    records: uint32 length + payload bytes, appended back to back
+- cursor: read position (segment number, byte offset, record index)
+
+Disk usage is bounded by max_bytes: when a new segment would exceed it the
+oldest segment is deleted and its unread records are counted as dropped.
+
+While a backlog exists the bridge spools live payloads behind it (ordering),
+so SpoolDrainer's rate follows ingress: it replays at least `rate` payloads
+per second and at least INGRESS_HEADROOM times the measured append rate, so
+the backlog always shrinks no matter how busy the bridge is.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+
+SEGMENT_MAGIC = b"CMSP"
+SEGMENT_VERSION = 1
+SEGMENT_HEADER = struct.Struct("<4sHHII")  # magic, version, reserved, offset, count
+RECORD_HEADER = struct.Struct("<I")
+CURSOR_FORMAT = struct.Struct("<QII")  # segment number, byte offset, record index
+
+INGRESS_HEADROOM = 2.0  # drain at least this multiple of the append rate
+INGRESS_WINDOW = 1.0  # seconds between append rate measurements
+
+
+class SpoolSegment:
+    """One preallocated, memory-mapped segment file"""
+
+    def __init__(self, path, number, size, create=False):
+        self.path = path
+        self.number = number
+
+        if create:
+            with open(path, "wb") as f:
+                f.truncate(size)
+        self._file = open(path, "r+b")
+        self.size = os.fstat(self._file.fileno()).st_size
+        self.map = mmap.mmap(self._file.fileno(), self.size)
+
+        if create:
+            self.write_offset, self.count = SEGMENT_HEADER.size, 0
+            self._write_header()
+        else:
+            magic, version, _, offset, count = SEGMENT_HEADER.unpack_from(self.map)
+            if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+                raise ValueError(f"not a spool segment: {path}")
+            self.write_offset, self.count = offset, count
+
+    def _write_header(self):
+        SEGMENT_HEADER.pack_into(
+            self.map,
+            0,
+            SEGMENT_MAGIC,
+            SEGMENT_VERSION,
+            0,
+            self.write_offset,
+            self.count,
+        )
+
+    def fits(self, payload):
+        return self.write_offset + RECORD_HEADER.size + len(payload) <= self.size
+
+    def append(self, payload):
+        offset = self.write_offset
+        RECORD_HEADER.pack_into(self.map, offset, len(payload))
+        start = offset + RECORD_HEADER.size
+        self.map[start : start + len(payload)] = payload
+        self.write_offset = start + len(payload)
+        self.count += 1
+        self._write_header()
+
+    def read(self, offset):
+        """Return (payload, next_offset) for the record at offset"""
+        (length,) = RECORD_HEADER.unpack_from(self.map, offset)
+        start = offset + RECORD_HEADER.size
+        return bytes(self.map[start : start + length]), start + length
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self._file.close()
+
+
+class Spool:
+    """Bounded append-only disk queue with a persistent read cursor"""
+
+    def __init__(
+        self, directory, segment_bytes=4 * 1024 * 1024, max_bytes=256 * 1024 * 1024
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max(2, max_bytes // segment_bytes)
+        self.lock = threading.Lock()
+
+        self.appended = 0
+        self.consumed = 0
+        self.dropped = 0
+        self.rejected = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.segments = {}
+        for name in sorted(os.listdir(directory)):
+            if name.startswith("segment_") and name.endswith(".spool"):
+                number = int(name[len("segment_") : -len(".spool")])
+                self.segments[number] = SpoolSegment(
+                    os.path.join(directory, name), number, segment_bytes
+                )
+        if not self.segments:
+            self._new_segment(1)
+
+        self._load_cursor()
+
+    # ------------------------------------------------------------------
+    # Files
+    # ------------------------------------------------------------------
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f"segment_{number:08d}.spool")
+
+    def _new_segment(self, number):
+        segment = SpoolSegment(
+            self._segment_path(number), number, self.segment_bytes, create=True
+        )
+        self.segments[number] = segment
+        return segment
+
+    def _load_cursor(self):
+        path = os.path.join(self.directory, "cursor")
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(CURSOR_FORMAT.pack(min(self.segments), SEGMENT_HEADER.size, 0))
+        self._cursor_file = open(path, "r+b")
+        self._cursor_map = mmap.mmap(self._cursor_file.fileno(), CURSOR_FORMAT.size)
+
+        number, offset, index = CURSOR_FORMAT.unpack_from(self._cursor_map)
+        if number not in self.segments:
+            # Cursor points at a deleted segment: resume at the oldest one
+            number, offset, index = min(self.segments), SEGMENT_HEADER.size, 0
+        self.read_segment, self.read_offset, self.read_index = number, offset, index
+        self._store_cursor()
+
+    def _store_cursor(self):
+        CURSOR_FORMAT.pack_into(
+            self._cursor_map, 0, self.read_segment, self.read_offset, self.read_index
+        )
+
+    @property
+    def write_segment(self):
+        return self.segments[max(self.segments)]
+
+    # ------------------------------------------------------------------
+    # Queue operations
+    # ------------------------------------------------------------------
+    def append(self, payload):
+        """Append one payload; False if it can never fit in a segment"""
+        with self.lock:
+            segment = self.write_segment
+            if not segment.fits(payload):
+                if SEGMENT_HEADER.size + RECORD_HEADER.size + len(payload) > (
+                    self.segment_bytes
+                ):
+                    self.rejected += 1
+                    return False
+                segment.map.flush()
+                segment = self._new_segment(segment.number + 1)
+                self._enforce_limit()
+            segment.append(payload)
+            self.appended += 1
+            return True
+
+    def _enforce_limit(self):
+        while len(self.segments) > self.max_segments:
+            oldest = self.segments.pop(min(self.segments))
+            if oldest.number == self.read_segment:
+                self.dropped += oldest.count - self.read_index
+                self.read_segment = min(self.segments)
+                self.read_offset, self.read_index = SEGMENT_HEADER.size, 0
+                self._store_cursor()
+            elif oldest.number > self.read_segment:
+                self.dropped += oldest.count
+            oldest.close()
+            os.remove(oldest.path)
+
+    def peek(self, max_records):
+        """Return up to max_records unread payloads and the cursor after them"""
+        records = []
+        with self.lock:
+            number, offset, index = self.read_segment, self.read_offset, self.read_index
+            while len(records) < max_records:
+                segment = self.segments[number]
+                if index < segment.count:
+                    payload, offset = segment.read(offset)
+                    records.append(payload)
+                    index += 1
+                elif number < self.write_segment.number:
+                    number, offset, index = number + 1, SEGMENT_HEADER.size, 0
+                else:
+                    break
+        return records, (number, offset, index)
+
+    def commit(self, position, records):
+        """Advance the read cursor past records returned by peek()"""
+        with self.lock:
+            number, offset, index = position
+            if number not in self.segments:
+                # The segment was evicted while the records were in flight
+                return
+            self.read_segment, self.read_offset, self.read_index = position
+            self.consumed += records
+            self._store_cursor()
+
+            # Fully read segments are deleted, except the one being written
+            for old in [n for n in self.segments if n < number]:
+                segment = self.segments.pop(old)
+                segment.close()
+                os.remove(segment.path)
+
+    def depth(self):
+        """Number of unread records"""
+        with self.lock:
+            return (
+                sum(
+                    segment.count
+                    for n, segment in self.segments.items()
+                    if n >= self.read_segment
+                )
+                - self.read_index
+            )
+
+    def disk_bytes(self):
+        return len(self.segments) * self.segment_bytes
+
+    def close(self):
+        with self.lock:
+            for segment in self.segments.values():
+                segment.close()
+            self._cursor_map.flush()
+            self._cursor_map.close()
+            self._cursor_file.close()
+
+    def stats(self):
+        return {
+            "depth_records": self.depth(),
+            "segments": len(self.segments),
+            "disk_bytes": self.disk_bytes(),
+            "max_disk_bytes": self.max_segments * self.segment_bytes,
+            "appended": self.appended,
+            "consumed": self.consumed,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
+
+
+class SpoolDrainer(threading.Thread):
+    """Replays spooled payloads at a bounded rate while the broker is up
+
+    The bound adapts to ingress: max(rate, INGRESS_HEADROOM * append rate).
+    """
+
+    def __init__(
+        self,
+        spool,
+        publish,
+        is_connected,
+        rate=200,
+        chunk=50,
+        headroom=INGRESS_HEADROOM,
+    ):
+        super().__init__(name="spool-drainer", daemon=True)
+        self.spool = spool
+        self.publish = publish  # callable(payload) -> bool
+        self.is_connected = is_connected  # callable() -> bool
+        self.rate = rate  # minimum payloads per second
+        self.chunk = chunk
+        self.headroom = headroom
+
+        self.drained = 0
+        self.drain_rate = 0.0  # measured payloads per second (smoothed)
+        self.ingress_rate = 0.0  # spool appends per second (smoothed)
+        self.rate_limit = rate  # current bound, see _update_rate_limit()
+        self._measured_at = time.monotonic()
+        self._measured_appended = spool.appended
+        self._stop_event = threading.Event()
+
+    def _update_rate_limit(self):
+        """Re-measure the append rate and raise the bound above it"""
+        now = time.monotonic()
+        elapsed = now - self._measured_at
+        if elapsed >= INGRESS_WINDOW:
+            appended = self.spool.appended
+            ingress = (appended - self._measured_appended) / elapsed
+            self.ingress_rate = 0.5 * self.ingress_rate + 0.5 * ingress
+            self._measured_at, self._measured_appended = now, appended
+        self.rate_limit = max(self.rate, self.headroom * self.ingress_rate)
+        return self.rate_limit
+
+    def run(self):
+        while not self._stop_event.is_set():
+            rate = self._update_rate_limit()
+            if not self.is_connected():
+                self.drain_rate = 0.0
+                self._stop_event.wait(0.5)
+                continue
+
+            started = time.monotonic()
+            records, position = self.spool.peek(self.chunk)
+            if not records:
+                self.drain_rate = 0.0
+                self._stop_event.wait(0.2)
+                continue
+
+            sent = 0
+            for payload in records:
+                if not self.publish(payload):
+                    break
+                sent += 1
+            if sent == len(records):
+                self.spool.commit(position, sent)
+            elif sent:
+                # Partial chunk: re-read and commit exactly what was sent
+                _, position = self.spool.peek(sent)
+                self.spool.commit(position, sent)
+            self.drained += sent
+
+            # Token bucket: never exceed the current rate limit
+            elapsed = time.monotonic() - started
+            budget = sent / rate if rate else 0
+            self._stop_event.wait(max(0.0, budget - elapsed))
+            window = max(time.monotonic() - started, 1e-6)
+            self.drain_rate = 0.8 * self.drain_rate + 0.2 * (sent / window)
+            if sent < len(records):
+                self._stop_event.wait(0.5)
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
@@ -0,0 +1,426 @@
+"""
+Columnar Sensor Archive for Coal Mine Safety History
+Day-partitioned, memory-mappable segment files for cold history and analysis
+
+On disk (ARCHIVE_DIR):
+    helmets.json                helmet ids; the archive stores their index
+    2026-02-16/ts.seg           int64 epoch ms
+    2026-02-16/helmet.seg       uint32 index into helmets.json
+    2026-02-16/co2.seg ...      float32, one file per channel
+
+Every segment starts with a 64-byte header followed by a flat little-endian
+array, so readers map it with numpy.memmap and slice without parsing:
+    magic b"CMCA", version, flags (bit 0: timestamps sorted), dtype ("<f4"),
+    record count, day start (ms), min ts, max ts
+Row i of every segment in a day directory belongs to the same reading.
+
+The writer is fed by a SensorStore listener (the buffers app.py keeps) and
+flushes on its own thread. Data is written before the header count is bumped
+and ts.seg is updated last, so readers never see a partial record. ts.seg's
+count is the day's record count: every column is appended at that offset,
+so a crash between header writes is overwritten by the next flush. Flushes
+hold an exclusive flock on the archive directory, so writers in different
+processes take turns instead of interleaving records.
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, a single writer is assumed
+    fcntl = None
+
+import numpy as np
+
+from sensor_store import SENSOR_CHANNELS
+
+ARCHIVE_DIR = "archive"
+FLUSH_INTERVAL = 60  # seconds between archive flushes
+
+SEGMENT_MAGIC = b"CMCA"
+SEGMENT_VERSION = 1
+SEGMENT_HEADER = struct.Struct("<4sHH8sqqqq16x")  # 64 bytes
+FLAG_SORTED = 1
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def segment_dtypes(channels):
+    dtypes = {"ts": np.dtype("<i8"), "helmet": np.dtype("<u4")}
+    dtypes.update((channel, np.dtype("<f4")) for channel in channels)
+    return dtypes
+
+
+def day_name(day_start_ms):
+    return datetime.fromtimestamp(day_start_ms / 1000, tz=timezone.utc).strftime(
+        "%Y-%m-%d"
+    )
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        raw = f.read(SEGMENT_HEADER.size)
+    magic, version, flags, dtype, count, day_start, min_ts, max_ts = (
+        SEGMENT_HEADER.unpack(raw)
+    )
+    if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+        raise ValueError(f"not an archive segment: {path}")
+    return {
+        "flags": flags,
+        "dtype": np.dtype(dtype.rstrip(b"\0").decode("ascii")),
+        "count": count,
+        "day_start": day_start,
+        "min_ts": min_ts,
+        "max_ts": max_ts,
+    }
+
+
+def _write_header(f, dtype, flags, count, day_start, min_ts, max_ts):
+    f.seek(0)
+    f.write(
+        SEGMENT_HEADER.pack(
+            SEGMENT_MAGIC,
+            SEGMENT_VERSION,
+            flags,
+            dtype.str.encode("ascii"),
+            count,
+            day_start,
+            min_ts,
+            max_ts,
+        )
+    )
+
+
+class ArchiveWriter(threading.Thread):
+    """Buffers store appends and flushes them into day segments"""
+
+    def __init__(
+        self, root=ARCHIVE_DIR, channels=SENSOR_CHANNELS, flush_interval=FLUSH_INTERVAL
+    ):
+        super().__init__(name="archive-writer", daemon=True)
+        self.root = root
+        self.channels = list(channels)
+        self.dtypes = segment_dtypes(self.channels)
+        self.flush_interval = flush_interval
+
+        os.makedirs(root, exist_ok=True)
+        self._helmets_path = os.path.join(root, "helmets.json")
+        self._load_helmets()
+
+        self._pending = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.archived = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def attach_store(self, store):
+        """Archive every sample appended to a SensorStore"""
+        if list(store.channels) != self.channels:
+            raise ValueError("store channels do not match the archive")
+
+        def on_append(rows, seqs, values, timestamps_ms):
+            # Runs under the store lock: keep a copy, write later
+            with self._lock:
+                self._pending.append(
+                    (store, rows.copy(), timestamps_ms.copy(), values.copy())
+                )
+
+        store.subscribe(on_append)
+
+    def add(self, helmet_ids, timestamps_ms, values):
+        """Queue readings that did not come through a store"""
+        with self._lock:
+            self._pending.append(
+                (None, list(helmet_ids), np.asarray(timestamps_ms), np.asarray(values))
+            )
+
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+    @contextmanager
+    def _locked(self):
+        """Exclusive flock on the archive directory for one flush"""
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.root, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # releases the lock
+
+    def _load_helmets(self):
+        """Re-read helmets.json; another writer may have registered helmets"""
+        self.helmet_ids = []
+        if os.path.exists(self._helmets_path):
+            with open(self._helmets_path) as f:
+                self.helmet_ids = json.load(f)
+        self.helmet_index = {h: i for i, h in enumerate(self.helmet_ids)}
+
+    def _helmet_codes(self, helmet_ids):
+        added = False
+        for helmet_id in helmet_ids:
+            if helmet_id not in self.helmet_index:
+                self.helmet_index[helmet_id] = len(self.helmet_ids)
+                self.helmet_ids.append(helmet_id)
+                added = True
+        if added:
+            with open(self._helmets_path + ".tmp", "w") as f:
+                json.dump(self.helmet_ids, f)
+            os.replace(self._helmets_path + ".tmp", self._helmets_path)
+        return np.fromiter(
+            (self.helmet_index[h] for h in helmet_ids),
+            dtype=np.uint32,
+            count=len(helmet_ids),
+        )
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of records"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        started = time.perf_counter()
+
+        helmet_ids, stamps, values = [], [], []
+        for store, rows, timestamps_ms, batch in pending:
+            if store is not None:
+                rows = [store.helmet_ids[row] for row in rows.tolist()]
+            helmet_ids.extend(rows)
+            stamps.append(np.broadcast_to(timestamps_ms, (len(rows),)))
+            values.append(np.asarray(batch, dtype=np.float32).reshape(len(rows), -1))
+
+        stamps = np.concatenate(stamps).astype(np.int64)
+        values = np.concatenate(values)
+        order = np.argsort(stamps, kind="stable")
+        stamps, values = stamps[order], values[order]
+
+        with self._locked():
+            self._load_helmets()
+            codes = self._helmet_codes(helmet_ids)[order]
+            days = stamps // DAY_MS
+            bounds = np.flatnonzero(np.diff(days)) + 1
+            for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(days)]):
+                columns = {"ts": stamps[start:end], "helmet": codes[start:end]}
+                columns.update(
+                    (channel, values[start:end, c])
+                    for c, channel in enumerate(self.channels)
+                )
+                self._append_day(int(days[start]) * DAY_MS, columns)
+
+        self.archived += len(stamps)
+        self.flushes += 1
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+        return len(stamps)
+
+    def _append_day(self, day_start, columns):
+        directory = os.path.join(self.root, day_name(day_start))
+        os.makedirs(directory, exist_ok=True)
+        stamps = columns["ts"]
+
+        # ts.seg's count is what readers trust; every column is appended at
+        # it, so records past it in any column (a torn write) are replaced
+        ts_path = os.path.join(directory, "ts.seg")
+        if os.path.exists(ts_path):
+            header = read_header(ts_path)
+            count, flags = header["count"], header["flags"]
+            min_ts, max_ts = header["min_ts"], header["max_ts"]
+            if count and stamps[0] < max_ts:
+                flags &= ~FLAG_SORTED  # a late batch overlaps earlier data
+        else:
+            count, flags = 0, FLAG_SORTED
+            min_ts, max_ts = int(stamps[0]), int(stamps[-1])
+        min_ts, max_ts = min(min_ts, int(stamps[0])), max(max_ts, int(stamps[-1]))
+
+        # ts.seg goes last
+        for name in sorted(columns, key=lambda name: name == "ts"):
+            dtype = self.dtypes[name]
+            path = os.path.join(directory, f"{name}.seg")
+            exists = os.path.exists(path)
+            with open(path, "r+b" if exists else "w+b") as f:
+                if not exists:
+                    _write_header(f, dtype, flags, 0, day_start, min_ts, max_ts)
+                f.seek(SEGMENT_HEADER.size + count * dtype.itemsize)
+                f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+                f.truncate()
+                f.flush()
+                _write_header(
+                    f, dtype, flags, count + len(stamps), day_start, min_ts, max_ts
+                )
+
+    def run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ Archive flush failed: {e}")
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+        self.flush()
+
+    def stats(self):
+        return {
+            "root": self.root,
+            "archived": self.archived,
+            "flushes": self.flushes,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+
+class ArchiveReader:
+    """Zero-parse range reads over the archive with numpy.memmap"""
+
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = root
+
+    def helmet_ids(self):
+        path = os.path.join(self.root, "helmets.json")
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f)
+
+    def days(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name
+            for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, "ts.seg"))
+        )
+
+    def open_segment(self, day, name):
+        """memmap of one segment, limited to the records its header covers"""
+        path = os.path.join(self.root, day, f"{name}.seg")
+        header = read_header(path)
+        if header["count"] == 0:
+            return np.empty(0, dtype=header["dtype"]), header
+        data = np.memmap(
+            path,
+            dtype=header["dtype"],
+            mode="r",
+            offset=SEGMENT_HEADER.size,
+            shape=(header["count"],),
+        )
+        return data, header
+
+    def read(self, start_ms, end_ms, channels=None, helmet_ids=None):
+        """Columns for readings with start_ms <= ts < end_ms
+
+        Returns {"ts", "helmet_id", <channel>...} as numpy arrays; channel
+        arrays are memmap slices (copied only when a helmet filter applies).
+        """
+        known = self.helmet_ids()
+        channels = list(channels or SENSOR_CHANNELS)
+        codes = None
+        if helmet_ids is not None:
+            index = {h: i for i, h in enumerate(known)}
+            codes = np.array([index[h] for h in helmet_ids if h in index], np.int64)
+
+        parts = {name: [] for name in ["ts", "helmet"] + channels}
+        first_day = start_ms // DAY_MS * DAY_MS
+        for day in self.days():
+            day_start = int(
+                datetime.strptime(day, "%Y-%m-%d")
+                .replace(tzinfo=timezone.utc)
+                .timestamp()
+                * 1000
+            )
+            if day_start < first_day or day_start >= end_ms:
+                continue
+
+            stamps, header = self.open_segment(day, "ts")
+            count = len(stamps)
+            if header["flags"] & FLAG_SORTED:
+                lo, hi = np.searchsorted(stamps, [start_ms, end_ms])
+                selection = slice(lo, hi)
+            else:
+                selection = np.flatnonzero((stamps >= start_ms) & (stamps < end_ms))
+
+            helmets, _ = self.open_segment(day, "helmet")
+            helmets = helmets[:count]
+            if codes is not None:
+                positions = np.arange(count)[selection]
+                positions = positions[np.isin(helmets[selection], codes)]
+                selection = positions
+
+            parts["ts"].append(stamps[selection])
+            parts["helmet"].append(helmets[selection])
+            for channel in channels:
+                column, _ = self.open_segment(day, channel)
+                parts[channel].append(column[:count][selection])
+
+        result = {}
+        for name, arrays in parts.items():
+            dtype = segment_dtypes(channels).get(name)
+            result[name] = np.concatenate(arrays) if arrays else np.empty(0, dtype)
+        names = np.array(known + [""], dtype=object)
+        result["helmet_id"] = names[result.pop("helmet").astype(np.int64)]
+        return result
+
+    def to_frame(self, start_ms, end_ms, channels=None, helmet_ids=None):
+        """Same as read() as a pandas DataFrame (pandas imported lazily)"""
+        import pandas as pd
+
+        data = self.read(start_ms, end_ms, channels, helmet_ids)
+        frame = pd.DataFrame(data)
+        frame["ts"] = pd.to_datetime(frame["ts"], unit="ms")
+        return frame
+
+
+def benchmark(n_helmets=100, hours=6, step_s=2, root="archive_bench"):
+    """Write a synthetic fleet and time range scans"""
+    import shutil
+
+    from sensor_store import SensorStore
+
+    shutil.rmtree(root, ignore_errors=True)
+    store = SensorStore(capacity=100, max_helmets=n_helmets)
+    rows = store.rows_for([f"HELMET_{i + 1:03d}" for i in range(n_helmets)])
+    writer = ArchiveWriter(root)
+    writer.attach_store(store)
+
+    rng = np.random.default_rng(4)
+    start = int(time.time() * 1000) - hours * 3600 * 1000
+    ticks = hours * 3600 // step_s
+    for tick in range(ticks):
+        values = rng.normal(100.0, 10.0, (n_helmets, len(store.channels)))
+        store.append_many(rows, values, start + tick * step_s * 1000)
+        if tick % 1800 == 0:
+            writer.flush()
+    writer.flush()
+    print(f"📦 Archived {writer.archived} readings ({writer.flushes} flushes)")
+
+    reader = ArchiveReader(root)
+    for label, kwargs in (
+        ("1 hour, ch4, whole fleet", {"channels": ["ch4"]}),
+        ("1 hour, all channels, 1 helmet", {"helmet_ids": ["HELMET_004"]}),
+    ):
+        timings = []
+        for _ in range(20):
+            started = time.perf_counter()
+            data = reader.read(start + 3600 * 1000, start + 7200 * 1000, **kwargs)
+            timings.append(time.perf_counter() - started)
+        print(
+            f"⏱️  {label}: {len(data['ts'])} rows in "
+            f"{np.median(timings) * 1000:.2f} ms"
+        )
+    shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    benchmark()
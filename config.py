@@ -111,14 +111,17 @@ AI_MODEL_CONFIG = {
         "svm": 0.35,  # Weight for SVM
         "naive_bayes": 0.25,  # Weight for Naive Bayes
     },
-    "risk_confidence_thresholds": {
-        "low": 0.3,
+    "risk_confidence_thresholds": {  # risk score where each level starts
         "medium": 0.6,
         "high": 0.8,
         "critical": 0.9,
     },
     "feature_count": 128,  # Number of features for AI model
     "prediction_classes": 6,  # Number of risk classes (1-6)
+    "micro_batch_size": 256,  # Max feature vectors scored together
+    "micro_batch_wait_ms": 50,  # Max time a vector waits for its batch
+    "heavy_model_backend": "process",  # "process" pool or "inline" for the forest
+    "heavy_model_workers": None,  # Pool size (None = one per CPU core)
 }
 
 # Emergency Protocol Configuration
@@ -145,6 +148,8 @@ DATABASE_CONFIG = {
     "backup_interval": 3600,  # seconds - Database backup frequency
     "data_retention_days": 90,  # days - How long to keep historical data
     "batch_insert_size": 100,  # Number of records to insert at once
+    "raw_retention_days": 7,  # days - Raw readings kept before only rollups remain
+    "rollup_interval": 60,  # seconds - How often new readings are rolled up
 }
 
 # Logging Configuration
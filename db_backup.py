@@ -0,0 +1,277 @@
+"""
+Online Database Backups for Coal Mine Safety History
+Periodic, page-stepped SQLite backups that never stall the ingestion writer
+
+A backup runs as a PersistenceWriter job, using the writer's own connection
+as the source of sqlite3's online backup API:
+- the database is copied `pages` pages per step, so each step holds the
+  writer for a few milliseconds only; the target keeps a small page cache
+  and skips fsync, so every step writes its own pages instead of the final
+  one flushing the whole copy
+- between steps the progress callback lets the writer drain its queue
+  (PersistenceWriter.interleave); because those writes go through the source
+  connection, SQLite folds them into the running backup instead of
+  restarting it, which is what happens with writes from another connection
+- the copy goes to a .tmp file that is fsynced and renamed once complete,
+  off the writer thread (finish_backup), so a crash never leaves a truncated
+  backup that looks valid
+
+Backups are rotated (newest `keep` files survive) and every run reports its
+duration, bytes, pages, steps and the longest single step. sqlite3 fixes the
+page count for a whole run, so the scheduler adapts it between runs: halved
+after a run with a step over STEP_BUDGET_MS, doubled back (up to `pages`)
+after one well under it.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from config import DATABASE_CONFIG
+
+BACKUP_DIR = os.path.join(os.path.dirname(DATABASE_CONFIG["db_path"]), "backups")
+BACKUP_KEEP = 5
+BACKUP_PAGES = 64  # pages copied per step (256 KB with 4 KB pages)
+MIN_BACKUP_PAGES = 4
+STEP_BUDGET_MS = 5.0  # longest a single step may hold the writer
+
+
+def online_backup(
+    conn, target_path, pages=BACKUP_PAGES, between_steps=None, budget_ms=STEP_BUDGET_MS
+):
+    """Copy conn's database to target_path + ".tmp" in steps; returns a report
+
+    between_steps() runs after every step (on the caller's thread) and is
+    where the writer interleaves its pending inserts. The copy is not synced
+    or renamed; pass the report to finish_backup() once off the writer.
+    """
+    steps = []
+    last = [time.perf_counter()]
+
+    def progress(status, remaining, total):
+        now = time.perf_counter()
+        steps.append(now - last[0])
+        if between_steps is not None:
+            between_steps()
+        last[0] = time.perf_counter()
+
+    started = time.perf_counter()
+    partial = target_path + ".tmp"
+    if os.path.exists(partial):
+        os.remove(partial)
+    target = sqlite3.connect(partial)
+    try:
+        # Dirty pages spill to the file as they are copied; the .tmp is
+        # fsynced by finish_backup(), not inside the last step
+        target.execute(f"PRAGMA cache_size = {max(pages, MIN_BACKUP_PAGES)}")
+        target.execute("PRAGMA synchronous = OFF")
+        conn.backup(target, pages=pages, progress=progress)
+    finally:
+        target.close()
+
+    (page_size,) = conn.execute("PRAGMA page_size").fetchone()
+    size = os.path.getsize(partial)
+    max_step_ms = round(max(steps, default=0.0) * 1000, 3)
+    return {
+        "path": target_path,
+        "partial": partial,
+        "bytes": size,
+        "pages": size // page_size,
+        "pages_per_step": pages,
+        "steps": len(steps),
+        "median_step_ms": (
+            round(sorted(steps)[len(steps) // 2] * 1000, 3) if steps else 0.0
+        ),
+        "max_step_ms": max_step_ms,
+        "over_budget": max_step_ms > budget_ms,
+        "duration_s": round(time.perf_counter() - started, 3),
+    }
+
+
+def finish_backup(report):
+    """fsync the copied .tmp file and rename it to the backup's path"""
+    started = time.perf_counter()
+    with open(report["partial"], "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(report.pop("partial"), report["path"])
+    report["sync_s"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def rotate_backups(directory, keep=BACKUP_KEEP, prefix="coal_mine_data-"):
+    """Delete all but the newest `keep` backups; returns deleted paths"""
+    backups = sorted(
+        name
+        for name in os.listdir(directory)
+        if name.startswith(prefix) and name.endswith(".db")
+    )
+    deleted = []
+    for name in backups[: max(0, len(backups) - keep)]:
+        path = os.path.join(directory, name)
+        os.remove(path)
+        deleted.append(path)
+    return deleted
+
+
+class BackupScheduler(threading.Thread):
+    """Runs an online backup every backup_interval seconds"""
+
+    def __init__(
+        self,
+        writer,
+        interval=DATABASE_CONFIG["backup_interval"],
+        directory=BACKUP_DIR,
+        keep=BACKUP_KEEP,
+        pages=BACKUP_PAGES,
+        budget_ms=STEP_BUDGET_MS,
+    ):
+        super().__init__(name="backup-scheduler", daemon=True)
+        self.writer = writer
+        self.interval = interval
+        self.directory = directory
+        self.keep = keep
+        self.max_pages = pages
+        self.pages = pages
+        self.budget_ms = budget_ms
+        self.backups = 0
+        self.failures = 0
+        self.over_budget = 0
+        self.max_step_ms = 0.0
+        self.last_report = None
+        self._stop_event = threading.Event()
+
+    def backup_now(self, timeout=None):
+        """Run one backup on the writer thread and wait for its report"""
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"coal_mine_data-{datetime.now().strftime('%Y%m%d-%H%M%S')}.db"
+        path = os.path.join(self.directory, name)
+
+        def job(conn):
+            return online_backup(
+                conn, path, self.pages, self.writer.interleave, self.budget_ms
+            )
+
+        report = finish_backup(self.writer.run_job(job, timeout))
+        report["rotated"] = rotate_backups(self.directory, self.keep)
+        self.backups += 1
+        self.last_report = report
+        self.max_step_ms = max(self.max_step_ms, report["max_step_ms"])
+        print(
+            f"💾 Backup {name}: {report['bytes'] / 1e6:.1f} MB in "
+            f"{report['duration_s']:.2f}s, longest step {report['max_step_ms']} ms"
+        )
+        self._adapt_pages(report)
+        return report
+
+    def _adapt_pages(self, report):
+        """Halve pages per step after an over-budget run, regrow when well under"""
+        if report["over_budget"]:
+            self.over_budget += 1
+            self.pages = max(MIN_BACKUP_PAGES, self.pages // 2)
+            print(
+                f"⚠️ Backup step of {report['max_step_ms']} ms exceeds "
+                f"{self.budget_ms} ms; next backup copies {self.pages} pages per step"
+            )
+        elif report["max_step_ms"] < self.budget_ms / 4:
+            self.pages = min(self.max_pages, self.pages * 2)
+
+    def run(self):
+        self.writer.wait_ready()
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.backup_now()
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ Backup failed: {e}")
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def stats(self):
+        return {
+            "backups": self.backups,
+            "failures": self.failures,
+            "pages_per_step": self.pages,
+            "step_budget_ms": self.budget_ms,
+            "max_step_ms": self.max_step_ms,
+            "over_budget": self.over_budget,
+            "last": self.last_report,
+        }
+
+
+def benchmark(prefill=500000, n_helmets=1000, db_path="database/backup_bench.db"):
+    """Back up a busy database while a write storm keeps the writer loaded"""
+    import numpy as np
+
+    from persistence import INSERT_READING, SCHEMA, PersistenceWriter, connect
+    from sensor_store import SensorStore
+
+    directory = os.path.dirname(db_path)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    rng = np.random.default_rng(6)
+    conn = connect(db_path)
+    conn.executescript(SCHEMA)
+    with conn:
+        conn.executemany(
+            INSERT_READING,
+            (
+                (f"HELMET_{i % n_helmets:05d}", i, *row)
+                for i, row in enumerate(rng.normal(100, 10, (prefill, 6)).tolist())
+            ),
+        )
+    conn.close()
+
+    store = SensorStore(capacity=100, max_helmets=n_helmets)
+    rows = store.rows_for([f"HELMET_{i:05d}" for i in range(n_helmets)])
+    writer = PersistenceWriter(db_path)
+    writer.attach_store(store)
+    writer.start()
+    writer.wait_ready()
+
+    storming = threading.Event()
+    storming.set()
+
+    def storm():
+        clock = 1_700_000_000_000
+        while storming.is_set():
+            clock += 2000
+            store.append_many(rows, rng.normal(100, 10, (n_helmets, 6)), clock)
+            time.sleep(0.1)  # ~10k readings/s
+
+    thread = threading.Thread(target=storm, daemon=True)
+    thread.start()
+    time.sleep(0.5)
+
+    scheduler = BackupScheduler(
+        writer, directory=os.path.join(directory, "backups_bench")
+    )
+    report = scheduler.backup_now()
+    scheduler.backup_now()  # second run uses the adapted page count
+    storming.clear()
+    thread.join()
+    writer.stop()
+
+    check = sqlite3.connect(report["path"])
+    (copied,) = check.execute("SELECT count(*) FROM readings").fetchone()
+    (integrity,) = check.execute("PRAGMA integrity_check").fetchone()
+    check.close()
+    print(f"📦 {report['steps']} steps, {report['pages']} pages, {copied} readings")
+    print(
+        f"⏱️  median step {report['median_step_ms']} ms, "
+        f"longest {report['max_step_ms']} ms (budget {STEP_BUDGET_MS} ms)"
+    )
+    print(f"📊 scheduler: {scheduler.stats()}")
+    print(f"🔍 integrity_check: {integrity}")
+    print(f"📊 writer during backup: {writer.stats()}")
+    return report
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,235 @@
+"""
+Streaming Evacuation Trigger Evaluator for Coal Mine Safety Dashboard
+Per-zone evaluation of EMERGENCY_CONFIG["evacuation_trigger_conditions"]
+
+Each helmet contributes a small set of trigger flags, read off the threshold
+engine's levels (every trigger is one of config.py's threshold limits):
+- methane: CH4 past methane_level
+- co: CO past co_level (only when a "co" channel is present)
+- oxygen: O2 below oxygen_level
+- warning: any channel at WARNING or worse
+
+Zones (HELMET_LOCATIONS) keep a running count of helmets per flag. Every tick
+the caller passes the rows whose levels changed (ThresholdEngine.level_delta);
+only those helmets' flags are recomputed and added to / subtracted from their
+zone's counters, so decisions cost O(changed helmets) instead of a fleet scan.
+A zone is evacuated while any hazard count is non-zero or its warning count
+reaches multiple_warnings; transitions raise EvacuationEvents.
+"""
+
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from config import EMERGENCY_CONFIG, HELMET_LOCATIONS
+from threshold_engine import WARNING, ThresholdEngine
+
+TRIGGERS = EMERGENCY_CONFIG["evacuation_trigger_conditions"]
+
+FLAG_NAMES = ("methane", "co", "oxygen", "warning")
+METHANE, CO, OXYGEN, WARNINGS = range(len(FLAG_NAMES))
+
+UNKNOWN_ZONE = "Unknown"
+
+EvacuationEvent = namedtuple(
+    "EvacuationEvent",
+    [
+        "zone",
+        "evacuate",  # True when evacuation starts, False on all clear
+        "reasons",  # tuple of trigger names that are active
+        "counts",  # {flag: helmets in the zone with that flag}
+        "timestamp",
+    ],
+)
+
+
+class EvacuationEvaluator:
+    """Incremental per-zone evacuation decisions for a helmet fleet"""
+
+    def __init__(
+        self,
+        channels,
+        helmet_zones,
+        zones=HELMET_LOCATIONS,
+        triggers=TRIGGERS,
+        event_history=500,
+        engine=None,
+    ):
+        self.channels = list(channels)
+        engine = engine or ThresholdEngine(self.channels)
+        self.zones = list(zones) + [UNKNOWN_ZONE]
+        self.zone_index = {zone: i for i, zone in enumerate(self.zones)}
+
+        self.helmet_ids = list(helmet_zones)
+        self.helmet_rows = {h: i for i, h in enumerate(self.helmet_ids)}
+        self.helmet_zone = np.array(
+            [
+                self.zone_index.get(helmet_zones[h], self.zone_index[UNKNOWN_ZONE])
+                for h in self.helmet_ids
+            ],
+            dtype=np.int64,
+        )
+
+        # (flag, channel column, level at or past which the flag is set)
+        self.level_triggers = [
+            (flag, self.channels.index(channel), engine.trigger_level(channel, value))
+            for flag, channel, value in (
+                (METHANE, "ch4", triggers["methane_level"]),
+                (CO, "co", triggers["co_level"]),
+                (OXYGEN, "o2", triggers["oxygen_level"]),
+            )
+            if channel in self.channels
+        ]
+        self.multiple_warnings = triggers["multiple_warnings"]
+
+        self.flags = np.zeros((len(self.helmet_ids), len(FLAG_NAMES)), dtype=bool)
+        self.counts = np.zeros((len(self.zones), len(FLAG_NAMES)), dtype=np.int64)
+        self.evacuating = np.zeros(len(self.zones), dtype=bool)
+        self.events = deque(maxlen=event_history)
+
+        self.last_changed = 0
+        self.last_update_seconds = 0.0
+
+    def helmet_flags(self, levels):
+        """(helmets, flags) bool matrix from (helmets, channels) threshold levels
+
+        OFFLINE (-1) is below every trigger, so a helmet without a reading never
+        counts as low oxygen.
+        """
+        flags = np.zeros((len(levels), len(FLAG_NAMES)), dtype=bool)
+        for flag, column, level in self.level_triggers:
+            flags[:, flag] = levels[:, column] >= level
+        flags[:, WARNINGS] = (levels >= WARNING).any(axis=1)
+        return flags
+
+    def update(self, levels, changed=None, rows=None, now=None):
+        """Apply one tick's levels; only `changed` rows of levels are looked at
+
+        changed indexes rows of levels (every row when None); rows maps the
+        rows of levels to helmets when levels cover a subset of the fleet.
+        Returns the EvacuationEvents raised by this tick.
+        """
+        started = time.perf_counter()
+        now = time.time() if now is None else now
+        levels = np.asarray(levels)
+        changed = np.arange(len(levels)) if changed is None else np.asarray(changed)
+        rows = changed if rows is None else np.asarray(rows)[changed]
+
+        new_flags = self.helmet_flags(levels[changed])
+        moved = (new_flags != self.flags[rows]).any(axis=1)
+        moved_rows = rows[moved]
+        self.last_changed = len(moved_rows)
+
+        events = []
+        if len(moved_rows):
+            zones = self.helmet_zone[moved_rows]
+            delta = new_flags[moved].astype(np.int64) - self.flags[moved_rows]
+            np.add.at(self.counts, zones, delta)
+            self.flags[moved_rows] = new_flags[moved]
+            events = self._evaluate(np.unique(zones), now)
+
+        self.last_update_seconds = time.perf_counter() - started
+        return events
+
+    def _evaluate(self, zones, now):
+        """Re-decide only the zones whose counters moved"""
+        counts = self.counts[zones]
+        hazard = counts[:, [METHANE, CO, OXYGEN]].any(axis=1)
+        decision = hazard | (counts[:, WARNINGS] >= self.multiple_warnings)
+
+        events = []
+        for zone, evacuate, row in zip(zones, decision, counts):
+            if evacuate == self.evacuating[zone]:
+                continue
+            self.evacuating[zone] = evacuate
+            event = EvacuationEvent(
+                self.zones[zone],
+                bool(evacuate),
+                self._reasons(row),
+                dict(zip(FLAG_NAMES, row.tolist())),
+                now,
+            )
+            self.events.append(event)
+            events.append(event)
+            if evacuate:
+                print(f"🚨 EVACUATE {event.zone}: {', '.join(event.reasons)}")
+            else:
+                print(f"✅ All clear in {event.zone}")
+        return events
+
+    def _reasons(self, row):
+        reasons = [name for name, count in zip(FLAG_NAMES[:3], row[:3]) if count]
+        if row[WARNINGS] >= self.multiple_warnings:
+            reasons.append("multiple_warnings")
+        return tuple(reasons)
+
+    def evacuating_zones(self):
+        return [self.zones[i] for i in np.flatnonzero(self.evacuating)]
+
+    def zone_status(self, zone):
+        i = self.zone_index[zone]
+        row = self.counts[i]
+        return {
+            "zone": zone,
+            "evacuate": bool(self.evacuating[i]),
+            "reasons": self._reasons(row),
+            "counts": dict(zip(FLAG_NAMES, row.tolist())),
+        }
+
+    def stats(self):
+        return {
+            "evacuating_zones": self.evacuating_zones(),
+            "events": len(self.events),
+            "last_changed_helmets": self.last_changed,
+            "last_update_ms": round(self.last_update_seconds * 1000, 3),
+        }
+
+
+def benchmark(n_helmets=10000, ticks=200, change_rate=0.02, tick_ms=2000, seed=7):
+    """Decision latency per tick for a synthetic fleet against the tick budget"""
+    from fleet_simulator import FleetSimulator
+    from threshold_engine import ThresholdEngine
+
+    rng = np.random.default_rng(seed)
+    simulator = FleetSimulator.synthetic(n_helmets, seed=seed)
+    engine = ThresholdEngine(simulator.channels)
+    helmet_zones = {
+        f"HELMET_{i:05d}": HELMET_LOCATIONS[i % len(HELMET_LOCATIONS)]
+        for i in range(n_helmets)
+    }
+    evaluator = EvacuationEvaluator(simulator.channels, helmet_zones)
+
+    values = simulator.step()
+    ch4 = simulator.channels.index("ch4")
+    previous = None
+    timings = []
+    decisions = []
+    events = 0
+    for _ in range(ticks):
+        values = simulator.step(values)
+        # Push a few helmets over the methane trigger to force zone changes
+        spikes = rng.random(n_helmets) < change_rate / 10
+        values[spikes, ch4] = TRIGGERS["methane_level"] + 0.5
+
+        started = time.perf_counter()
+        levels = engine.classify(values)
+        changed = engine.level_delta(levels, previous)
+        previous = levels
+        events += len(evaluator.update(levels, changed))
+        timings.append(time.perf_counter() - started)
+        decisions.append(evaluator.last_update_seconds)
+
+    timings = np.array(timings) * 1000
+    p50, p99 = np.percentile(timings, [50, 99])
+    decision_p99 = np.percentile(decisions, 99) * 1000
+    print(f"⛑️  {n_helmets} helmets, {len(evaluator.zones)} zones, {ticks} ticks")
+    print(f"⏱️  classify + evacuation decision: p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+    print(f"⏱️  evacuation decision alone: p99 {decision_p99:.2f} ms")
+    print(f"📊 Tick budget {tick_ms} ms, worst tick {timings.max():.2f} ms")
+    print(f"🚨 {events} zone events")
+    return {"p50_ms": p50, "p99_ms": p99, "within_tick": timings.max() < tick_ms}
+
+
+if __name__ == "__main__":
+    benchmark()
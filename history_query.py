@@ -0,0 +1,298 @@
+"""
+Historical Range Queries for Coal Mine Safety Dashboard
+Time-range, multi-helmet, multi-channel history from the SQLite store
+
+Queries use the (helmet_id, ts) index of the raw readings table and the
+(helmet_id, bucket) keys of the rollup tables; rollups.choose_table() picks
+the coarsest table that still gives the requested resolution. Downsampling
+to a target point count happens inside SQLite (GROUP BY time bucket with
+mean/min/max), so a week of data for a chart never leaves the database as
+raw rows. Large results can be streamed in chunks.
+
+Used directly from Dash callbacks (HistoryQuery.query) and over HTTP via
+register_routes():
+    GET /api/history?helmet_id=HELMET_004,HELMET_005&channels=ch4,o2
+        &start=2026-02-16T10:00&end=2026-02-16T11:30&points=300[&stream=1]
+    GET /api/history/stats
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from config import DATABASE_CONFIG
+from mqtt_ingest import parse_timestamp
+from persistence import connect
+from rollups import ROLLUP_TABLES, choose_table
+from sensor_store import SENSOR_CHANNELS
+
+DEFAULT_POINTS = 300
+MAX_POINTS = 5000
+CHUNK_ROWS = 2000
+LATENCY_SAMPLES = 1000
+
+
+def parse_time_ms(value):
+    """Epoch seconds / milliseconds (number or numeric string) or ISO -> ms"""
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+    seconds = parse_timestamp(value, None)
+    if seconds is None:
+        raise ValueError(f"invalid time: {value!r}")
+    return int(seconds * 1000)
+
+
+class HistoryQuery:
+    """Read-only history queries with downsampling and latency tracking"""
+
+    def __init__(self, db_path=DATABASE_CONFIG["db_path"]):
+        self.db_path = db_path
+        self._local = threading.local()
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.queries = 0
+
+    def _conn(self):
+        # One read-only connection per thread; WAL lets them run beside the writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.db_path, readonly=True)
+            self._local.conn = conn
+        return conn
+
+    def _sql(self, table, n_helmets, channels):
+        placeholders = ", ".join(f":h{i}" for i in range(n_helmets))
+        if table == "readings":
+            time_column = "ts"
+            aggregates = [f"avg({c}), min({c}), max({c})" for c in channels]
+        else:
+            time_column = "bucket"
+            aggregates = [
+                f"sum({c}_sum) / sum(count), min({c}_min), max({c}_max)"
+                for c in channels
+            ]
+        return (
+            f"SELECT helmet_id, :start + ((t - :start) / :step) * :step AS slot, "
+            f"{', '.join(aggregates)} "
+            f"FROM (SELECT *, {time_column} AS t FROM {table} "
+            f"WHERE helmet_id IN ({placeholders}) AND {time_column} >= :start "
+            f"AND {time_column} < :end) "
+            f"GROUP BY helmet_id, slot ORDER BY helmet_id, slot"
+        )
+
+    def _prepare(self, helmet_ids, channels, start, end, points, resolution_ms):
+        channels = list(channels or SENSOR_CHANNELS)
+        unknown = [c for c in channels if c not in SENSOR_CHANNELS]
+        if unknown:
+            raise ValueError(f"unknown channels: {', '.join(unknown)}")
+        if not helmet_ids:
+            raise ValueError("at least one helmet_id is required")
+
+        start_ms, end_ms = parse_time_ms(start), parse_time_ms(end)
+        if end_ms <= start_ms:
+            raise ValueError("end must be after start")
+        points = max(1, min(int(points or DEFAULT_POINTS), MAX_POINTS))
+
+        step = max(1, (end_ms - start_ms) // points)
+        if resolution_ms:
+            step = max(step, int(resolution_ms))
+        table = choose_table(start_ms, step)
+        step = max(step, ROLLUP_TABLES.get(table, 1))
+
+        sql = self._sql(table, len(helmet_ids), channels)
+        params = {"start": start_ms, "end": end_ms, "step": step}
+        params.update((f"h{i}", h) for i, h in enumerate(helmet_ids))
+        return channels, table, step, sql, params
+
+    def query(
+        self,
+        helmet_ids,
+        channels=None,
+        start=None,
+        end=None,
+        points=DEFAULT_POINTS,
+        resolution_ms=None,
+    ):
+        """Downsampled series per helmet
+
+        Returns {"table", "step_ms", "series": {helmet_id: {"ts": [...],
+        "<channel>": [...mean], "<channel>_min": [...], "<channel>_max": [...]}}}
+        """
+        started = time.perf_counter()
+        end = end if end is not None else time.time()
+        start = start if start is not None else parse_time_ms(end) / 1000 - 3600
+        channels, table, step, sql, params = self._prepare(
+            helmet_ids, channels, start, end, points, resolution_ms
+        )
+        rows = self._conn().execute(sql, params).fetchall()
+
+        series = {helmet_id: None for helmet_id in helmet_ids}
+        by_helmet = {}
+        for row in rows:
+            by_helmet.setdefault(row[0], []).append(row[1:])
+        for helmet_id, helmet_rows in by_helmet.items():
+            data = np.array(helmet_rows, dtype=np.float64)
+            result = {"ts": data[:, 0].astype(np.int64).tolist()}
+            for c, channel in enumerate(channels):
+                mean, low, high = data[:, 1 + 3 * c : 4 + 3 * c].T
+                result[channel] = np.round(mean, 3).tolist()
+                result[f"{channel}_min"] = np.round(low, 3).tolist()
+                result[f"{channel}_max"] = np.round(high, 3).tolist()
+            series[helmet_id] = result
+
+        self._record(started)
+        return {
+            "table": table,
+            "step_ms": step,
+            "channels": channels,
+            "series": {h: s for h, s in series.items() if s is not None},
+        }
+
+    def iter_chunks(
+        self,
+        helmet_ids,
+        channels=None,
+        start=None,
+        end=None,
+        points=MAX_POINTS,
+        resolution_ms=None,
+        chunk_rows=CHUNK_ROWS,
+    ):
+        """Yield lists of row dicts, chunk_rows at a time, for large exports"""
+        started = time.perf_counter()
+        end = end if end is not None else time.time()
+        start = start if start is not None else parse_time_ms(end) / 1000 - 3600
+        channels, table, step, sql, params = self._prepare(
+            helmet_ids, channels, start, end, points, resolution_ms
+        )
+        names = ["helmet_id", "ts"]
+        for channel in channels:
+            names += [channel, f"{channel}_min", f"{channel}_max"]
+
+        cursor = self._conn().execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield [dict(zip(names, row)) for row in rows]
+        finally:
+            cursor.close()
+            self._record(started)
+
+    def _record(self, started):
+        self.queries += 1
+        self.latencies.append(time.perf_counter() - started)
+
+    def stats(self):
+        latencies = np.array(self.latencies) * 1000
+        if not len(latencies):
+            return {"queries": self.queries}
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {
+            "queries": self.queries,
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+        }
+
+
+def register_routes(server, history):
+    """Expose a HistoryQuery on a Flask server (Dash's app.server)"""
+    from flask import Response, jsonify, request
+
+    @server.route("/api/history")
+    def api_history():
+        args = request.args
+        helmet_ids = [h for h in args.get("helmet_id", "").split(",") if h]
+        channels = [c for c in args.get("channels", "").split(",") if c] or None
+        params = {
+            "helmet_ids": helmet_ids,
+            "channels": channels,
+            "start": args.get("start"),
+            "end": args.get("end"),
+            "points": args.get("points", DEFAULT_POINTS, type=int),
+            "resolution_ms": args.get("resolution_ms", type=int),
+        }
+        try:
+            if args.get("stream"):
+                chunks = history.iter_chunks(**params)
+                first = next(chunks, [])  # surface bad parameters as a 400
+
+                def generate():
+                    for chunk in [first] if first else []:
+                        yield "".join(json.dumps(row) + "\n" for row in chunk)
+                    for chunk in chunks:
+                        yield "".join(json.dumps(row) + "\n" for row in chunk)
+
+                return Response(generate(), mimetype="application/x-ndjson")
+            return jsonify(history.query(**params))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except sqlite3.Error as e:
+            # No database or no rollups yet
+            return jsonify({"error": f"history unavailable: {e}"}), 503
+
+    @server.route("/api/history/stats")
+    def api_history_stats():
+        return jsonify(history.stats())
+
+
+def benchmark(n_helmets=8, days=8, step_s=2, db_path="database/history_bench.db"):
+    """p50/p95 latency for typical dashboard ranges"""
+    import os
+
+    from persistence import INSERT_READING, SCHEMA
+    from rollups import DAY_MS, rollup
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    conn = connect(db_path)
+    conn.executescript(SCHEMA)
+    rng = np.random.default_rng(8)
+    now_ms = int(time.time() * 1000)
+    stamps = np.arange(now_ms - days * DAY_MS, now_ms, step_s * 1000).tolist()
+    helmet_ids = [f"HELMET_{i + 1:03d}" for i in range(n_helmets)]
+    for helmet_id in helmet_ids:
+        values = rng.normal(100.0, 10.0, (len(stamps), len(SENSOR_CHANNELS)))
+        with conn:
+            conn.executemany(
+                INSERT_READING,
+                ((helmet_id, ts, *row) for ts, row in zip(stamps, values.tolist())),
+            )
+    rollup(conn)
+    conn.close()
+    print(f"📦 {len(stamps) * n_helmets} readings over {days} days")
+
+    history = HistoryQuery(db_path)
+    ranges = {
+        "15 min": 15 * 60,
+        "1 hour": 3600,
+        "6 hours": 6 * 3600,
+        "24 hours": 24 * 3600,
+        "7 days": 7 * 24 * 3600,
+    }
+    for label, seconds in ranges.items():
+        history.latencies.clear()
+        for _ in range(30):
+            end = now_ms / 1000 - rng.uniform(0, 3600)
+            result = history.query(
+                helmet_ids[:2], ["ch4", "o2"], end - seconds, end, points=300
+            )
+        stats = history.stats()
+        points = len(next(iter(result["series"].values()))["ts"])
+        print(
+            f"⏱️  {label:>8}: {result['table']:<12} {points:>4} points, "
+            f"p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -12,12 +12,23 @@ from flask import Flask, request, jsonify
 import paho.mqtt.client as mqtt
 from datetime import datetime
 
+from bridge_batch_server import BatchPublisher, BatchServer
+from bridge_spool import Spool, SpoolDrainer
+from telemetry_codec import FRAME_SIZE, decode_frames, is_binary_payload
+
 # Configuration
 HTTP_PORT = 8051  # Port for HTTP server (different from dashboard)
+HTTP_BATCH_PORT = 8052  # Port for the asyncio batch ingestion server
 MQTT_BROKER = "broker.hivemq.com"
 MQTT_PORT = 1883
 MQTT_TOPIC = "wokwi/coalmine/sensors"
 
+# Store-and-forward spool used while the broker is unreachable
+SPOOL_DIR = "spool"
+SPOOL_SEGMENT_BYTES = 4 * 1024 * 1024  # bytes per memory-mapped segment file
+SPOOL_MAX_BYTES = 256 * 1024 * 1024  # total disk budget; oldest segments dropped
+SPOOL_DRAIN_RATE = 200  # minimum replay rate; rises above the ingress rate
+
 # Initialize Flask app
 app = Flask(__name__)
 
@@ -25,6 +36,10 @@ app = Flask(__name__)
 mqtt_client = None
 mqtt_connected = False
 
+# Spool and its drainer (created in setup_spool)
+spool = None
+spool_drainer = None
+
 
 def setup_mqtt():
     """Setup MQTT client for forwarding data"""
@@ -57,10 +72,50 @@ def setup_mqtt():
         return False
 
 
+def publish_to_mqtt(payload):
+    """Publish a raw payload to the sensor topic; False if it was not sent"""
+    if not (mqtt_connected and mqtt_client):
+        return False
+    return mqtt_client.publish(MQTT_TOPIC, payload).rc == 0
+
+
+def setup_spool():
+    """Open the on-disk spool and start draining it whenever MQTT is up"""
+    global spool, spool_drainer
+
+    spool = Spool(SPOOL_DIR, SPOOL_SEGMENT_BYTES, SPOOL_MAX_BYTES)
+    spool_drainer = SpoolDrainer(
+        spool, publish_to_mqtt, lambda: mqtt_connected, rate=SPOOL_DRAIN_RATE
+    )
+    spool_drainer.start()
+    depth = spool.depth()
+    if depth:
+        print(f"📼 Spool holds {depth} payload(s) to replay")
+
+
+def forward_payload(payload):
+    """Publish a payload, spooling it while the broker is down
+
+    While a backlog is draining, live payloads are spooled behind it so the
+    broker receives readings in order. Returns "forwarded", "spooled" or
+    "dropped".
+    """
+    if spool is None or spool.depth() == 0:
+        if publish_to_mqtt(payload):
+            return "forwarded"
+    if spool is not None and spool.append(payload):
+        return "spooled"
+    return "dropped"
+
+
 @app.route("/sensor_data", methods=["POST"])
 def receive_sensor_data():
     """Receive sensor data from Wokwi via HTTP POST"""
     try:
+        # Binary telemetry frames are forwarded untouched
+        if request.mimetype == "application/octet-stream":
+            return forward_binary_frames(request.get_data())
+
         # Get JSON data from request
         sensor_data = request.get_json()
 
@@ -73,17 +128,20 @@ def receive_sensor_data():
         if "timestamp" not in sensor_data:
             sensor_data["timestamp"] = datetime.now().isoformat()
 
-        # Forward to MQTT if connected
-        if mqtt_connected and mqtt_client:
-            json_string = json.dumps(sensor_data)
-            result = mqtt_client.publish(MQTT_TOPIC, json_string)
-
-            if result.rc == 0:
-                print(f"✅ Forwarded to MQTT: {sensor_data['helmet_id']}")
-                return jsonify({"status": "success", "forwarded_to_mqtt": True}), 200
-            else:
-                print(f"❌ Failed to forward to MQTT")
-                return jsonify({"status": "error", "mqtt_error": True}), 500
+        # Forward to MQTT, or spool until the broker is reachable again
+        outcome = forward_payload(json.dumps(sensor_data).encode("utf-8"))
+
+        if outcome == "forwarded":
+            print(f"✅ Forwarded to MQTT: {sensor_data.get('helmet_id')}")
+            return jsonify({"status": "success", "forwarded_to_mqtt": True}), 200
+        elif outcome == "spooled":
+            print(f"📼 MQTT unavailable, spooled: {sensor_data.get('helmet_id')}")
+            return (
+                jsonify(
+                    {"status": "spooled", "forwarded_to_mqtt": False, "spooled": True}
+                ),
+                200,
+            )
         else:
             print(f"⚠️ MQTT not connected, data received but not forwarded")
             return jsonify({"status": "received", "forwarded_to_mqtt": False}), 200
@@ -93,18 +151,76 @@ def receive_sensor_data():
         return jsonify({"error": str(e)}), 500
 
 
+def forward_binary_frames(payload):
+    """Validate binary telemetry frames and publish them as one MQTT message"""
+    if not is_binary_payload(payload):
+        return jsonify({"error": "Not a binary telemetry payload"}), 400
+    try:
+        decode_frames(payload)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    frames = len(payload) // FRAME_SIZE
+    outcome = forward_payload(payload)
+    if outcome == "forwarded":
+        print(f"✅ Forwarded {frames} binary frame(s) to MQTT")
+    elif outcome == "spooled":
+        print(f"📼 MQTT unavailable, spooled {frames} binary frame(s)")
+    else:
+        print(f"⚠️ MQTT not connected, {frames} binary frame(s) not forwarded")
+
+    return (
+        jsonify(
+            {
+                "status": "success" if outcome == "forwarded" else outcome,
+                "frames": frames,
+                "forwarded_to_mqtt": outcome == "forwarded",
+                "spooled": outcome == "spooled",
+            }
+        ),
+        200,
+    )
+
+
+def bridge_status():
+    """Status fields shared by the Flask and batch servers"""
+    return {
+        "bridge_status": "running",
+        "mqtt_connected": mqtt_connected,
+        "mqtt_broker": MQTT_BROKER,
+        "mqtt_topic": MQTT_TOPIC,
+        "timestamp": datetime.now().isoformat(),
+        "spool": spool_status(),
+    }
+
+
+def spool_status():
+    """Spool depth, disk usage and drain rate for /status"""
+    if spool is None:
+        return {"enabled": False}
+    status = spool.stats()
+    status["enabled"] = True
+    status["drain_rate_limit"] = round(spool_drainer.rate_limit, 1)
+    status["ingress_rate"] = round(spool_drainer.ingress_rate, 1)
+    status["drain_rate"] = round(spool_drainer.drain_rate, 1)
+    status["drained"] = spool_drainer.drained
+    return status
+
+
+# asyncio batch endpoint: many readings per request, batched MQTT publishes
+batch_server = BatchServer(
+    BatchPublisher(lambda payload: forward_payload(payload) != "dropped"),
+    status=bridge_status,
+    port=HTTP_BATCH_PORT,
+)
+
+
 @app.route("/status", methods=["GET"])
 def get_status():
     """Get bridge status"""
-    return jsonify(
-        {
-            "bridge_status": "running",
-            "mqtt_connected": mqtt_connected,
-            "mqtt_broker": MQTT_BROKER,
-            "mqtt_topic": MQTT_TOPIC,
-            "timestamp": datetime.now().isoformat(),
-        }
-    )
+    status = bridge_status()
+    status["batch_server"] = batch_server.stats()
+    return jsonify(status)
 
 
 @app.route("/test", methods=["POST"])
@@ -130,8 +246,12 @@ def main():
     print(f"📡 MQTT Broker: {MQTT_BROKER}:{MQTT_PORT}")
     print(f"📋 MQTT Topic: {MQTT_TOPIC}")
     print(f"🌐 HTTP Server: http://localhost:{HTTP_PORT}")
+    print(f"📦 Batch Server: http://localhost:{HTTP_BATCH_PORT}")
     print("=" * 60)
 
+    # Open the spool before MQTT so nothing is lost while connecting
+    setup_spool()
+
     # Setup MQTT connection
     print("🔄 Connecting to MQTT broker...")
     if setup_mqtt():
@@ -141,8 +261,13 @@ def main():
 
     print("\n📡 Bridge Endpoints:")
     print(f"  POST http://localhost:{HTTP_PORT}/sensor_data - Send sensor data")
+    print("       (application/json or application/octet-stream telemetry frames)")
     print(f"  GET  http://localhost:{HTTP_PORT}/status - Check bridge status")
     print(f"  POST http://localhost:{HTTP_PORT}/test - Test endpoint")
+    print(
+        f"  POST http://localhost:{HTTP_BATCH_PORT}/sensor_data/batch"
+        " - Send many readings (JSON array, NDJSON or binary frames)"
+    )
 
     print("\n🚀 Bridge is running...")
     print("💡 Update your Wokwi code to send POST requests to:")
@@ -150,13 +275,17 @@ def main():
     print("\nPress Ctrl+C to stop")
 
     try:
-        # Start Flask in main thread
+        # Batch server runs its own event loop; Flask stays in main thread
+        batch_server.start_in_thread()
         run_flask_app()
     except KeyboardInterrupt:
         print("\n🛑 Stopping bridge...")
         if mqtt_client:
             mqtt_client.loop_stop()
             mqtt_client.disconnect()
+        if spool:
+            spool_drainer.stop(timeout=2)
+            spool.close()
         print("✅ Bridge stopped")
 
 
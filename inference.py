@@ -0,0 +1,331 @@
+"""
+Model Serving for Coal Mine Safety Dashboard
+Loads the trained classifiers once and scores the whole fleet per tick
+
+Artifacts come from `model results/` (see training/):
+- coal_mine_svm_linear_svm_model.pkl + coal_mine_svm_standardscaler.pkl
+- coal_mine_multinomial_nb_model.pkl + coal_mine_minmax_scaler.pkl
+- coal_mine_rf_model.pkl (optional, not shipped with the repo); served by
+  an inference_backends backend, by default a pool of worker processes
+- *_feature_names.pkl, the column order every model was trained on
+
+When the converted artifacts exist (model_artifacts.py, model results/
+artifacts/v1) they are memory-mapped instead and neither pickle nor
+scikit-learn is touched; otherwise, or when a pickle no longer matches the
+hash the artifacts were converted from, the pickles are loaded and folded.
+
+Loading is lazy and happens once, on the first score() (or an explicit
+load()). Every artifact is validated against the feature-name lists and
+AI_MODEL_CONFIG before it is used. Each tick the fleet's feature matrix is
+scored with one batched call per model, so the cost per helmet is a row of
+a matrix product, not a Python call.
+
+The linear SVM was trained with probability=False; its probabilities are a
+softmax over the one-vs-rest decision function. Both scalers are folded into
+their models at load time (svm_primal.PrimalSVM, nb_fused.FusedNB).
+"""
+
+import glob
+import os
+import threading
+import time
+import warnings
+from collections import deque
+
+import numpy as np
+
+from config import AI_MODEL_CONFIG
+from inference_backends import make_backend
+from model_artifacts import (
+    ARTIFACT_DIR,
+    MANIFEST,
+    load_manifest,
+    load_models,
+    stale_sources,
+)
+from nb_fused import FusedNB
+from svm_primal import PrimalSVM
+
+MODEL_DIR = "model results"
+DATASET_DIR = "dataset"
+LATENCY_SAMPLES = 1000
+
+ARTIFACTS = {
+    "feature_names": "feature_names.pkl",
+    "svm_feature_names": "coal_mine_svm_feature_names.pkl",
+    "nb_feature_names": "coal_mine_nb_feature_names.pkl",
+    "svm": "coal_mine_svm_linear_svm_model.pkl",
+    "svm_scaler": "coal_mine_svm_standardscaler.pkl",
+    "naive_bayes": "coal_mine_multinomial_nb_model.pkl",
+    "nb_scaler": "coal_mine_minmax_scaler.pkl",
+}
+OPTIONAL_ARTIFACTS = {"random_forest": "coal_mine_rf_model.pkl"}
+
+# Model name (as in AI_MODEL_CONFIG["ensemble_weights"]) -> scaler artifact
+MODEL_SCALERS = {"svm": "svm_scaler", "naive_bayes": "nb_scaler", "random_forest": None}
+
+
+def softmax(scores):
+    scores = scores - scores.max(axis=1, keepdims=True)
+    np.exp(scores, out=scores)
+    scores /= scores.sum(axis=1, keepdims=True)
+    return scores
+
+
+def load_artifacts(model_dir=MODEL_DIR, optional=True):
+    """Unpickle every artifact in model_dir; missing optional ones are skipped"""
+    import joblib
+
+    artifacts = {}
+    with warnings.catch_warnings():
+        # Pickles from a nearby scikit-learn release load fine; validation
+        # below catches anything that actually changed shape
+        warnings.simplefilter("ignore")
+        names = {**ARTIFACTS, **OPTIONAL_ARTIFACTS} if optional else ARTIFACTS
+        for name, filename in names.items():
+            path = os.path.join(model_dir, filename)
+            if name in OPTIONAL_ARTIFACTS and not os.path.exists(path):
+                continue
+            artifacts[name] = joblib.load(path)
+    return artifacts
+
+
+def validate_model(model_name, model, n_features, config=AI_MODEL_CONFIG):
+    """Raise ValueError unless a fitted model matches the feature count and classes"""
+    if model.n_features_in_ != n_features:
+        raise ValueError(
+            f"{model_name} expects {model.n_features_in_} features, not {n_features}"
+        )
+    classes = list(range(1, config["prediction_classes"] + 1))
+    if list(model.classes_) != classes:
+        raise ValueError(f"{model_name} classes {list(model.classes_)}")
+
+
+def validate_artifacts(artifacts, config=AI_MODEL_CONFIG):
+    """Raise ValueError unless every model agrees on features and classes"""
+    feature_names = list(artifacts["feature_names"])
+    if len(feature_names) != config["feature_count"]:
+        raise ValueError(
+            f"expected {config['feature_count']} features, "
+            f"feature_names.pkl has {len(feature_names)}"
+        )
+    for name in ("svm_feature_names", "nb_feature_names"):
+        if list(artifacts[name]) != feature_names:
+            raise ValueError(f"{ARTIFACTS[name]} does not match feature_names.pkl")
+
+    for model_name, scaler_name in MODEL_SCALERS.items():
+        if model_name not in artifacts:
+            continue
+        validate_model(model_name, artifacts[model_name], len(feature_names), config)
+        if scaler_name is None:
+            continue
+        scaler = artifacts[scaler_name]
+        fitted = list(getattr(scaler, "feature_names_in_", feature_names))
+        if fitted != feature_names:
+            raise ValueError(f"{ARTIFACTS[scaler_name]} column order differs")
+
+
+class InferenceService:
+    """Batched risk-class probabilities for the fleet, one call per model
+
+    feature_source(helmet_ids) returns the (helmets, feature_count) float
+    matrix to score, rows in helmet_ids order.
+    """
+
+    def __init__(self, feature_source, model_dir=MODEL_DIR, artifact_dir=ARTIFACT_DIR):
+        self.feature_source = feature_source
+        self.model_dir = model_dir
+        self.artifact_dir = artifact_dir
+        self.models = {}
+        self.classes = None
+        self.error = None
+        self.latest = None
+        self.batches = 0
+        self.latencies = {}
+        self.failures = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load and validate artifacts once; returns True when models are usable"""
+        with self._lock:
+            if self._loaded:
+                return self.error is None
+            self._loaded = True
+            started = time.perf_counter()
+            try:
+                self.models, source = self._load_models()
+            except Exception as e:
+                self.error = str(e)
+                print(f"❌ Failed to load risk models: {e}")
+                return False
+
+            for model_name in self.models:
+                self.latencies[model_name] = deque(maxlen=LATENCY_SAMPLES)
+                self.failures[model_name] = 0
+            self.classes = self.models["svm"].classes
+            print(
+                f"🧠 Loaded risk models {', '.join(self.models)} from {source} in "
+                f"{(time.perf_counter() - started) * 1000:.0f} ms"
+            )
+            return True
+
+    def _load_models(self):
+        """Memory-mapped artifacts when converted and current, else fold the pickles"""
+        use_artifacts = os.path.exists(os.path.join(self.artifact_dir, MANIFEST))
+        if use_artifacts:
+            stale = stale_sources(load_manifest(self.artifact_dir), self.model_dir)
+            if stale:
+                print(
+                    f"⚠️ {self.artifact_dir} predates {', '.join(stale)}; folding "
+                    "the pickles (run python model_artifacts.py convert)"
+                )
+                use_artifacts = False
+        if use_artifacts:
+            models, _ = load_models(self.artifact_dir)
+            source = "artifacts"
+        else:
+            # Each scaler folds into its model, so a batch is one matrix
+            # product per model on raw features
+            artifacts = load_artifacts(self.model_dir, optional=False)
+            validate_artifacts(artifacts)
+            models = {
+                "svm": PrimalSVM.fold(artifacts["svm"], artifacts["svm_scaler"]),
+                "naive_bayes": FusedNB.fold(
+                    artifacts["naive_bayes"], artifacts["nb_scaler"]
+                ),
+            }
+            source = "pickles"
+
+        # The forest is GIL-bound; its backend keeps it off the dashboard threads
+        forest_path = os.path.join(self.model_dir, OPTIONAL_ARTIFACTS["random_forest"])
+        if os.path.exists(forest_path):
+            forest = make_backend(forest_path)
+            try:
+                validate_model(
+                    "random_forest", forest, AI_MODEL_CONFIG["feature_count"]
+                )
+            except ValueError:
+                forest.close()
+                raise
+            models["random_forest"] = forest
+        return models, source
+
+    def predict_proba(self, features):
+        """{model_name: (helmets, classes) probabilities} for a feature matrix"""
+        if not self.load():
+            return None
+        features = np.asarray(features)
+        if features.dtype != np.float32:
+            # float32 store views are scored as they are
+            features = features.astype(np.float64, copy=False)
+        probabilities = {}
+        for model_name, model in self.models.items():
+            started = time.perf_counter()
+            try:
+                if model_name == "svm":
+                    proba = softmax(model.decision_function(features))
+                else:
+                    proba = model.predict_proba(features)
+            except Exception as e:
+                # A failing member (e.g. a worker error in the forest's pool)
+                # drops out of this batch; the ensemble renormalizes weights
+                self.failures[model_name] += 1
+                print(f"❌ {model_name} scoring failed: {e}")
+                continue
+            self.latencies[model_name].append(time.perf_counter() - started)
+            probabilities[model_name] = proba
+        self.batches += 1
+        return probabilities or None
+
+    def score(self, helmet_ids):
+        """Score helmet_ids with features from feature_source; keeps the result"""
+        helmet_ids = tuple(helmet_ids)
+        if not helmet_ids or not self.load():
+            return None
+        probabilities = self.predict_proba(self.feature_source(helmet_ids))
+        self.latest = {"helmet_ids": helmet_ids, "probabilities": probabilities}
+        return probabilities
+
+    def stats(self):
+        stats = {
+            "batches": self.batches,
+            "models": list(self.models),
+            "failures": dict(self.failures),
+        }
+        if self.error is not None:
+            stats["error"] = self.error
+        for model_name, latencies in self.latencies.items():
+            if latencies:
+                p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+                stats[f"{model_name}_ms"] = {
+                    "p50": round(float(p50), 3),
+                    "p95": round(float(p95), 3),
+                    "p99": round(float(p99), 3),
+                }
+        return stats
+
+
+class DatasetReplay:
+    """Feature source that replays sensor-array rows from dataset/batch*.csv
+
+    Stands in for live features until helmets stream the 128-value sensor
+    array: every helmet walks through the recordings from its own offset.
+    """
+
+    def __init__(self, dataset_dir=DATASET_DIR, seed=0):
+        paths = sorted(glob.glob(os.path.join(dataset_dir, "batch*.csv")))
+        if not paths:
+            raise FileNotFoundError(f"no batch*.csv files in {dataset_dir}")
+        self.features = np.concatenate(
+            [np.loadtxt(path, delimiter=",", skiprows=1)[:, 1:] for path in paths]
+        )
+        self.rng = np.random.default_rng(seed)
+        self.cursors = {}
+
+    def __call__(self, helmet_ids):
+        n_rows = len(self.features)
+        cursors = np.fromiter(
+            (
+                self.cursors.setdefault(h, int(self.rng.integers(n_rows)))
+                for h in helmet_ids
+            ),
+            dtype=np.int64,
+            count=len(helmet_ids),
+        )
+        features = self.features[cursors % n_rows]
+        self.cursors.update(zip(helmet_ids, ((cursors + 1) % n_rows).tolist()))
+        return features
+
+
+def benchmark(sizes=(10, 100, 1000, 10000), repeats=20):
+    """Per-batch latency of each model as the fleet grows"""
+    replay = DatasetReplay()
+    service = InferenceService(replay)
+    service.load()
+
+    # Batched probabilities must agree with each model's own predict()
+    sample = replay.features[:2000]
+    probabilities = service.predict_proba(sample)
+    for name, model in service.models.items():
+        predicted = model.predict(sample)
+        agree = np.mean(
+            service.classes[probabilities[name].argmax(axis=1)] == predicted
+        )
+        print(f"🔍 {name}: argmax agrees with predict() on {agree:.1%} of rows")
+
+    for n_helmets in sizes:
+        helmet_ids = [f"HELMET_{i:05d}" for i in range(n_helmets)]
+        for latencies in service.latencies.values():
+            latencies.clear()
+        for _ in range(repeats):
+            service.score(helmet_ids)
+        stats = service.stats()
+        timings = ", ".join(
+            f"{name} p50 {stats[name + '_ms']['p50']:.2f} ms" for name in service.models
+        )
+        print(f"⏱️  {n_helmets:>6} helmets: {timings}")
+
+
+if __name__ == "__main__":
+    benchmark()
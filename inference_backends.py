@@ -0,0 +1,279 @@
+"""
+Inference Backends for Coal Mine Risk Inference
+Where heavy models run: in-process, or in a persistent pool of processes
+
+The linear models score a fleet in a few milliseconds, but a random forest
+(100 trees, depth 20, see training/) is GIL-bound and far heavier; running
+it on a dashboard thread stalls every Dash callback. Backends expose the
+same predict_proba() / classes_ / n_features_in_ as a fitted estimator, so
+InferenceService treats them like any other member model:
+
+- InlineBackend      loads the pickle and calls it on the calling thread
+- ProcessPoolBackend keeps a ProcessPoolExecutor whose workers load the
+                     model once (initializer); a batch is split into one
+                     slice per worker, features and probabilities travel
+                     through shared memory and only offsets are pickled;
+                     if the pool breaks (a worker dies) the backend falls
+                     back to scoring in-process instead of failing forever
+
+make_backend() picks one from AI_MODEL_CONFIG["heavy_model_backend"].
+"""
+
+import atexit
+import glob
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from config import AI_MODEL_CONFIG
+
+MIN_ROWS_PER_WORKER = 256
+INITIAL_ROWS = 4096
+WARMUP_TIMEOUT = 120  # seconds each worker may take to load the model
+
+# Worker-process state, set by _init_worker
+_model = None
+_blocks = {}
+
+
+def _load_pickle(path):
+    import warnings
+
+    import joblib
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return joblib.load(path)
+
+
+def _init_worker(model_path, ready=None):
+    global _model
+    _model = _load_pickle(model_path)
+    n_jobs = getattr(_model, "n_jobs", None)
+    if n_jobs not in (None, 1):
+        _model.n_jobs = 1  # the pool already provides the parallelism
+    if ready is not None:
+        ready.release()
+
+
+def _describe():
+    return int(_model.n_features_in_), np.asarray(_model.classes_).tolist()
+
+
+def _attach(in_name, out_name):
+    """Worker-side views of the parent's blocks, reattached when they grow"""
+    names = (in_name, out_name)
+    if _blocks.get("names") != names:
+        for block in _blocks.get("blocks", ()):
+            block.close()
+        _blocks["names"] = names
+        _blocks["blocks"] = [SharedMemory(name=name) for name in names]
+    return _blocks["blocks"]
+
+
+def _score_slice(in_name, out_name, n_features, n_classes, capacity, start, stop):
+    """Score rows [start, stop) of the input block into the output block"""
+    inputs, outputs = _attach(in_name, out_name)
+    features = np.ndarray((capacity, n_features), dtype=np.float64, buffer=inputs.buf)
+    output = np.ndarray((capacity, n_classes), dtype=np.float64, buffer=outputs.buf)
+    output[start:stop] = _model.predict_proba(features[start:stop])
+    return stop - start
+
+
+class InlineBackend:
+    """Runs the pickled model on the calling thread"""
+
+    def __init__(self, model_path):
+        self.model = _load_pickle(model_path)
+        self.n_features_in_ = self.model.n_features_in_
+        self.classes_ = np.asarray(self.model.classes_)
+
+    def predict_proba(self, features):
+        return self.model.predict_proba(features)
+
+    def predict(self, features):
+        return self.classes_[self.predict_proba(features).argmax(axis=1)]
+
+    def close(self):
+        pass
+
+
+class ProcessPoolBackend:
+    """Scores batches in worker processes that each hold the model"""
+
+    def __init__(self, model_path, workers=None):
+        self.model_path = model_path
+        self.workers = workers or os.cpu_count() or 1
+        self.fallback = None
+        context = get_context("spawn")
+        ready = context.Semaphore(0)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(model_path, ready),
+        )
+        # A spawn pool starts workers on demand, one per submit while none is
+        # idle; submit one task per worker, then wait until every worker has
+        # loaded the model so the first real batch does not pay for it
+        futures = [self.executor.submit(_describe) for _ in range(self.workers)]
+        n_features, classes = futures[0].result()
+        loaded = sum(ready.acquire(timeout=WARMUP_TIMEOUT) for _ in futures)
+        if loaded < self.workers:
+            print(f"⚠️ Only {loaded} of {self.workers} inference workers warmed up")
+        self.n_features_in_ = n_features
+        self.classes_ = np.asarray(classes)
+
+        self.capacity = 0
+        self.inputs = self.outputs = None
+        self._lock = threading.Lock()
+        self._grow(INITIAL_ROWS)
+        atexit.register(self.close)
+
+    def _grow(self, rows):
+        for block in (self.inputs, self.outputs):
+            if block is not None:
+                block.close()
+                block.unlink()
+        self.capacity = rows
+        self.inputs = SharedMemory(create=True, size=rows * self.n_features_in_ * 8)
+        self.outputs = SharedMemory(create=True, size=rows * len(self.classes_) * 8)
+        self._features = np.ndarray(
+            (rows, self.n_features_in_), dtype=np.float64, buffer=self.inputs.buf
+        )
+        self._output = np.ndarray(
+            (rows, len(self.classes_)), dtype=np.float64, buffer=self.outputs.buf
+        )
+
+    def predict_proba(self, features):
+        # One batch in flight at a time; it already spans every worker
+        with self._lock:
+            if self.fallback is None:
+                if self.executor is None:
+                    raise RuntimeError("ProcessPoolBackend is closed")
+                try:
+                    return self._pool_predict_proba(features)
+                except BrokenProcessPool as e:
+                    print(f"⚠️ Inference pool broke ({e}); scoring in-process")
+                    self.close(wait=False)
+                    self.fallback = InlineBackend(self.model_path)
+        return self.fallback.predict_proba(features)
+
+    def _pool_predict_proba(self, features):
+        n_rows = len(features)
+        if n_rows > self.capacity:
+            self._grow(max(n_rows, 2 * self.capacity))
+        self._features[:n_rows] = features
+
+        slices = max(1, min(self.workers, n_rows // MIN_ROWS_PER_WORKER))
+        edges = np.linspace(0, n_rows, slices + 1).astype(int)
+        futures = [
+            self.executor.submit(
+                _score_slice,
+                self.inputs.name,
+                self.outputs.name,
+                self.n_features_in_,
+                len(self.classes_),
+                self.capacity,
+                int(start),
+                int(stop),
+            )
+            for start, stop in zip(edges[:-1], edges[1:])
+            if stop > start
+        ]
+        for future in futures:
+            future.result()
+        return self._output[:n_rows].copy()
+
+    def predict(self, features):
+        return self.classes_[self.predict_proba(features).argmax(axis=1)]
+
+    def close(self, wait=True):
+        if self.executor is None:
+            return
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+        self.executor = None
+        for block in (self.inputs, self.outputs):
+            block.close()
+            block.unlink()
+
+
+def make_backend(model_path, kind=None, workers=None):
+    """Backend named by AI_MODEL_CONFIG["heavy_model_backend"] ("process"/"inline")"""
+    kind = kind or AI_MODEL_CONFIG["heavy_model_backend"]
+    if kind == "process":
+        return ProcessPoolBackend(
+            model_path, workers or AI_MODEL_CONFIG["heavy_model_workers"]
+        )
+    if kind == "inline":
+        return InlineBackend(model_path)
+    raise ValueError(f"unknown inference backend {kind!r}")
+
+
+def benchmark(model_path="model results/rf_bench.pkl", sizes=(256, 2048, 10000)):
+    """Inline vs process pool on a forest shaped like training.ipynb's"""
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+
+    from inference import DATASET_DIR, DatasetReplay
+
+    features = DatasetReplay().features
+    paths = sorted(glob.glob(os.path.join(DATASET_DIR, "batch*.csv")))
+    labels = np.concatenate(
+        [np.loadtxt(path, delimiter=",", skiprows=1, usecols=0) for path in paths]
+    ).astype(int)
+    if not os.path.exists(model_path):
+        forest = RandomForestClassifier(n_estimators=100, max_depth=20, random_state=25)
+        forest.fit(features, labels)
+        joblib.dump(forest, model_path)
+
+    inline = InlineBackend(model_path)
+    started = time.perf_counter()
+    pooled = ProcessPoolBackend(model_path)
+    print(f"🧠 {pooled.workers} workers ready in {time.perf_counter() - started:.2f}s")
+
+    # A 'callback' thread that wants to run every millisecond
+    stalls = []
+    running = threading.Event()
+    running.set()
+
+    def heartbeat():
+        last = time.perf_counter()
+        while running.is_set():
+            time.sleep(0.001)
+            now = time.perf_counter()
+            stalls.append(now - last)
+            last = now
+
+    rng = np.random.default_rng(25)
+    for n_rows in sizes:
+        x = features[rng.integers(len(features), size=n_rows)]
+        for label, backend in (("inline", inline), ("process", pooled)):
+            backend.predict_proba(x)  # warm up
+            stalls.clear()
+            thread = threading.Thread(target=heartbeat, daemon=True)
+            thread.start()
+            started = time.perf_counter()
+            proba = backend.predict_proba(x)
+            elapsed = time.perf_counter() - started
+            running.clear()
+            thread.join()
+            running.set()
+            print(
+                f"⏱️  {n_rows:>6} rows {label:>7}: {elapsed * 1000:7.1f} ms, "
+                f"longest callback stall {max(stalls) * 1000:6.1f} ms"
+            )
+        assert np.allclose(proba, inline.predict_proba(x))
+    print("🔍 process pool probabilities match inline")
+    pooled.close()
+    os.remove(model_path)
+
+
+if __name__ == "__main__":
+    benchmark()
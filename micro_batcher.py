@@ -0,0 +1,276 @@
+"""
+Micro-Batching for Coal Mine Risk Inference
+Scores asynchronously arriving feature vectors in latency-bounded batches
+
+Feature vectors arrive per helmet whenever MQTT delivers sensor-array
+samples. Scoring each one alone wastes the models' vectorization, waiting
+for the next ticker pass adds up to a full tick of latency. The batcher sits
+in between:
+- submit() parks the newest vector of each helmet in a pending batch (a
+  helmet already waiting is updated in place, not queued twice)
+- a worker scores the pending batch as soon as it holds max_batch helmets or
+  its oldest vector has waited max_wait_ms, whichever comes first
+- results are published per helmet (result()) and to subscribers; with
+  max_age set, results older than that are ignored and pruned, so a helmet
+  that stops streaming falls back to whatever else scores it
+
+Histograms of batch size and queue wait are kept so max_batch / max_wait_ms
+(AI_MODEL_CONFIG) can be tuned per deployment; see stats().
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from config import AI_MODEL_CONFIG
+from risk_ensemble import assessment_row
+
+MAX_PENDING = 50000
+WAIT_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+LATENCY_SAMPLES = 1000
+
+
+def size_buckets(max_batch):
+    """Powers of two up to max_batch: 1, 2, 4, ..., max_batch"""
+    buckets = [1]
+    while buckets[-1] < max_batch:
+        buckets.append(min(buckets[-1] * 2, max_batch))
+    return tuple(buckets)
+
+
+class Histogram:
+    """Counts per upper bucket edge, plus an overflow bucket"""
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(edges) + 1, dtype=np.int64)
+
+    def add(self, values):
+        buckets = np.searchsorted(self.edges, values, side="left")
+        np.add.at(self.counts, buckets, 1)
+
+    def to_dict(self):
+        """{"le": upper edges, "counts": per edge + overflow} (JSON keeps order)"""
+        return {"le": self.edges.tolist(), "counts": self.counts.tolist()}
+
+
+class MicroBatcher(threading.Thread):
+    """Collects (helmet_id, features) and scores them in bounded batches
+
+    score_fn(features) takes a (helmets, features) matrix and returns a
+    risk_ensemble.RiskAssessment (or None when models are unavailable).
+    """
+
+    def __init__(
+        self,
+        score_fn,
+        max_batch=AI_MODEL_CONFIG["micro_batch_size"],
+        max_wait_ms=AI_MODEL_CONFIG["micro_batch_wait_ms"],
+        max_pending=MAX_PENDING,
+        max_age=None,
+    ):
+        super().__init__(name="micro-batcher", daemon=True)
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending = max_pending
+        self.max_age = max_age
+
+        self.results = {}
+        self.batches = 0
+        self.scored = 0
+        self.dropped = 0
+        self.failures = 0
+        self.batch_sizes = Histogram(size_buckets(max_batch))
+        self.queue_waits = Histogram(WAIT_BUCKETS_MS)
+        self.score_latencies = deque(maxlen=LATENCY_SAMPLES)
+
+        self._pending = {}  # helmet_id -> (features, first enqueue time)
+        self._cond = threading.Condition()
+        self._listeners = []
+        self._stop_event = threading.Event()
+        self._pruned_at = time.time()
+
+    def submit(self, helmet_ids, features):
+        """Queue the latest feature vector of each helmet; never blocks"""
+        now = time.monotonic()
+        features = np.asarray(features)
+        with self._cond:
+            pending = self._pending
+            was_empty = not pending
+            for helmet_id, row in zip(helmet_ids, features):
+                entry = pending.get(helmet_id)
+                if entry is not None:
+                    pending[helmet_id] = (row, entry[1])
+                elif len(pending) < self.max_pending:
+                    pending[helmet_id] = (row, now)
+                else:
+                    self.dropped += 1
+            if was_empty or len(pending) >= self.max_batch:
+                self._cond.notify()
+
+    def subscribe(self, callback):
+        """Call callback(helmet_ids, results) after every scored batch
+
+        Runs on the batcher thread; keep it cheap.
+        """
+        self._listeners.append(callback)
+
+    def result(self, helmet_id):
+        """Latest micro-batched risk of one helmet as a dict, or None if stale"""
+        result = self.results.get(helmet_id)
+        if result is None or self._expired(result, time.time()):
+            return None
+        return result
+
+    def _expired(self, result, now):
+        return self.max_age is not None and now - result["scored_at"] > self.max_age
+
+    def _prune(self, now):
+        """Drop expired results; runs on the batcher thread, the only writer"""
+        if self.max_age is None or now - self._pruned_at < self.max_age:
+            return
+        self._pruned_at = now
+        for helmet_id, result in list(self.results.items()):
+            if self._expired(result, now):
+                del self.results[helmet_id]
+
+    def _take_batch(self):
+        """Wait for a full batch or the oldest vector's deadline; None on stop"""
+        with self._cond:
+            while not self._pending:
+                if self._stop_event.is_set():
+                    return None
+                self._cond.wait(0.5)
+            # Dicts keep insertion order, so the first entry is the oldest
+            oldest = next(iter(self._pending.values()))[1]
+            deadline = oldest + self.max_wait
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop_event.is_set():
+                    break
+                self._cond.wait(remaining)
+
+            batch = {}
+            for helmet_id in list(self._pending)[: self.max_batch]:
+                batch[helmet_id] = self._pending.pop(helmet_id)
+            return batch
+
+    def run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            self._score(batch)
+
+    def _score(self, batch):
+        helmet_ids = list(batch)
+        features = np.stack([row for row, _ in batch.values()])
+        enqueued = np.fromiter(
+            (t for _, t in batch.values()), dtype=np.float64, count=len(batch)
+        )
+        started = time.monotonic()
+        try:
+            assessment = self.score_fn(features)
+        except Exception as e:
+            self.failures += 1
+            print(f"❌ Micro-batch scoring failed: {e}")
+            return
+        finished = time.monotonic()
+
+        self.batches += 1
+        self.batch_sizes.add([len(helmet_ids)])
+        self.queue_waits.add((started - enqueued) * 1000)
+        self.score_latencies.append(finished - started)
+        if assessment is None:
+            return
+
+        scored_at = time.time()
+        results = {}
+        for row, helmet_id in enumerate(helmet_ids):
+            result = assessment_row(assessment, row)
+            result["scored_at"] = scored_at
+            result["latency_ms"] = round(float(finished - enqueued[row]) * 1000, 3)
+            results[helmet_id] = result
+        self.results.update(results)
+        self._prune(scored_at)
+        self.scored += len(helmet_ids)
+        for callback in self._listeners:
+            callback(helmet_ids, results)
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify()
+        if self.is_alive():
+            self.join(timeout)
+
+    def stats(self):
+        stats = {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_age": self.max_age,
+            "results": len(self.results),
+            "batches": self.batches,
+            "scored": self.scored,
+            "pending": len(self._pending),
+            "dropped": self.dropped,
+            "failures": self.failures,
+            "batch_size_histogram": self.batch_sizes.to_dict(),
+            "queue_wait_ms_histogram": self.queue_waits.to_dict(),
+        }
+        if self.score_latencies:
+            p50, p95 = np.percentile(np.array(self.score_latencies) * 1000, [50, 95])
+            stats["score_ms"] = {
+                "p50": round(float(p50), 3),
+                "p95": round(float(p95), 3),
+            }
+        return stats
+
+
+def benchmark(n_helmets=2000, rate=20000, duration=3.0):
+    """Poisson-ish arrivals at `rate` vectors/s for several batch settings"""
+    from inference import DatasetReplay, InferenceService
+    from risk_ensemble import RiskEnsemble
+
+    replay = DatasetReplay()
+    service = InferenceService(replay)
+    ensemble = RiskEnsemble()
+    service.load()
+
+    def score(features):
+        probabilities = service.predict_proba(features)
+        return ensemble.combine(probabilities) if probabilities else None
+
+    rng = np.random.default_rng(24)
+    helmet_ids = [f"HELMET_{i:05d}" for i in range(n_helmets)]
+    for max_batch, max_wait_ms in ((1, 0), (64, 10), (256, 50), (1024, 100)):
+        batcher = MicroBatcher(score, max_batch, max_wait_ms)
+        latencies = []
+        batcher.subscribe(
+            lambda ids, results: latencies.extend(
+                r["latency_ms"] for r in results.values()
+            )
+        )
+        batcher.start()
+        chunk = max(1, rate // 1000)
+        started = time.monotonic()
+        while time.monotonic() - started < duration:
+            ids = [helmet_ids[i] for i in rng.integers(n_helmets, size=chunk)]
+            batcher.submit(ids, replay(ids))
+            time.sleep(0.001)
+        time.sleep(max_wait_ms / 1000 + 0.2)
+        batcher.stop()
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(
+            f"⏱️  max_batch {max_batch:>4}, max_wait {max_wait_ms:>3} ms: "
+            f"{batcher.scored / duration:>8.0f} scored/s in {batcher.batches} batches, "
+            f"latency p50 {p50:.1f} ms p99 {p99:.1f} ms"
+        )
+    print(f"📊 last run batch sizes: {batcher.stats()['batch_size_histogram']}")
+
+
+if __name__ == "__main__":
+    benchmark()
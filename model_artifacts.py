@@ -0,0 +1,259 @@
+"""
+Memory-Mappable Model Artifacts for Coal Mine Risk Inference
+Plain .npy arrays + a JSON manifest instead of pickled scikit-learn objects
+
+Layout (python model_artifacts.py convert):
+
+    model results/artifacts/v1/
+        manifest.json        format version, feature names, classes, scaler
+                             parameters, array index, model and source hashes
+        svm_weights.npy      PrimalSVM (scaler folded in, see svm_primal)
+        svm_bias.npy
+        nb_weights.npy       FusedNB (scaler folded in, see nb_fused)
+        nb_bias.npy
+
+Arrays are loaded with numpy.load(mmap_mode="r"): dashboard workers share
+the same page-cache pages, nothing is unpickled and scikit-learn is never
+imported. model_hash is a SHA-256 over every array's name, dtype, shape and
+bytes and is checked on load, so a partially copied or edited artifact is
+rejected. sources records the SHA-256 of each pickle it was converted from;
+stale_sources() tells the service when a retrained pickle has replaced one.
+The random forest, when present, stays a pickle.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from config import AI_MODEL_CONFIG
+from nb_fused import FusedNB
+from svm_primal import PrimalSVM
+
+FORMAT_VERSION = 1
+MODEL_DIR = "model results"
+ARTIFACT_DIR = os.path.join(MODEL_DIR, "artifacts", f"v{FORMAT_VERSION}")
+MANIFEST = "manifest.json"
+
+
+def array_hash(arrays):
+    """SHA-256 over {name: array} in name order"""
+    digest = hashlib.sha256()
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(f"{name}:{array.dtype.str}:{array.shape}".encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def convert(model_dir=MODEL_DIR, out_dir=ARTIFACT_DIR):
+    """Write the artifact directory from the pickles; returns the manifest"""
+    from inference import ARTIFACTS, load_artifacts, validate_artifacts
+
+    artifacts = load_artifacts(model_dir, optional=False)
+    validate_artifacts(artifacts)
+    svm_scaler, nb_scaler = artifacts["svm_scaler"], artifacts["nb_scaler"]
+    svm = PrimalSVM.fold(artifacts["svm"], svm_scaler)
+    nb = FusedNB.fold(artifacts["naive_bayes"], nb_scaler)
+
+    arrays = {
+        "svm_weights": svm.weights,
+        "svm_bias": svm.bias,
+        "nb_weights": nb.weights,
+        "nb_bias": nb.bias,
+    }
+    if nb.lower is not None:
+        arrays.update(nb_lower=nb.lower, nb_upper=nb.upper)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "feature_names": list(artifacts["feature_names"]),
+        "classes": [int(c) for c in svm.classes],
+        "models": {
+            "svm": {
+                "kind": "primal_svm",
+                "arrays": {"weights": "svm_weights", "bias": "svm_bias"},
+                "scaler": {
+                    "type": "StandardScaler",
+                    "mean": svm_scaler.mean_.tolist(),
+                    "scale": svm_scaler.scale_.tolist(),
+                },
+            },
+            "naive_bayes": {
+                "kind": "fused_nb",
+                "arrays": {
+                    "weights": "nb_weights",
+                    "bias": "nb_bias",
+                    **(
+                        {"lower": "nb_lower", "upper": "nb_upper"}
+                        if nb.lower is not None
+                        else {}
+                    ),
+                },
+                "scaler": {
+                    "type": "MinMaxScaler",
+                    "min": nb_scaler.min_.tolist(),
+                    "scale": nb_scaler.scale_.tolist(),
+                    "feature_range": list(nb_scaler.feature_range),
+                    "clip": bool(nb_scaler.clip),
+                },
+            },
+        },
+        "arrays": {
+            name: {"file": f"{name}.npy", "dtype": a.dtype.str, "shape": a.shape}
+            for name, a in arrays.items()
+        },
+        "model_hash": array_hash(arrays),
+        "sources": {
+            filename: file_hash(os.path.join(model_dir, filename))
+            for name, filename in ARTIFACTS.items()
+            if name in ("svm", "svm_scaler", "naive_bayes", "nb_scaler")
+        },
+    }
+
+    # Build next to the target and swap it in, so readers never see a mix
+    partial = out_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+    for name, array in arrays.items():
+        np.save(os.path.join(partial, f"{name}.npy"), array)
+    with open(os.path.join(partial, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(partial, out_dir)
+    print(f"💾 Wrote {out_dir} (model_hash {manifest['model_hash'][:12]})")
+    return manifest
+
+
+def load_manifest(artifact_dir=ARTIFACT_DIR):
+    with open(os.path.join(artifact_dir, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(
+            f"artifact format {manifest.get('format_version')}, "
+            f"expected {FORMAT_VERSION}"
+        )
+    return manifest
+
+
+def stale_sources(manifest, model_dir=MODEL_DIR):
+    """Pickles whose SHA-256 changed since the artifact was converted
+
+    Missing pickles are not stale: artifacts may be deployed without them.
+    """
+    stale = []
+    for filename, digest in manifest.get("sources", {}).items():
+        path = os.path.join(model_dir, filename)
+        if os.path.exists(path) and file_hash(path) != digest:
+            stale.append(filename)
+    return stale
+
+
+def load_models(artifact_dir=ARTIFACT_DIR, mmap_mode="r", verify=True):
+    """{"svm": PrimalSVM, "naive_bayes": FusedNB} plus manifest, without sklearn"""
+    manifest = load_manifest(artifact_dir)
+    feature_names = manifest["feature_names"]
+    if len(feature_names) != AI_MODEL_CONFIG["feature_count"]:
+        raise ValueError(f"artifact has {len(feature_names)} features")
+    classes = np.asarray(manifest["classes"])
+    if list(classes) != list(range(1, AI_MODEL_CONFIG["prediction_classes"] + 1)):
+        raise ValueError(f"artifact classes {list(classes)}")
+
+    arrays = {}
+    for name, info in manifest["arrays"].items():
+        array = np.load(os.path.join(artifact_dir, info["file"]), mmap_mode=mmap_mode)
+        if array.dtype.str != info["dtype"] or list(array.shape) != list(info["shape"]):
+            raise ValueError(f"{info['file']} does not match the manifest")
+        arrays[name] = array
+    if verify and array_hash(arrays) != manifest["model_hash"]:
+        raise ValueError(f"model_hash mismatch in {artifact_dir}")
+
+    models = {}
+    for model_name, spec in manifest["models"].items():
+        parts = {key: arrays[name] for key, name in spec["arrays"].items()}
+        if spec["kind"] == "primal_svm":
+            models[model_name] = PrimalSVM(parts["weights"], parts["bias"], classes)
+        elif spec["kind"] == "fused_nb":
+            models[model_name] = FusedNB(
+                parts["weights"],
+                parts["bias"],
+                classes,
+                parts.get("lower"),
+                parts.get("upper"),
+            )
+        else:
+            raise ValueError(f"unknown model kind {spec['kind']!r}")
+    return models, manifest
+
+
+def benchmark(runs=5):
+    """Cold-start time in fresh interpreters: artifacts vs pickles"""
+    import subprocess
+
+    if not os.path.exists(os.path.join(ARTIFACT_DIR, MANIFEST)):
+        convert()
+
+    scripts = {
+        "artifacts (mmap)": "import model_artifacts; model_artifacts.load_models()",
+        "pickles (joblib)": (
+            "import inference; a = inference.load_artifacts(); "
+            "inference.validate_artifacts(a)"
+        ),
+    }
+    probe = (
+        "import sys, time; t = time.perf_counter(); {script}; "
+        "print(time.perf_counter() - t, 'sklearn' in sys.modules)"
+    )
+    for label, script in scripts.items():
+        timings = []
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, "-W", "ignore", "-c", probe.format(script=script)],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.split()
+            timings.append(float(output[0]))
+        print(
+            f"⏱️  {label}: median {np.median(timings) * 1000:.0f} ms cold start, "
+            f"sklearn imported: {output[1]}"
+        )
+
+    # Same scores as the pickles
+    from inference import DatasetReplay, load_artifacts
+
+    models, manifest = load_models()
+    pickled = load_artifacts()
+    x = DatasetReplay().features[:2000]
+    for scaler in (pickled["svm_scaler"], pickled["nb_scaler"]):
+        if hasattr(scaler, "feature_names_in_"):
+            del scaler.feature_names_in_
+    svm_error = np.abs(
+        models["svm"].decision_function(x)
+        - pickled["svm"].decision_function(pickled["svm_scaler"].transform(x))
+    ).max()
+    nb_error = np.abs(
+        models["naive_bayes"].predict_proba(x)
+        - pickled["naive_bayes"].predict_proba(pickled["nb_scaler"].transform(x))
+    ).max()
+    print(f"🔍 vs pickles: svm max abs error {svm_error:.2e}, nb {nb_error:.2e}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["convert"]:
+        convert()
+    else:
+        benchmark()
@@ -0,0 +1,315 @@
+"""
+MQTT Ingestion Pipeline for Coal Mine Safety Dashboard
+Moves payload parsing off the paho network thread and into batched writes
+
+- on_message only enqueues the raw payload into a bounded queue (no parsing,
+  no printing), so the network loop never stalls
+- a worker thread drains the queue in batches, parses every payload and
+  appends every reading to the SensorStore in one vectorized call
+- when the queue is full new payloads are dropped and counted instead of
+  blocking the network thread
+- payloads may be JSON objects, JSON arrays or binary telemetry frames
+  (see telemetry_codec); binary frames of a batch are decoded in one call
+- JSON records may carry a "resistance" array (one value per sensor of the
+  gas array); those go to the feature extractor in one update per batch
+"""
+
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from telemetry_codec import (
+    FRAME_SIZE,
+    decode_frames,
+    helmet_id_from_number,
+    is_binary_payload,
+)
+
+DEFAULT_HELMET_ID = "HELMET_001"
+
+
+def parse_timestamp(value, received_at):
+    """Convert a sensor timestamp to epoch seconds
+
+    Accepts epoch seconds, epoch milliseconds or an ISO-8601 string. Anything
+    else (e.g. Arduino millis() uptime counters) falls back to received_at.
+    """
+    if isinstance(value, (int, float)):
+        if value > 1e11:
+            return value / 1000.0
+        if value > 1e9:
+            return float(value)
+        return received_at
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return received_at
+    return received_at
+
+
+class MqttIngestor:
+    """Bounded queue + batch worker feeding MQTT readings into a SensorStore"""
+
+    def __init__(
+        self,
+        store,
+        max_queue=50000,
+        batch_size=2000,
+        default_helmet_id=DEFAULT_HELMET_ID,
+        feature_extractor=None,
+    ):
+        self.store = store
+        self.feature_extractor = feature_extractor
+        self.channels = list(store.channels)
+        self.batch_size = batch_size
+        self.default_helmet_id = default_helmet_id
+        self.queue = queue.Queue(maxsize=max_queue)
+
+        # Epoch seconds each store row last received live data (0 = never)
+        self.last_seen = np.zeros(store.row_capacity, dtype=np.float64)
+        self.last_message_time = None
+
+        self.received = 0
+        self.dropped = 0
+        self.readings = 0
+        self.array_samples = 0
+        self.parse_errors = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.last_batch_seconds = 0.0
+
+        self._helmet_names = {}
+        self._listeners = []
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # Network side
+    # ------------------------------------------------------------------
+    def submit(self, payload, received_at=None):
+        """Enqueue a raw payload without blocking; False if it was dropped"""
+        self.received += 1
+        try:
+            self.queue.put_nowait((payload, received_at or time.time()))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def on_message(self, client, userdata, msg):
+        """paho on_message callback"""
+        self.submit(msg.payload)
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+    def subscribe(self, callback):
+        """Call callback(helmet_ids, values, timestamps) after every applied batch"""
+        self._listeners.append(callback)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="mqtt-ingest", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                first = self.queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+
+            # Take whatever else is already waiting: batches grow with load
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self.process_batch(batch)
+            except Exception as e:
+                print(f"❌ Error processing MQTT batch: {e}")
+
+    def drain(self):
+        """Process everything currently queued on the calling thread"""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self.process_batch(batch)
+
+    def process_batch(self, batch):
+        """Parse (payload, received_at) pairs and append them to the store"""
+        started = time.perf_counter()
+        helmet_ids, values, timestamps = [], [], []
+        array_ids, resistances = [], []
+        binary = []
+        errors = 0
+
+        for payload, received_at in batch:
+            if is_binary_payload(payload):
+                binary.append((payload, received_at))
+                continue
+
+            try:
+                records = json.loads(payload)
+            except (ValueError, UnicodeDecodeError):
+                errors += 1
+                continue
+
+            # Gateways may forward a whole window as a JSON array; any other
+            # JSON value (number, string, null) is one malformed payload
+            if isinstance(records, dict):
+                records = (records,)
+            elif not isinstance(records, list):
+                errors += 1
+                continue
+
+            for record in records:
+                if (
+                    self.feature_extractor is not None
+                    and isinstance(record, dict)
+                    and "resistance" in record
+                ):
+                    try:
+                        resistance = [float(r) for r in record["resistance"]]
+                    except (TypeError, ValueError):
+                        resistance = ()
+                    if len(resistance) == self.feature_extractor.n_sensors:
+                        array_ids.append(
+                            record.get("helmet_id", self.default_helmet_id)
+                        )
+                        resistances.append(resistance)
+                    else:
+                        # Only the array is dropped; scalars below still count
+                        errors += 1
+                    # Sensor-array only records carry no scalar channels
+                    if not any(c in record for c in self.channels):
+                        continue
+                try:
+                    values.append([float(record.get(c, 0)) for c in self.channels])
+                except (AttributeError, TypeError, ValueError):
+                    errors += 1
+                    continue
+                helmet_ids.append(record.get("helmet_id", self.default_helmet_id))
+                timestamps.append(parse_timestamp(record.get("timestamp"), received_at))
+
+        values = np.asarray(values, dtype=np.float32).reshape(-1, len(self.channels))
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+
+        if binary:
+            decoded, binary_errors = self._decode_binary(binary)
+            errors += binary_errors
+            if decoded is not None:
+                helmet_ids.extend(decoded[0])
+                values = np.concatenate([values, decoded[1]])
+                timestamps = np.concatenate([timestamps, decoded[2]])
+
+        if errors:
+            self.parse_errors += errors
+            print(f"❌ Skipped {errors} malformed MQTT payload(s) or sensor array(s)")
+
+        if helmet_ids:
+            self._apply(helmet_ids, values, timestamps)
+        if array_ids:
+            self.feature_extractor.update(array_ids, resistances)
+            self.array_samples += len(array_ids)
+
+        self.batches += 1
+        self.last_batch_size = len(batch)
+        self.last_batch_seconds = time.perf_counter() - started
+
+    def _decode_binary(self, binary):
+        """Decode all binary payloads of a batch with a single frombuffer call"""
+        errors = 0
+        try:
+            numbers, sent, values = decode_frames(b"".join(p for p, _ in binary))
+        except ValueError:
+            # A bad payload poisons the joined buffer; keep only the valid ones
+            valid = []
+            for payload, received_at in binary:
+                try:
+                    decode_frames(payload)
+                    valid.append((payload, received_at))
+                except ValueError:
+                    errors += 1
+            if not valid:
+                return None, errors
+            binary = valid
+            numbers, sent, values = decode_frames(b"".join(p for p, _ in binary))
+
+        frames_per_payload = [len(payload) // FRAME_SIZE for payload, _ in binary]
+        received = np.repeat([r for _, r in binary], frames_per_payload)
+        timestamps = np.where(sent > 0, sent, received)
+
+        names = self._helmet_names
+        helmet_ids = []
+        for number in numbers.tolist():
+            helmet_id = names.get(number)
+            if helmet_id is None:
+                helmet_id = names[number] = helmet_id_from_number(number)
+            helmet_ids.append(helmet_id)
+        return (helmet_ids, values, timestamps), errors
+
+    def _apply(self, helmet_ids, values, timestamps):
+        rows = self.store.rows_for(helmet_ids)
+        self.store.append_many(rows, values, (timestamps * 1000).astype(np.int64))
+
+        if rows.max() >= self.last_seen.shape[0]:
+            grown = np.zeros(self.store.row_capacity, dtype=np.float64)
+            grown[: self.last_seen.shape[0]] = self.last_seen
+            self.last_seen = grown
+        now = time.time()
+        self.last_seen[rows] = now
+        self.last_message_time = datetime.fromtimestamp(now)
+        self.readings += len(helmet_ids)
+
+        for callback in self._listeners:
+            callback(helmet_ids, values, timestamps)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def live_mask(self, rows, max_age=10.0):
+        """Mask of rows that received live data within the last max_age seconds"""
+        rows = np.asarray(rows, dtype=np.int64)
+        last_seen = self.last_seen
+        seen = np.zeros(rows.shape, dtype=np.float64)
+        known = rows < last_seen.shape[0]
+        seen[known] = last_seen[rows[known]]
+        return (time.time() - seen) <= max_age
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "dropped": self.dropped,
+            "readings": self.readings,
+            "array_samples": self.array_samples,
+            "parse_errors": self.parse_errors,
+            "batches": self.batches,
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_ms": round(self.last_batch_seconds * 1000, 3),
+        }
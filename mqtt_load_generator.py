@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+MQTT Load Generator and Latency Benchmark for Coal Mine Dashboard
+Builds on test_mqtt.py to size deployments against measured numbers
+
+Simulates large helmet fleets (1k-50k) at a configurable message rate, payload
+format and burst pattern, then reports throughput, drop rate and
+p50/p95/p99 latency from the sensor `timestamp` to the moment the reading is
+visible in the dashboard's SensorStore.
+
+Targets:
+- inprocess: payloads go straight into MqttIngestor.submit (no network)
+- broker: payloads are published to an MQTT broker (e.g. a local mosquitto
+  stand-in) and a dashboard-side subscriber in this process ingests them
+
+Examples:
+    python mqtt_load_generator.py --helmets 10000 --rate 5000 --duration 20
+    python mqtt_load_generator.py --format binary --burst-factor 5
+    python mqtt_load_generator.py --target broker --broker localhost
+"""
+
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+
+from mqtt_ingest import MqttIngestor
+from sensor_store import SensorStore
+from telemetry_codec import encode_frame, helmet_id_from_number
+from test_mqtt import MQTT_BROKER, MQTT_PORT, MQTT_TOPIC, generate_sensor_data
+
+PAYLOAD_FORMATS = ("json", "binary", "json-batch")
+
+
+class LatencyRecorder:
+    """Collects sensor-to-store latencies from MqttIngestor batches"""
+
+    def __init__(self):
+        self.samples = []
+        self.visible = 0
+        self.last_visible_at = None  # time.monotonic() of the latest batch
+        self.lock = threading.Lock()
+
+    def __call__(self, helmet_ids, values, timestamps):
+        latency = time.time() - np.asarray(timestamps)
+        with self.lock:
+            self.samples.append(latency)
+            self.visible += len(helmet_ids)
+            self.last_visible_at = time.monotonic()
+
+    def percentiles(self, quantiles=(50, 95, 99)):
+        with self.lock:
+            if not self.samples:
+                return {q: float("nan") for q in quantiles}
+            latencies = np.concatenate(self.samples) * 1000
+        return dict(zip(quantiles, np.percentile(latencies, quantiles)))
+
+
+def make_payload_factory(payload_format, batch_size):
+    """Return a function helmet_ids -> list of (payload, readings in it)"""
+    if payload_format == "binary":
+        return lambda helmet_ids: [
+            (encode_frame(helmet_id, generate_sensor_data(helmet_id), time.time()), 1)
+            for helmet_id in helmet_ids
+        ]
+    if payload_format == "json-batch":
+
+        def batched(helmet_ids):
+            readings = [generate_sensor_data(helmet_id) for helmet_id in helmet_ids]
+            return [
+                (
+                    json.dumps(readings[i : i + batch_size]).encode("utf-8"),
+                    len(readings[i : i + batch_size]),
+                )
+                for i in range(0, len(readings), batch_size)
+            ]
+
+        return batched
+    return lambda helmet_ids: [
+        (json.dumps(generate_sensor_data(helmet_id)).encode("utf-8"), 1)
+        for helmet_id in helmet_ids
+    ]
+
+
+def burst_multiplier(elapsed, factor, period, duty):
+    """Rate multiplier: `factor` during the first `duty` share of each period"""
+    if factor <= 1 or period <= 0:
+        return 1.0
+    return factor if (elapsed % period) < duty * period else 1.0
+
+
+def setup_broker_target(args, ingestor):
+    """Publisher client plus a dashboard-side subscriber feeding the ingestor"""
+    import paho.mqtt.client as mqtt
+
+    subscriber = mqtt.Client()
+    subscriber.on_message = ingestor.on_message
+    subscriber.on_connect = lambda client, userdata, flags, rc: client.subscribe(
+        args.topic
+    )
+    subscriber.connect(args.broker, args.port, 60)
+    subscriber.loop_start()
+
+    publisher = mqtt.Client()
+    publisher.connect(args.broker, args.port, 60)
+    publisher.loop_start()
+    time.sleep(1.0)  # let both connections settle before timing starts
+
+    def send(payload):
+        return publisher.publish(args.topic, payload).rc == 0
+
+    def close():
+        publisher.loop_stop()
+        publisher.disconnect()
+        subscriber.loop_stop()
+        subscriber.disconnect()
+
+    return send, close
+
+
+def run_load_test(args):
+    store = SensorStore(capacity=100, max_helmets=args.helmets)
+    ingestor = MqttIngestor(store, max_queue=args.queue_size)
+    recorder = LatencyRecorder()
+    ingestor.subscribe(recorder)
+    ingestor.start()
+
+    if args.target == "broker":
+        send, close = setup_broker_target(args, ingestor)
+    else:
+        send, close = ingestor.submit, lambda: None
+
+    # Canonical ids ("HELMET_007", "HELMET_12345") survive the binary codec,
+    # which only carries the number
+    helmet_ids = [helmet_id_from_number(i + 1) for i in range(args.helmets)]
+    make_payloads = make_payload_factory(args.format, args.batch_size)
+
+    print(f"🚀 {args.helmets} helmets, {args.rate} readings/s, format={args.format}")
+    print(f"🎯 Target: {args.target}, duration {args.duration}s")
+
+    sent_readings = 0
+    failed = 0  # readings in payloads that could not be sent
+    next_helmet = 0
+    credit = 0.0
+    started = time.monotonic()
+    last = started
+    while True:
+        now = time.monotonic()
+        elapsed = now - started
+        if elapsed >= args.duration:
+            break
+
+        multiplier = burst_multiplier(
+            elapsed, args.burst_factor, args.burst_period, args.burst_duty
+        )
+        credit += args.rate * multiplier * (now - last)
+        last = now
+
+        count = int(credit)
+        if count:
+            credit -= count
+            batch = [
+                helmet_ids[(next_helmet + i) % len(helmet_ids)] for i in range(count)
+            ]
+            next_helmet = (next_helmet + count) % len(helmet_ids)
+            for payload, readings in make_payloads(batch):
+                if not send(payload):
+                    failed += readings
+            sent_readings += count
+        else:
+            time.sleep(0.001)
+
+    send_seconds = time.monotonic() - started
+
+    # Give the ingestion worker time to catch up before reporting
+    deadline = time.monotonic() + args.settle
+    while time.monotonic() < deadline and recorder.visible < sent_readings - failed:
+        time.sleep(0.05)
+    close()
+    ingestor.stop(timeout=2)
+
+    stats = ingestor.stats()
+    # Sending plus however long ingestion took to catch up, without the idle
+    # part of the settle wait
+    last_visible = recorder.last_visible_at or started
+    window_seconds = max(send_seconds, last_visible - started)
+    lost = max(sent_readings - recorder.visible, 0)
+    percentiles = recorder.percentiles()
+
+    print("\n📊 Results")
+    print("=" * 50)
+    print(
+        f"Readings sent:        {sent_readings} ({sent_readings / send_seconds:.0f}/s)"
+    )
+    print(f"Readings visible:     {recorder.visible}")
+    print(f"Throughput:           {recorder.visible / window_seconds:.0f} readings/s")
+    print(f"Drop rate:            {lost / max(sent_readings, 1):.2%}")
+    print(f"  send failures:      {failed} readings")
+    print(f"  ingest queue drops: {stats['dropped']}")
+    print(f"  parse errors:       {stats['parse_errors']}")
+    print(
+        f"Latency p50/p95/p99:  {percentiles[50]:.1f} / {percentiles[95]:.1f} / "
+        f"{percentiles[99]:.1f} ms"
+    )
+    return {
+        "sent": sent_readings,
+        "visible": recorder.visible,
+        "throughput": recorder.visible / window_seconds,
+        "drop_rate": lost / max(sent_readings, 1),
+        "latency_ms": percentiles,
+        "ingest": stats,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--helmets", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=None, help="readings per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--format", choices=PAYLOAD_FORMATS, default="json")
+    parser.add_argument(
+        "--batch-size", type=int, default=100, help="readings per json-batch message"
+    )
+    parser.add_argument(
+        "--burst-factor", type=float, default=1.0, help="rate multiplier in bursts"
+    )
+    parser.add_argument("--burst-period", type=float, default=10.0, help="seconds")
+    parser.add_argument(
+        "--burst-duty", type=float, default=0.2, help="share of period spent bursting"
+    )
+    parser.add_argument(
+        "--target", choices=("inprocess", "broker"), default="inprocess"
+    )
+    parser.add_argument("--broker", default=MQTT_BROKER)
+    parser.add_argument("--port", type=int, default=MQTT_PORT)
+    parser.add_argument("--topic", default=MQTT_TOPIC)
+    parser.add_argument("--queue-size", type=int, default=50000)
+    parser.add_argument(
+        "--settle", type=float, default=5.0, help="seconds to wait for stragglers"
+    )
+    args = parser.parse_args(argv)
+    if args.format == "binary" and args.helmets > 65535:
+        parser.error("binary frames carry a uint16 helmet number (max 65535)")
+    if args.rate is None:
+        # Every helmet reports once per dashboard tick (2 seconds)
+        args.rate = args.helmets / 2.0
+    return args
+
+
+if __name__ == "__main__":
+    run_load_test(parse_args())
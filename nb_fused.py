@@ -0,0 +1,119 @@
+"""
+Fused Naive Bayes for Coal Mine Risk Inference
+Folds MinMaxScaler + MultinomialNB into one affine log-likelihood kernel
+
+MultinomialNB's joint log-likelihood is linear in its input and MinMaxScaler
+is affine, so the two collapse into a single product on raw features:
+
+    jll = (x * scale_ + min_) @ F.T + log_prior
+        = x @ W + b,   W = scale_[:, None] * F.T,   b = min_ @ F.T + log_prior
+
+with F = feature_log_prob_. A scaler fitted with clip=True clamps its output
+to feature_range; since scale_ > 0 that is the same as clamping x to the
+matching raw bounds first, which keeps the kernel a single product.
+
+W and b are used in the dtype they are stored in: memory-mapped artifact
+arrays (model_artifacts.py) stay shared page-cache pages instead of being
+copied to the heap. A float32 pair (a few KB) is kept alongside, so float32
+views of the SensorStore ring buffers are scored as they are, without being
+converted (and copied) to float64. Input of any other dtype is converted to
+the stored one. (A clipping scaler still costs one clamped copy of x.)
+
+The folded arrays are stored with the other models by model_artifacts.py;
+test_nb_fused.py checks them against the pickled scaler + MultinomialNB.
+"""
+
+import numpy as np
+
+MODEL_DIR = "model results"
+
+
+class FusedNB:
+    """Pure-NumPy replacement for scaler.transform + MultinomialNB"""
+
+    def __init__(self, weights, bias, classes, lower=None, upper=None):
+        self.weights = np.asarray(weights)
+        self.bias = np.asarray(bias)
+        self.classes = np.asarray(classes)
+        # dtype -> (W, b); the stored pair plus a float32 one
+        self.kernels = {self.weights.dtype: (self.weights, self.bias)}
+        self.kernels.setdefault(
+            np.dtype(np.float32),
+            (self.weights.astype(np.float32), self.bias.astype(np.float32)),
+        )
+        self.lower = None if lower is None else np.asarray(lower, dtype=np.float64)
+        self.upper = None if upper is None else np.asarray(upper, dtype=np.float64)
+
+    @classmethod
+    def fold(cls, nb, scaler):
+        """Fold a fitted MinMaxScaler into a fitted MultinomialNB"""
+        log_prob_t = np.asarray(nb.feature_log_prob_, dtype=np.float64).T
+        scale = np.asarray(scaler.scale_, dtype=np.float64)
+        offset = np.asarray(scaler.min_, dtype=np.float64)
+        weights = scale[:, None] * log_prob_t
+        bias = offset @ log_prob_t + nb.class_log_prior_
+        lower = upper = None
+        if scaler.clip:
+            low, high = scaler.feature_range
+            lower = (low - offset) / scale
+            upper = (high - offset) / scale
+        return cls(weights, bias, nb.classes_, lower, upper)
+
+    def joint_log_likelihood(self, x):
+        """(samples, classes) log P(x, class) on raw (unscaled) features"""
+        x = np.asarray(x)
+        if x.dtype not in self.kernels:
+            x = x.astype(self.weights.dtype)
+        weights, bias = self.kernels[x.dtype]
+        if self.lower is not None:
+            x = np.clip(x, self.lower.astype(x.dtype), self.upper.astype(x.dtype))
+        jll = x @ weights
+        jll += bias
+        return jll
+
+    def predict_log_proba(self, x):
+        jll = self.joint_log_likelihood(x)
+        peak = jll.max(axis=1, keepdims=True)
+        jll -= peak + np.log(np.exp(jll - peak).sum(axis=1, keepdims=True))
+        return jll
+
+    def predict_proba(self, x):
+        return np.exp(self.predict_log_proba(x))
+
+    def predict(self, x):
+        return self.classes[self.joint_log_likelihood(x).argmax(axis=1)]
+
+
+def benchmark(model_dir=MODEL_DIR, repeats=200):
+    """Time the pickled scaler + NB against FusedNB, single rows and batches"""
+    import time
+
+    from inference import DatasetReplay, load_artifacts
+
+    artifacts = load_artifacts(model_dir, optional=False)
+    nb, scaler = artifacts["naive_bayes"], artifacts["nb_scaler"]
+    if hasattr(scaler, "feature_names_in_"):
+        del scaler.feature_names_in_  # plain arrays below
+    fused = FusedNB.fold(nb, scaler)
+    features = DatasetReplay().features
+    x = features[np.random.default_rng(21).integers(len(features), size=10000)]
+
+    for batch in (1, 10000):
+        rows = x[:batch]
+        for label, fn in (
+            ("sklearn", lambda: nb.predict_proba(scaler.transform(rows))),
+            ("fused", lambda: fused.predict_proba(rows)),
+        ):
+            runs = repeats if batch == 1 else 20
+            started = time.perf_counter()
+            for _ in range(runs):
+                fn()
+            elapsed = (time.perf_counter() - started) / runs
+            print(
+                f"⏱️  {label:>7}, batch {batch:>5}: {elapsed * 1e3:.3f} ms "
+                f"({elapsed / batch * 1e6:.2f} µs/sample)"
+            )
+
+
+if __name__ == "__main__":
+    benchmark()
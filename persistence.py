@@ -0,0 +1,401 @@
+"""
+SQLite Persistence for Coal Mine Safety Dashboard
+Readings and alerts written to DATABASE_CONFIG["db_path"] by one writer thread
+
+- WAL journal mode, so readers (history queries, backups) never block the
+  writer and the writer never blocks them
+- producers only enqueue: store appends hand over copies of the new samples
+  and return immediately; a full queue drops the batch and counts it
+- the writer groups rows into transactions of batch_insert_size and inserts
+  them with executemany
+- other work that needs the write connection (rollups, retention, backups)
+  is submitted with submit_job() and runs on the writer thread between batches
+
+Schema:
+    readings(id, helmet_id, ts, co2, ch4, o2, h2s, temp, humidity)
+        ts is epoch milliseconds, indexed on (helmet_id, ts); id is
+        AUTOINCREMENT so ids are never reused after retention deletes the
+        newest rows (rollups keep a watermark on it)
+    alerts(helmet_id, channel, opened_at, zone, severity, peak_severity,
+           value, updated_at, closed_at, escalations)
+        one row per alert, upserted as the alert changes
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from config import DATABASE_CONFIG
+from sensor_store import SENSOR_CHANNELS
+from threshold_engine import level_name
+
+QUEUE_MAX_RECORDS = 200000  # readings + alerts waiting for the writer
+FLUSH_INTERVAL = 0.5  # seconds a partial batch may wait before it is written
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    helmet_id TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    co2 REAL,
+    ch4 REAL,
+    o2 REAL,
+    h2s REAL,
+    temp REAL,
+    humidity REAL
+);
+CREATE INDEX IF NOT EXISTS idx_readings_helmet_ts ON readings (helmet_id, ts);
+
+CREATE TABLE IF NOT EXISTS alerts (
+    helmet_id TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    opened_at REAL NOT NULL,
+    zone TEXT,
+    severity TEXT,
+    peak_severity TEXT,
+    value REAL,
+    updated_at REAL,
+    closed_at REAL,
+    escalations INTEGER DEFAULT 0,
+    PRIMARY KEY (helmet_id, channel, opened_at)
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_opened ON alerts (opened_at);
+"""
+
+INSERT_READING = "INSERT INTO readings (helmet_id, ts, %s) VALUES (?, ?, %s)" % (
+    ", ".join(SENSOR_CHANNELS),
+    ", ".join("?" * len(SENSOR_CHANNELS)),
+)
+
+UPSERT_ALERT = """
+INSERT INTO alerts (helmet_id, channel, opened_at, zone, severity,
+                    peak_severity, value, updated_at, closed_at, escalations)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (helmet_id, channel, opened_at) DO UPDATE SET
+    severity = excluded.severity,
+    peak_severity = excluded.peak_severity,
+    value = excluded.value,
+    updated_at = excluded.updated_at,
+    closed_at = excluded.closed_at,
+    escalations = excluded.escalations
+"""
+
+
+def connect(db_path, readonly=False):
+    """Open a connection configured for the dashboard database"""
+    if readonly:
+        conn = sqlite3.connect(
+            f"file:{db_path}?mode=ro", uri=True, check_same_thread=False
+        )
+    else:
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+def alert_row(alert):
+    """Alert (or Alert.to_dict()) -> UPSERT_ALERT parameters"""
+    if not isinstance(alert, dict):
+        alert = alert.to_dict()
+    return (
+        alert["helmet_id"],
+        alert["channel"],
+        alert["opened_at"],
+        alert["zone"],
+        level_name(alert["level"]),
+        level_name(alert["peak_level"]),
+        alert["value"],
+        alert["updated_at"],
+        alert["closed_at"],
+        alert["escalations"],
+    )
+
+
+class PersistenceWriter(threading.Thread):
+    """Single writer thread owning the SQLite write connection"""
+
+    def __init__(
+        self,
+        db_path=DATABASE_CONFIG["db_path"],
+        batch_size=DATABASE_CONFIG["batch_insert_size"],
+        max_queue=QUEUE_MAX_RECORDS,
+        flush_interval=FLUSH_INTERVAL,
+    ):
+        super().__init__(name="persistence-writer", daemon=True)
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue()
+        self._jobs = queue.Queue()
+        self._pending = 0  # records queued but not yet written
+        self._pending_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._ready = threading.Event()
+        self._in_job = False
+        self.conn = None
+
+        self.written_readings = 0
+        self.written_alerts = 0
+        self.dropped = 0
+        self.commits = 0
+        self.errors = 0
+        self.peak_queue_depth = 0
+        self.insert_rate = 0.0  # readings per second while writing (smoothed)
+        self.last_commit_ms = 0.0
+
+    # ------------------------------------------------------------------
+    # Producer side (never blocks)
+    # ------------------------------------------------------------------
+    def _reserve(self, records):
+        with self._pending_lock:
+            if self._pending + records > self.max_queue:
+                self.dropped += records
+                return False
+            self._pending += records
+            self.peak_queue_depth = max(self.peak_queue_depth, self._pending)
+            return True
+
+    def submit_readings(self, helmet_ids, timestamps_ms, values):
+        """Queue readings: a helmet id sequence, (n,) epoch ms, (n, 6) values"""
+        if len(helmet_ids) and self._reserve(len(helmet_ids)):
+            self._queue.put(("readings", (helmet_ids, timestamps_ms, values)))
+
+    def submit_alerts(self, alerts):
+        """Queue alert snapshots (Alert objects are copied to dicts here)"""
+        if alerts and self._reserve(len(alerts)):
+            self._queue.put(("alerts", [alert.to_dict() for alert in alerts]))
+
+    def attach_store(self, store):
+        """Persist every sample appended to a SensorStore"""
+
+        def on_append(rows, seqs, values, timestamps_ms):
+            # Runs under the store lock: copy and hand over, nothing more
+            if self._reserve(len(rows)):
+                self._queue.put(
+                    ("rows", (store, rows.copy(), timestamps_ms.copy(), values.copy()))
+                )
+
+        store.subscribe(on_append)
+
+    def submit_job(self, job):
+        """Run job(conn) on the writer thread; returns (done_event, result_dict)"""
+        done = threading.Event()
+        result = {}
+
+        def run(conn):
+            try:
+                result["value"] = job(conn)
+            except Exception as e:
+                result["error"] = e
+            finally:
+                done.set()
+
+        self._jobs.put(run)
+        self._queue.put(("wake", None))  # don't wait for the flush timeout
+        return done, result
+
+    def run_job(self, job, timeout=None):
+        """submit_job() and wait for its result"""
+        done, result = self.submit_job(job)
+        if not done.wait(timeout):
+            raise TimeoutError("persistence job did not finish")
+        if "error" in result:
+            raise result["error"]
+        return result.get("value")
+
+    def queue_depth(self):
+        return self._pending
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+    def run(self):
+        self.conn = connect(self.db_path)
+        self.conn.executescript(SCHEMA)
+        self._ready.set()
+
+        readings, alerts = [], []
+        deadline = None
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            self._run_jobs()
+
+            timeout = self.flush_interval
+            if deadline is not None:
+                timeout = max(0.0, deadline - time.monotonic())
+            try:
+                kind, payload = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                kind = None
+
+            if kind == "alerts":
+                alerts.extend(payload)
+            elif kind in ("rows", "readings"):
+                readings.extend(self._reading_rows(kind, payload))
+
+            if (readings or alerts) and deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+            if len(readings) >= self.batch_size or (
+                deadline is not None and time.monotonic() >= deadline
+            ):
+                readings, alerts = self._flush(readings, alerts)
+                deadline = None
+
+        self._flush(readings, alerts)
+        self._run_jobs()
+        self.conn.close()
+
+    def _reading_rows(self, kind, payload):
+        if kind == "rows":
+            store, rows, timestamps_ms, values = payload
+            helmet_ids = [store.helmet_ids[row] for row in rows.tolist()]
+        else:
+            helmet_ids, timestamps_ms, values = payload
+        timestamps_ms = np.asarray(timestamps_ms, dtype=np.int64).tolist()
+        values = np.asarray(values, dtype=np.float64).round(3).tolist()
+        return [
+            (helmet_id, ts, *row)
+            for helmet_id, ts, row in zip(helmet_ids, timestamps_ms, values)
+        ]
+
+    def _flush(self, readings, alerts):
+        """Write everything queued, in transactions of at most batch_size readings"""
+        while readings or alerts:
+            batch = readings[: self.batch_size]
+            started = time.perf_counter()
+            try:
+                with self.conn:
+                    if batch:
+                        self.conn.executemany(INSERT_READING, batch)
+                    if alerts:
+                        self.conn.executemany(UPSERT_ALERT, map(alert_row, alerts))
+            except sqlite3.Error as e:
+                self.errors += 1
+                print(f"❌ Database write failed: {e}")
+            else:
+                self.written_readings += len(batch)
+                self.written_alerts += len(alerts)
+                self.commits += 1
+            elapsed = time.perf_counter() - started
+            self.last_commit_ms = elapsed * 1000
+            if batch:
+                rate = len(batch) / max(elapsed, 1e-6)
+                self.insert_rate = 0.9 * self.insert_rate + 0.1 * rate
+
+            with self._pending_lock:
+                self._pending -= len(batch) + len(alerts)
+            readings, alerts = readings[self.batch_size :], []
+
+            # Let jobs (backups, rollups) interleave with a long backlog
+            self._run_jobs()
+        return [], []
+
+    def _run_jobs(self):
+        if self._in_job:
+            return  # a job is interleaving writes; never nest jobs
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                return
+            self._in_job = True
+            try:
+                job(self.conn)
+            finally:
+                self._in_job = False
+
+    def interleave(self, budget=0.005):
+        """Write queued records from inside a long-running job
+
+        Jobs such as online backups call this between their steps (on the
+        writer thread) so ingestion keeps draining; returns records written.
+        """
+        deadline = time.perf_counter() + budget
+        readings, alerts = [], []
+        while time.perf_counter() < deadline:
+            try:
+                kind, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "alerts":
+                alerts.extend(payload)
+            elif kind in ("rows", "readings"):
+                readings.extend(self._reading_rows(kind, payload))
+        self._flush(readings, alerts)
+        return len(readings) + len(alerts)
+
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def stats(self):
+        return {
+            "db_path": self.db_path,
+            "queue_depth": self.queue_depth(),
+            "peak_queue_depth": self.peak_queue_depth,
+            "written_readings": self.written_readings,
+            "written_alerts": self.written_alerts,
+            "dropped": self.dropped,
+            "commits": self.commits,
+            "errors": self.errors,
+            "insert_rate": round(self.insert_rate),
+            "last_commit_ms": round(self.last_commit_ms, 3),
+        }
+
+
+def benchmark(n_helmets=1000, ticks=200, db_path="database/benchmark.db"):
+    """Sustained insert throughput and queue depth behind a SensorStore"""
+    from sensor_store import SensorStore
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    store = SensorStore(capacity=100, max_helmets=n_helmets)
+    rows = store.rows_for([f"HELMET_{i:05d}" for i in range(n_helmets)])
+    writer = PersistenceWriter(db_path)
+    writer.attach_store(store)
+    writer.start()
+    writer.wait_ready()
+
+    rng = np.random.default_rng(1)
+    clock = 1_700_000_000_000
+    append_seconds = []
+    started = time.perf_counter()
+    for _ in range(ticks):
+        clock += 2000
+        values = rng.normal(100.0, 10.0, (n_helmets, len(store.channels)))
+        tick = time.perf_counter()
+        store.append_many(rows, values, clock)
+        append_seconds.append(time.perf_counter() - tick)
+    while writer.queue_depth() and time.perf_counter() - started < 120:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    writer.stop()
+
+    stats = writer.stats()
+    print(f"💾 {stats['written_readings']} readings in {elapsed:.2f}s")
+    print(f"⏱️  sustained {stats['written_readings'] / elapsed:.0f} readings/s")
+    print(
+        f"📦 peak queue depth {stats['peak_queue_depth']}, dropped {stats['dropped']}"
+    )
+    print(f"⚡ append with persistence: {max(append_seconds) * 1000:.2f} ms worst")
+    return stats
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,163 @@
+"""
+Risk Ensemble for Coal Mine Safety Dashboard
+Weighted combination of the classifiers' probabilities per AI_MODEL_CONFIG
+
+Each member model contributes its (helmets, classes) probability matrix;
+the ensemble is a single tensordot of the stacked matrices with the
+configured weights. Weights are renormalized over the models actually
+loaded, so a missing member (the random forest is not shipped) shifts its
+share to the others instead of shrinking every probability.
+
+The risk score is the expected class of the ensemble distribution scaled to
+0..1 (class 1 -> 0.0, class 6 -> 1.0), and the risk level counts how many of
+the medium/high/critical confidence thresholds it reaches:
+    score < medium -> low, < high -> medium, < critical -> high, else critical
+
+The latest fleet assessment and its helmet -> row index are published
+together as one tuple, so a reader never pairs a new index with an old
+assessment.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from config import AI_MODEL_CONFIG
+from threshold_engine import CAUTION, DANGER, SAFE, WARNING
+
+RISK_LEVELS = ("low", "medium", "high", "critical")
+
+# Risk level -> threshold_engine level, for colouring cards like the sensors
+RISK_THRESHOLD_LEVELS = (SAFE, CAUTION, WARNING, DANGER)
+
+RiskAssessment = namedtuple(
+    "RiskAssessment",
+    [
+        "helmet_ids",  # tuple of helmet ids, one per row
+        "probabilities",  # (helmets, classes) ensemble class probabilities
+        "predicted",  # (helmets,) most likely class label
+        "confidence",  # (helmets,) probability of the predicted class
+        "score",  # (helmets,) expected class scaled to 0..1
+        "levels",  # (helmets,) int8 index into RISK_LEVELS
+        "models",  # tuple of member models that contributed
+    ],
+)
+
+
+class RiskEnsemble:
+    """Combines per-model probabilities into one risk assessment per helmet"""
+
+    def __init__(self, config=AI_MODEL_CONFIG):
+        self.weights = dict(config["ensemble_weights"])
+        thresholds = config["risk_confidence_thresholds"]
+        self.edges = np.array(
+            [thresholds["medium"], thresholds["high"], thresholds["critical"]]
+        )
+        self.classes = np.arange(1, config["prediction_classes"] + 1)
+        # Expected class -> 0..1 score is a dot product with this vector
+        self.class_scores = (self.classes - 1) / max(len(self.classes) - 1, 1)
+        self._published = (None, {})  # (RiskAssessment, {helmet_id: row})
+        self._weight_cache = {}
+
+    @property
+    def latest(self):
+        """Latest fleet RiskAssessment, or None"""
+        return self._published[0]
+
+    def member_weights(self, models):
+        """Configured weights of `models`, renormalized to sum to 1"""
+        models = tuple(models)
+        weights = self._weight_cache.get(models)
+        if weights is None:
+            raw = np.array([self.weights.get(m, 0.0) for m in models])
+            if raw.sum() <= 0:
+                raise ValueError(f"no ensemble weight for models {models}")
+            weights = raw / raw.sum()
+            self._weight_cache[models] = weights
+        return weights
+
+    def combine(self, probabilities, helmet_ids=()):
+        """RiskAssessment from {model_name: (helmets, classes) probabilities}"""
+        models = tuple(m for m in probabilities if m in self.weights)
+        if not models:
+            return None
+        stacked = np.stack([probabilities[m] for m in models])
+        ensemble = np.tensordot(self.member_weights(models), stacked, axes=1)
+
+        best = ensemble.argmax(axis=1)
+        score = ensemble @ self.class_scores
+        assessment = RiskAssessment(
+            tuple(helmet_ids),
+            ensemble,
+            self.classes[best],
+            np.take_along_axis(ensemble, best[:, None], axis=1)[:, 0],
+            score,
+            np.searchsorted(self.edges, score, side="right").astype(np.int8),
+            models,
+        )
+        if helmet_ids:
+            latest, rows = self._published
+            if assessment.helmet_ids != getattr(latest, "helmet_ids", None):
+                # A new dict: the published one is never modified
+                rows = {h: i for i, h in enumerate(assessment.helmet_ids)}
+            self._published = (assessment, rows)
+        return assessment
+
+    def clear(self):
+        """Forget the latest assessment, e.g. when nothing could be scored"""
+        self._published = (None, {})
+
+    def assessment(self, helmet_id):
+        """Latest risk of one helmet as a plain dict, or None"""
+        latest, rows = self._published
+        row = rows.get(helmet_id)
+        if latest is None or row is None:
+            return None
+        return assessment_row(latest, row)
+
+
+def assessment_row(assessment, row):
+    """One row of a RiskAssessment as a plain dict"""
+    level = int(assessment.levels[row])
+    return {
+        "predicted_class": int(assessment.predicted[row]),
+        "confidence": float(assessment.confidence[row]),
+        "score": float(assessment.score[row]),
+        "level": RISK_LEVELS[level],
+        "threshold_level": RISK_THRESHOLD_LEVELS[level],
+        "models": assessment.models,
+    }
+
+
+def benchmark(sizes=(10, 100, 1000, 10000, 100000), repeats=50):
+    """Ensemble cost per tick as the fleet grows, with and without the forest"""
+    import time
+
+    rng = np.random.default_rng(19)
+    ensemble = RiskEnsemble()
+    n_classes = len(ensemble.classes)
+    for n_helmets in sizes:
+        probabilities = {
+            m: rng.dirichlet(np.ones(n_classes), n_helmets) for m in ensemble.weights
+        }
+        helmet_ids = tuple(f"HELMET_{i:06d}" for i in range(n_helmets))
+        timings = []
+        for members in (tuple(ensemble.weights), ("svm", "naive_bayes")):
+            subset = {m: probabilities[m] for m in members}
+            started = time.perf_counter()
+            for _ in range(repeats):
+                result = ensemble.combine(subset, helmet_ids)
+            timings.append((time.perf_counter() - started) / repeats * 1000)
+
+            # Same answer as a per-helmet weighted average
+            weights = ensemble.member_weights(members)
+            expected = sum(w * subset[m] for w, m in zip(weights, members))
+            assert np.allclose(result.probabilities, expected)
+        print(
+            f"⏱️  {n_helmets:>6} helmets: {timings[0]:.3f} ms with 3 models, "
+            f"{timings[1]:.3f} ms without random_forest"
+        )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,332 @@
+"""
+Online Rolling Statistics for Coal Mine Safety Dashboard
+Per-helmet, per-channel trends maintained incrementally from the SensorStore
+
+RollingStats subscribes to a SensorStore and updates, for every appended
+sample and vectorized across the fleet:
+- EWMA of every channel
+- rolling mean / variance over each window (sliding sums: add the new sample,
+  subtract the one leaving the window, read back from the store's ring)
+- rolling min / max using the van Herk / Gil-Werman block scheme: a running
+  prefix extreme for the current block plus suffix extremes of the previous
+  block, computed once per block, so the cost is O(1) amortized per sample
+- rate of change: least-squares slope of value against time over the window
+
+Windows are counted in samples (one per tick, so 30 samples is one minute at
+the default 2 second interval). At every block boundary the sliding sums are
+recomputed exactly from the ring and the time anchor moves forward, which
+keeps float drift and large timestamps out of the slope sums.
+"""
+
+import numpy as np
+
+DEFAULT_WINDOWS = (10, 30)  # samples
+EWMA_ALPHA = 0.2
+
+
+class _Window:
+    """Sliding sums and block extremes for one window length"""
+
+    def __init__(self, length, rows, channels):
+        self.length = length
+        self.anchor_ms = np.zeros(rows, dtype=np.int64)
+        self.sum_t = np.zeros(rows)
+        self.sum_tt = np.zeros(rows)
+        self.sum_v = np.zeros((rows, channels))
+        self.sum_vv = np.zeros((rows, channels))
+        self.sum_tv = np.zeros((rows, channels))
+        self.prefix_min = np.zeros((rows, channels), dtype=np.float32)
+        self.prefix_max = np.zeros((rows, channels), dtype=np.float32)
+        # Suffix extremes of the previous block; slot `length` is the identity
+        self.suffix_min = np.full((rows, channels, length + 1), np.inf, np.float32)
+        self.suffix_max = np.full((rows, channels, length + 1), -np.inf, np.float32)
+
+    def grow(self, rows):
+        for name in ("anchor_ms", "sum_t", "sum_tt"):
+            old = getattr(self, name)
+            new = np.zeros(rows, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+        for name in ("sum_v", "sum_vv", "sum_tv", "prefix_min", "prefix_max"):
+            old = getattr(self, name)
+            new = np.zeros((rows,) + old.shape[1:], dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+        for name, fill in (("suffix_min", np.inf), ("suffix_max", -np.inf)):
+            old = getattr(self, name)
+            new = np.full((rows,) + old.shape[1:], fill, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+
+class RollingStats:
+    """EWMA, rolling mean/var/min/max and slope for every helmet channel"""
+
+    def __init__(self, store, windows=DEFAULT_WINDOWS, alpha=EWMA_ALPHA):
+        if max(windows) > store.capacity // 2:
+            raise ValueError("windows must fit in half of the store capacity")
+        self.store = store
+        self.channels = list(store.channels)
+        self.alpha = alpha
+
+        rows, channels = store.row_capacity, len(self.channels)
+        self.ewma = np.zeros((rows, channels))
+        self.windows = {length: _Window(length, rows, channels) for length in windows}
+        self.default_window = max(windows)
+
+        store.subscribe(self._on_append)
+
+    # ------------------------------------------------------------------
+    # Updates (store listener, runs under the store lock)
+    # ------------------------------------------------------------------
+    def _on_append(self, rows, seqs, values, timestamps_ms):
+        if self.store.row_capacity > len(self.ewma):
+            self._grow(self.store.row_capacity)
+
+        # A helmet may appear several times in one batch; apply its samples
+        # in order, one occurrence per pass
+        order = np.lexsort((seqs, rows))
+        rows, seqs = rows[order], seqs[order]
+        values = np.asarray(values, dtype=np.float64)[order]
+        timestamps_ms = np.asarray(timestamps_ms)[order]
+        first = np.r_[True, rows[1:] != rows[:-1]]
+        rank = np.arange(rows.size) - np.maximum.accumulate(
+            np.where(first, np.arange(rows.size), 0)
+        )
+        for occurrence in range(int(rank.max()) + 1 if rank.size else 0):
+            pick = rank == occurrence
+            self._apply(rows[pick], seqs[pick], values[pick], timestamps_ms[pick])
+
+    def _grow(self, rows):
+        ewma = np.zeros((rows, len(self.channels)))
+        ewma[: len(self.ewma)] = self.ewma
+        self.ewma = ewma
+        for window in self.windows.values():
+            window.grow(rows)
+
+    def _apply(self, rows, seqs, values, timestamps_ms):
+        """Fold one sample per row (rows are unique here)"""
+        started = seqs == 0
+        self.ewma[rows] += self.alpha * (values - self.ewma[rows])
+        self.ewma[rows[started]] = values[started]
+
+        for window in self.windows.values():
+            self._apply_window(window, rows, seqs, values, timestamps_ms)
+
+    def _apply_window(self, w, rows, seqs, values, timestamps_ms):
+        length = w.length
+        t = (timestamps_ms - w.anchor_ms[rows]) / 1000.0
+
+        w.sum_t[rows] += t
+        w.sum_tt[rows] += t * t
+        w.sum_v[rows] += values
+        w.sum_vv[rows] += values * values
+        w.sum_tv[rows] += t[:, None] * values
+
+        # Subtract the sample that just left the window
+        leaving = seqs >= length
+        if leaving.any():
+            old_rows = rows[leaving]
+            old_slots = (seqs[leaving] - length) % self.store.capacity
+            old_v = self.store.values[:, old_rows, old_slots].T.astype(np.float64)
+            old_t = (
+                self.store.timestamps[old_rows, old_slots] - w.anchor_ms[old_rows]
+            ) / 1000.0
+            w.sum_t[old_rows] -= old_t
+            w.sum_tt[old_rows] -= old_t * old_t
+            w.sum_v[old_rows] -= old_v
+            w.sum_vv[old_rows] -= old_v * old_v
+            w.sum_tv[old_rows] -= old_t[:, None] * old_v
+
+        # Running extremes of the current block
+        position = seqs % length
+        fresh = position == 0
+        sample = values.astype(np.float32)
+        w.prefix_min[rows] = np.where(
+            fresh[:, None], sample, np.minimum(w.prefix_min[rows], sample)
+        )
+        w.prefix_max[rows] = np.where(
+            fresh[:, None], sample, np.maximum(w.prefix_max[rows], sample)
+        )
+
+        complete = position == length - 1
+        if complete.any():
+            self._close_block(w, rows[complete], seqs[complete])
+
+    def _close_block(self, w, rows, seqs):
+        """Block full: store its suffix extremes and re-anchor exact sums"""
+        length = w.length
+        block = seqs[:, None] - length + 1 + np.arange(length)
+        slots = block % self.store.capacity
+        values = self.store.values[:, rows[:, None], slots]  # (C, n, length)
+        values = values.transpose(1, 0, 2)  # (n, C, length)
+        stamps = self.store.timestamps[rows[:, None], slots]  # (n, length)
+
+        w.suffix_min[rows, :, :length] = np.minimum.accumulate(
+            values[:, :, ::-1], axis=2
+        )[:, :, ::-1]
+        w.suffix_max[rows, :, :length] = np.maximum.accumulate(
+            values[:, :, ::-1], axis=2
+        )[:, :, ::-1]
+
+        anchor = stamps[:, -1]
+        t = (stamps - anchor[:, None]) / 1000.0
+        v = values.astype(np.float64)
+        w.anchor_ms[rows] = anchor
+        w.sum_t[rows] = t.sum(axis=1)
+        w.sum_tt[rows] = (t * t).sum(axis=1)
+        w.sum_v[rows] = v.sum(axis=2)
+        w.sum_vv[rows] = (v * v).sum(axis=2)
+        w.sum_tv[rows] = (t[:, None, :] * v).sum(axis=2)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def stats(self, rows, window=None):
+        """Dict of (n, channels) arrays for the given store rows
+
+        Keys: count, mean, var, std, min, max, slope (per second),
+        rate_per_min and ewma. Rows without samples report count 0 and NaN.
+        """
+        w = self.windows[window or self.default_window]
+        rows = np.asarray(rows, dtype=np.int64)
+        with self.store.lock:
+            counts = self.store.counts[rows]
+            n = np.minimum(counts, w.length).astype(np.float64)
+            n_safe = np.maximum(n, 1)[:, None]
+
+            mean = w.sum_v[rows] / n_safe
+            var = np.maximum(w.sum_vv[rows] / n_safe - mean * mean, 0.0)
+
+            sum_t = w.sum_t[rows][:, None]
+            denom = n[:, None] * w.sum_tt[rows][:, None] - sum_t * sum_t
+            numer = n[:, None] * w.sum_tv[rows] - sum_t * w.sum_v[rows]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                slope = np.where(denom > 1e-9, numer / denom, 0.0)
+
+            position = ((counts - 1) % w.length + 1)[:, None, None]
+            suffix_min = np.take_along_axis(w.suffix_min[rows], position, axis=2)
+            suffix_max = np.take_along_axis(w.suffix_max[rows], position, axis=2)
+            minimum = np.minimum(w.prefix_min[rows], suffix_min[:, :, 0])
+            maximum = np.maximum(w.prefix_max[rows], suffix_max[:, :, 0])
+            ewma = self.ewma[rows].copy()
+
+        empty = counts == 0
+        result = {
+            "count": n.astype(np.int64),
+            "mean": mean,
+            "var": var,
+            "std": np.sqrt(var),
+            "min": minimum.astype(np.float64),
+            "max": maximum.astype(np.float64),
+            "slope": slope,
+            "rate_per_min": slope * 60.0,
+            "ewma": ewma,
+        }
+        for key in result:
+            if key != "count":
+                result[key][empty] = np.nan
+        return result
+
+    def trend(self, helmet_id, window=None):
+        """{channel: {mean, std, min, max, rate_per_min, ewma}} for one helmet"""
+        if helmet_id not in self.store:
+            return None
+        row = self.store.helmet_rows[helmet_id]
+        stats = self.stats([row], window)
+        if stats["count"][0] == 0:
+            return None
+        keys = ("mean", "std", "min", "max", "rate_per_min", "ewma")
+        return {
+            channel: {key: round(float(stats[key][0, c]), 4) for key in keys}
+            for c, channel in enumerate(self.channels)
+        }
+
+    def rising(self, rows, channel, min_rate_per_min, window=None):
+        """Mask of rows whose channel rises at least min_rate_per_min
+
+        Pass a negative rate to find steadily falling channels (e.g. oxygen).
+        """
+        rate = self.stats(rows, window)["rate_per_min"][:, self.channels.index(channel)]
+        if min_rate_per_min < 0:
+            return rate <= min_rate_per_min
+        return rate >= min_rate_per_min
+
+
+def check_against_rescan(n_helmets=200, samples=157, seed=3):
+    """Compare incremental results with a brute-force rescan of the ring"""
+    from sensor_store import SensorStore
+
+    rng = np.random.default_rng(seed)
+    store = SensorStore(capacity=100, max_helmets=n_helmets)
+    helmet_ids = [f"HELMET_{i:05d}" for i in range(n_helmets)]
+    rows = store.rows_for(helmet_ids)
+    stats = RollingStats(store, windows=(7, 30))
+
+    clock = 1_700_000_000_000
+    for _ in range(samples):
+        # Irregular arrivals: a random subset, some helmets twice per batch
+        batch = rows[rng.random(n_helmets) < 0.7]
+        batch = np.concatenate([batch, batch[rng.random(batch.size) < 0.1]])
+        clock += int(rng.integers(1500, 2500))
+        stamps = clock + rng.integers(0, 200, batch.size)
+        values = rng.normal(100.0, 10.0, (batch.size, len(store.channels)))
+        store.append_many(batch, values, stamps)
+
+    worst = 0.0
+    for length in stats.windows:
+        result = stats.stats(rows, length)
+        for i, helmet_id in enumerate(helmet_ids):
+            values, stamps = store.last_n(helmet_id, length)
+            if values.shape[1] == 0:
+                continue
+            v = values.astype(np.float64)
+            t = (stamps - stamps[-1]) / 1000.0
+            expected = {
+                "mean": v.mean(axis=1),
+                "std": v.std(axis=1),
+                "min": v.min(axis=1),
+                "max": v.max(axis=1),
+                "slope": (
+                    np.polyfit(t, v.T, 1)[0] if v.shape[1] > 1 else np.zeros(len(v))
+                ),
+            }
+            for key, value in expected.items():
+                error = np.abs(result[key][i] - value).max()
+                worst = max(worst, error)
+                assert error < 1e-3, (key, length, helmet_id, error)
+    print(f"✅ Rolling stats match a full rescan (max abs error {worst:.2e})")
+    return worst
+
+
+def benchmark(n_helmets=10000, ticks=100, seed=5):
+    """Per-tick update and query cost for a whole fleet"""
+    import time
+
+    from sensor_store import SensorStore
+
+    rng = np.random.default_rng(seed)
+    store = SensorStore(capacity=100, max_helmets=n_helmets)
+    rows = store.rows_for([f"HELMET_{i:05d}" for i in range(n_helmets)])
+    stats = RollingStats(store)
+
+    clock = 1_700_000_000_000
+    update, query = [], []
+    for _ in range(ticks):
+        clock += 2000
+        values = rng.normal(100.0, 10.0, (n_helmets, len(store.channels)))
+        started = time.perf_counter()
+        store.append_many(rows, values, clock)
+        update.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        stats.stats(rows)
+        query.append(time.perf_counter() - started)
+
+    print(f"⛑️  {n_helmets} helmets, windows {sorted(stats.windows)}")
+    print(f"⏱️  append + stats update: {np.median(update) * 1000:.2f} ms per tick")
+    print(f"🔎 fleet stats query: {np.median(query) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    check_against_rescan()
+    benchmark()
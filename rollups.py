@@ -0,0 +1,308 @@
+"""
+Rollups and Retention for Coal Mine Safety History
+Time-bucketed aggregates of the raw readings table plus retention compaction
+
+Tables (created next to persistence.SCHEMA):
+    readings_1m, readings_1h
+        one row per (helmet_id, bucket) with count and, per channel,
+        <channel>_min, <channel>_max and <channel>_sum (mean = sum / count)
+    rollup_state
+        watermark: highest readings.rowid already folded into the rollups;
+        readings' id is AUTOINCREMENT, so rowids above it are always new
+
+Rolling up is incremental: only raw rows past the watermark are aggregated
+and merged into existing buckets with an upsert, so each run costs
+O(new rows). Retention drops raw rows older than raw_retention_days (only once
+they are rolled up), 1-minute buckets after MINUTE_RETENTION_DAYS and hourly
+buckets after data_retention_days.
+
+Range queries go through choose_table(), which picks the coarsest table whose
+bucket still satisfies the requested resolution and whose retention covers the
+requested start.
+"""
+
+import threading
+import time
+
+from config import DATABASE_CONFIG
+from sensor_store import SENSOR_CHANNELS
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+DAY_MS = 24 * HOUR_MS
+
+MINUTE_RETENTION_DAYS = 30
+
+# rollup table -> bucket size in ms
+ROLLUP_TABLES = {"readings_1m": MINUTE_MS, "readings_1h": HOUR_MS}
+
+
+def _rollup_schema(table):
+    columns = ",\n".join(
+        f"    {c}_min REAL, {c}_max REAL, {c}_sum REAL" for c in SENSOR_CHANNELS
+    )
+    return f"""
+CREATE TABLE IF NOT EXISTS {table} (
+    helmet_id TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+{columns},
+    PRIMARY KEY (helmet_id, bucket)
+) WITHOUT ROWID;
+"""
+
+
+ROLLUP_SCHEMA = "".join(_rollup_schema(table) for table in ROLLUP_TABLES) + """
+CREATE TABLE IF NOT EXISTS rollup_state (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def _rollup_sql(table, bucket_ms):
+    aggregates = ", ".join(f"min({c}), max({c}), sum({c})" for c in SENSOR_CHANNELS)
+    targets = ", ".join(f"{c}_min, {c}_max, {c}_sum" for c in SENSOR_CHANNELS)
+    merges = ",\n    ".join(
+        f"{c}_min = min({c}_min, excluded.{c}_min), "
+        f"{c}_max = max({c}_max, excluded.{c}_max), "
+        f"{c}_sum = {c}_sum + excluded.{c}_sum"
+        for c in SENSOR_CHANNELS
+    )
+    return f"""
+INSERT INTO {table} (helmet_id, bucket, count, {targets})
+SELECT helmet_id, (ts / {bucket_ms}) * {bucket_ms}, count(*), {aggregates}
+FROM readings
+WHERE rowid > ? AND rowid <= ?
+GROUP BY helmet_id, ts / {bucket_ms}
+ON CONFLICT (helmet_id, bucket) DO UPDATE SET
+    count = count + excluded.count,
+    {merges}
+"""
+
+
+ROLLUP_SQL = {table: _rollup_sql(table, ms) for table, ms in ROLLUP_TABLES.items()}
+
+
+def ensure_schema(conn):
+    conn.executescript(ROLLUP_SCHEMA)
+
+
+def get_watermark(conn):
+    row = conn.execute(
+        "SELECT value FROM rollup_state WHERE name = 'watermark'"
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def rollup(conn, max_rows=50000):
+    """Fold raw rows past the watermark into every rollup table
+
+    Works in slices of max_rows so one call never holds the write lock for
+    long; returns the number of raw rows rolled up.
+    """
+    ensure_schema(conn)
+    watermark = get_watermark(conn)
+    (latest,) = conn.execute("SELECT coalesce(max(rowid), 0) FROM readings").fetchone()
+
+    total = 0
+    while watermark < latest:
+        upper = min(watermark + max_rows, latest)
+        with conn:
+            for sql in ROLLUP_SQL.values():
+                conn.execute(sql, (watermark, upper))
+            conn.execute(
+                "INSERT INTO rollup_state (name, value) VALUES ('watermark', ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+                (upper,),
+            )
+        total += upper - watermark
+        watermark = upper
+    return total
+
+
+def apply_retention(
+    conn,
+    now_ms=None,
+    raw_days=DATABASE_CONFIG["raw_retention_days"],
+    minute_days=MINUTE_RETENTION_DAYS,
+    hour_days=DATABASE_CONFIG["data_retention_days"],
+):
+    """Delete rows past each table's horizon; returns {table: rows deleted}"""
+    ensure_schema(conn)
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    watermark = get_watermark(conn)
+    deleted = {}
+
+    # Raw rows go helmet by helmet so every delete uses the (helmet_id, ts)
+    # index, and only once the rollups have absorbed them
+    helmets = [
+        row[0] for row in conn.execute("SELECT DISTINCT helmet_id FROM readings_1h")
+    ]
+    cutoff = now_ms - raw_days * DAY_MS
+    deleted["readings"] = 0
+    for helmet_id in helmets:
+        with conn:
+            cursor = conn.execute(
+                "DELETE FROM readings WHERE helmet_id = ? AND ts < ? AND rowid <= ?",
+                (helmet_id, cutoff, watermark),
+            )
+        deleted["readings"] += cursor.rowcount
+
+    for table, days in (("readings_1m", minute_days), ("readings_1h", hour_days)):
+        with conn:
+            cursor = conn.execute(
+                f"DELETE FROM {table} WHERE bucket < ?", (now_ms - days * DAY_MS,)
+            )
+        deleted[table] = cursor.rowcount
+    return deleted
+
+
+def choose_table(
+    start_ms,
+    resolution_ms,
+    now_ms=None,
+    raw_days=DATABASE_CONFIG["raw_retention_days"],
+    minute_days=MINUTE_RETENTION_DAYS,
+):
+    """Coarsest table that satisfies resolution_ms and still covers start_ms"""
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    age_days = (now_ms - start_ms) / DAY_MS
+    if resolution_ms >= HOUR_MS or age_days > minute_days:
+        return "readings_1h"
+    if resolution_ms >= MINUTE_MS or age_days > raw_days:
+        return "readings_1m"
+    return "readings"
+
+
+def fetch_range(conn, table, helmet_ids, channels, start_ms, end_ms):
+    """Rows (helmet_id, ts, mean..., min..., max...) ordered by helmet and time
+
+    For raw readings mean, min and max are the reading itself.
+    """
+    placeholders = ", ".join("?" * len(helmet_ids))
+    if table == "readings":
+        columns = ", ".join(channels)
+        sql = (
+            f"SELECT helmet_id, ts, {columns}, {columns}, {columns} FROM readings "
+            f"WHERE helmet_id IN ({placeholders}) AND ts >= ? AND ts < ? "
+            "ORDER BY helmet_id, ts"
+        )
+    else:
+        means = ", ".join(f"{c}_sum / count" for c in channels)
+        minimums = ", ".join(f"{c}_min" for c in channels)
+        maximums = ", ".join(f"{c}_max" for c in channels)
+        sql = (
+            f"SELECT helmet_id, bucket, {means}, {minimums}, {maximums} FROM {table} "
+            f"WHERE helmet_id IN ({placeholders}) AND bucket >= ? AND bucket < ? "
+            "ORDER BY helmet_id, bucket"
+        )
+    return conn.execute(sql, (*helmet_ids, start_ms, end_ms))
+
+
+class RollupScheduler(threading.Thread):
+    """Submits rollup and retention jobs to the persistence writer"""
+
+    def __init__(
+        self,
+        writer,
+        interval=DATABASE_CONFIG["rollup_interval"],
+        retention_interval=3600,
+    ):
+        super().__init__(name="rollup-scheduler", daemon=True)
+        self.writer = writer
+        self.interval = interval
+        self.retention_interval = retention_interval
+        self.rolled_up = 0
+        self.deleted = {}
+        self.last_rollup_ms = 0.0
+        self._stop_event = threading.Event()
+
+    def run_once(self, retention=False):
+        started = time.perf_counter()
+        self.rolled_up += self.writer.run_job(rollup)
+        self.last_rollup_ms = (time.perf_counter() - started) * 1000
+        if retention:
+            self.deleted = self.writer.run_job(apply_retention)
+
+    def run(self):
+        self.writer.wait_ready()
+        last_retention = 0.0
+        while not self._stop_event.wait(self.interval):
+            retention = time.monotonic() - last_retention >= self.retention_interval
+            try:
+                self.run_once(retention)
+            except Exception as e:
+                print(f"❌ Rollup failed: {e}")
+                continue
+            if retention:
+                last_retention = time.monotonic()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def stats(self):
+        return {
+            "rolled_up": self.rolled_up,
+            "last_rollup_ms": round(self.last_rollup_ms, 3),
+            "last_retention_deleted": self.deleted,
+        }
+
+
+def benchmark(n_helmets=8, days=30, step_s=30, db_path="database/rollup_bench.db"):
+    """Month-long trend query on raw readings vs the router's choice"""
+    import os
+
+    import numpy as np
+
+    from persistence import INSERT_READING, SCHEMA, connect
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    conn = connect(db_path)
+    conn.executescript(SCHEMA)
+
+    rng = np.random.default_rng(2)
+    now_ms = int(time.time() * 1000)
+    stamps = np.arange(now_ms - days * DAY_MS, now_ms, step_s * 1000)
+    helmet_ids = [f"HELMET_{i + 1:03d}" for i in range(n_helmets)]
+    for helmet_id in helmet_ids:
+        values = rng.normal(100.0, 10.0, (len(stamps), len(SENSOR_CHANNELS)))
+        with conn:
+            conn.executemany(
+                INSERT_READING,
+                (
+                    (helmet_id, ts, *row)
+                    for ts, row in zip(stamps.tolist(), values.tolist())
+                ),
+            )
+
+    started = time.perf_counter()
+    rows = rollup(conn)
+    print(f"📦 Rolled up {rows} raw rows in {time.perf_counter() - started:.2f}s")
+
+    start_ms = now_ms - days * DAY_MS
+    for label, table in (
+        ("raw", "readings"),
+        ("routed", choose_table(start_ms, HOUR_MS, now_ms)),
+    ):
+        started = time.perf_counter()
+        result = fetch_range(
+            conn, table, helmet_ids[:1], ["ch4", "o2"], start_ms, now_ms
+        ).fetchall()
+        elapsed = (time.perf_counter() - started) * 1000
+        print(
+            f"⏱️  {days}-day ch4/o2 trend, {label} ({table}): "
+            f"{len(result)} rows in {elapsed:.1f} ms"
+        )
+
+    deleted = apply_retention(conn, now_ms)
+    print(f"🧹 Retention deleted {deleted}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,237 @@
+"""
+Columnar Sensor Store for Coal Mine Safety Dashboard
+Preallocated NumPy ring buffers holding the recent history of every helmet
+
+Layout:
+- values[channel, row, slot]: float32, one ring per sensor channel
+- timestamps[row, slot]: int64 epoch milliseconds
+- counts[row]: total number of samples ever written for the row
+
+Each ring is stored twice back to back (2 x capacity slots) so the most recent
+N samples of any helmet are always one contiguous slice and can be returned as
+a zero-copy view, no matter where the write head currently is.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+SENSOR_CHANNELS = ["co2", "ch4", "o2", "h2s", "temp", "humidity"]
+
+
+def now_ms():
+    """Current wall clock time as integer epoch milliseconds"""
+    return int(time.time() * 1000)
+
+
+class SensorStore:
+    """Fleet-wide ring buffer store with O(1) appends and vectorized reads"""
+
+    def __init__(self, capacity=100, channels=None, helmet_ids=(), max_helmets=50):
+        self.capacity = int(capacity)
+        self.channels = list(channels or SENSOR_CHANNELS)
+        self.channel_index = {name: i for i, name in enumerate(self.channels)}
+
+        self.helmet_ids = []
+        self.helmet_rows = {}
+
+        rows = max(int(max_helmets), len(helmet_ids), 1)
+        self.values = np.zeros(
+            (len(self.channels), rows, 2 * self.capacity), dtype=np.float32
+        )
+        self.timestamps = np.zeros((rows, 2 * self.capacity), dtype=np.int64)
+        self.counts = np.zeros(rows, dtype=np.int64)
+
+        self._listeners = []
+        self.lock = threading.RLock()
+
+        for helmet_id in helmet_ids:
+            self.register(helmet_id)
+
+    # ------------------------------------------------------------------
+    # Helmet registry
+    # ------------------------------------------------------------------
+    def __len__(self):
+        return len(self.helmet_ids)
+
+    def __contains__(self, helmet_id):
+        return helmet_id in self.helmet_rows
+
+    @property
+    def row_capacity(self):
+        return self.counts.shape[0]
+
+    def register(self, helmet_id):
+        """Return the row of a helmet, allocating one if it is new"""
+        row = self.helmet_rows.get(helmet_id)
+        if row is not None:
+            return row
+
+        with self.lock:
+            row = self.helmet_rows.get(helmet_id)
+            if row is None:
+                row = len(self.helmet_ids)
+                if row >= self.row_capacity:
+                    self._grow(2 * self.row_capacity)
+                self.helmet_ids.append(helmet_id)
+                self.helmet_rows[helmet_id] = row
+            return row
+
+    def rows_for(self, helmet_ids):
+        """Map helmet ids to rows, registering unknown helmets"""
+        return np.fromiter(
+            (self.register(helmet_id) for helmet_id in helmet_ids),
+            dtype=np.int64,
+            count=len(helmet_ids),
+        )
+
+    def _grow(self, rows):
+        """Reallocate the row dimension; outstanding views keep the old arrays"""
+        old = self.row_capacity
+
+        values = np.zeros((len(self.channels), rows, 2 * self.capacity), np.float32)
+        values[:, :old] = self.values
+        timestamps = np.zeros((rows, 2 * self.capacity), np.int64)
+        timestamps[:old] = self.timestamps
+        counts = np.zeros(rows, np.int64)
+        counts[:old] = self.counts
+
+        self.values, self.timestamps, self.counts = values, timestamps, counts
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def subscribe(self, callback):
+        """Call callback(rows, seqs, values, timestamps) after every append
+
+        Listeners run on the writing thread while the store lock is held, so
+        they must be cheap (copy or enqueue, never block on I/O).
+        """
+        self._listeners.append(callback)
+
+    def append(self, helmet_id, readings, timestamp_ms=None):
+        """Append one reading dict for a single helmet"""
+        row = self.register(helmet_id)
+        values = np.array(
+            [[readings.get(name, 0) for name in self.channels]], dtype=np.float32
+        )
+        stamp = now_ms() if timestamp_ms is None else timestamp_ms
+        self.append_many(np.array([row]), values, np.array([stamp], dtype=np.int64))
+
+    def append_many(self, rows, values, timestamps_ms=None):
+        """Append a batch of readings
+
+        rows: (n,) row indices, duplicates allowed (kept in arrival order)
+        values: (n, channels) readings
+        timestamps_ms: (n,) epoch milliseconds or a single value for all rows
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if rows.size == 0:
+            return
+
+        values = np.asarray(values, dtype=np.float32).reshape(rows.size, -1)
+        if timestamps_ms is None:
+            timestamps_ms = now_ms()
+        timestamps_ms = np.broadcast_to(
+            np.asarray(timestamps_ms, dtype=np.int64), rows.shape
+        )
+
+        with self.lock:
+            rank = _occurrence_rank(rows)
+            seqs = self.counts[rows] + rank
+            added = np.bincount(rows, minlength=self.row_capacity)
+
+            # With more than `capacity` samples for one helmet in a batch only
+            # the newest ones survive; drop the rest so fancy-index writes
+            # never target the same slot twice.
+            if rank.size and rank.max() >= self.capacity:
+                keep = rank >= added[rows] - self.capacity
+                rows, seqs = rows[keep], seqs[keep]
+                values, timestamps_ms = values[keep], timestamps_ms[keep]
+
+            slots = seqs % self.capacity
+            for mirror in (slots, slots + self.capacity):
+                self.values[:, rows, mirror] = values.T
+                self.timestamps[rows, mirror] = timestamps_ms
+
+            self.counts += added
+
+            for callback in self._listeners:
+                callback(rows, seqs, values, timestamps_ms)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def latest(self, rows=None):
+        """Latest reading for rows (default: all helmets) as (rows, channels)"""
+        if rows is None:
+            rows = np.arange(len(self.helmet_ids))
+        rows = np.asarray(rows, dtype=np.int64)
+        slots = (self.counts[rows] - 1) % self.capacity
+        return self.values[:, rows, slots].T
+
+    def latest_timestamps(self, rows=None):
+        """Timestamp of the latest reading for rows, 0 where nothing was written"""
+        if rows is None:
+            rows = np.arange(len(self.helmet_ids))
+        rows = np.asarray(rows, dtype=np.int64)
+        slots = (self.counts[rows] - 1) % self.capacity
+        return np.where(self.counts[rows] > 0, self.timestamps[rows, slots], 0)
+
+    def latest_readings(self, helmet_id):
+        """Latest reading of one helmet as a channel dict, None if empty"""
+        row = self.helmet_rows.get(helmet_id)
+        if row is None or self.counts[row] == 0:
+            return None
+        slot = (self.counts[row] - 1) % self.capacity
+        return {
+            name: round(float(self.values[i, row, slot]), 2)
+            for i, name in enumerate(self.channels)
+        }
+
+    def last_n(self, helmet_id, n=None, channel=None):
+        """Zero-copy view of the newest n samples of a helmet, oldest first
+
+        Returns (values, timestamps) where values is (channels, n) or (n,)
+        when a single channel is requested.
+        """
+        row = self.helmet_rows[helmet_id]
+        count = int(self.counts[row])
+        n = min(self.capacity if n is None else int(n), count, self.capacity)
+        end = (count - 1) % self.capacity + self.capacity + 1
+        window = slice(end - n, end)
+
+        if channel is None:
+            values = self.values[:, row, window]
+        else:
+            values = self.values[self.channel_index[channel], row, window]
+        return values, self.timestamps[row, window]
+
+    def gather(self, rows, seqs):
+        """Values (n, channels) of samples addressed by absolute sequence number
+
+        Sequences older than `capacity` samples have been overwritten; check
+        `available` before trusting the result.
+        """
+        slots = np.asarray(seqs, dtype=np.int64) % self.capacity
+        return self.values[:, rows, slots].T
+
+    def available(self, rows, seqs):
+        """Mask of (row, seq) samples still held in the ring"""
+        seqs = np.asarray(seqs, dtype=np.int64)
+        counts = self.counts[rows]
+        return (seqs >= 0) & (seqs < counts) & (seqs >= counts - self.capacity)
+
+
+def _occurrence_rank(rows):
+    """For each element, how many earlier elements share its value"""
+    if rows.size < 2:
+        return np.zeros(rows.size, dtype=np.int64)
+    order = np.argsort(rows, kind="stable")
+    sorted_rows = rows[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_rows)) + 1]
+    group_start = np.repeat(starts, np.diff(np.r_[starts, rows.size]))
+    rank = np.empty(rows.size, dtype=np.int64)
+    rank[order] = np.arange(rows.size) - group_start
+    return rank
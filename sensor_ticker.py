@@ -0,0 +1,138 @@
+"""
+Background Sensor Ticker for Coal Mine Safety Dashboard
+Advances ingestion and simulation on a fixed schedule, independent of browsers
+
+The ticker owns the write side of the dashboard: every interval it runs the
+tick function (merge MQTT data, simulate the rest of the fleet) and publishes
+an immutable FleetSnapshot. Dash callbacks only read the latest snapshot, so
+their latency no longer depends on fleet size or on how many clients poll.
+Snapshots are shared by every callback thread: arrays are read-only and
+readings are MappingProxyType views; thaw_readings() copies them into plain
+dicts where one is needed (JSON for dcc.Store).
+"""
+
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from types import MappingProxyType
+
+import numpy as np
+
+# Immutable view of the fleet published once per tick
+FleetSnapshot = namedtuple(
+    "FleetSnapshot",
+    [
+        "tick",  # monotonically increasing tick number
+        "created_at",  # datetime the snapshot was taken
+        "helmet_ids",  # tuple of helmet ids, one per row of `values`
+        "channels",  # tuple of channel names, one per column of `values`
+        "values",  # read-only (helmets, channels) float32 array
+        "readings",  # read-only {helmet_id: {channel: value}}, see thaw_readings
+        "levels",  # read-only (helmets, channels) int8 threshold levels or None
+    ],
+)
+
+
+def build_snapshot(tick, store, helmet_ids, engine=None):
+    """Copy the latest readings of helmet_ids out of a SensorStore
+
+    With a ThresholdEngine the whole fleet is classified once here and each
+    helmet's readings carry a {"levels": {channel: level}} entry.
+    """
+    helmet_ids = tuple(helmet_ids)
+    rows = np.fromiter(
+        (store.helmet_rows[h] for h in helmet_ids),
+        dtype=np.int64,
+        count=len(helmet_ids),
+    )
+    values = store.latest(rows)
+    values.setflags(write=False)
+
+    rounded = np.round(values.astype(np.float64), 2).tolist()
+    readings = {
+        helmet_id: dict(zip(store.channels, row))
+        for helmet_id, row in zip(helmet_ids, rounded)
+    }
+
+    levels = None
+    if engine is not None:
+        levels = engine.classify(values)
+        levels.setflags(write=False)
+        for helmet_id, row in zip(helmet_ids, levels.tolist()):
+            readings[helmet_id]["levels"] = MappingProxyType(
+                dict(zip(store.channels, row))
+            )
+
+    return FleetSnapshot(
+        tick,
+        datetime.now(),
+        helmet_ids,
+        tuple(store.channels),
+        values,
+        MappingProxyType(
+            {h: MappingProxyType(reading) for h, reading in readings.items()}
+        ),
+        levels,
+    )
+
+
+def thaw_readings(readings):
+    """Plain-dict copy of a snapshot's read-only readings, e.g. for dcc.Store"""
+    return {
+        helmet_id: {
+            key: dict(value) if isinstance(value, MappingProxyType) else value
+            for key, value in reading.items()
+        }
+        for helmet_id, reading in readings.items()
+    }
+
+
+class SensorTicker(threading.Thread):
+    """Daemon thread that runs tick_fn every interval and keeps the last snapshot"""
+
+    def __init__(self, tick_fn, interval_ms, name="sensor-ticker"):
+        super().__init__(name=name, daemon=True)
+        self.tick_fn = tick_fn
+        self.interval = interval_ms / 1000.0
+        self.snapshot = None
+
+        self.ticks = 0
+        self.overruns = 0
+        self.errors = 0
+        self.last_tick_seconds = 0.0
+        self._stop_event = threading.Event()
+
+    def tick(self):
+        """Run one tick synchronously and publish its snapshot"""
+        started = time.perf_counter()
+        snapshot = self.tick_fn(self.ticks + 1)
+        self.last_tick_seconds = time.perf_counter() - started
+
+        self.ticks += 1
+        # Single reference assignment: readers see either the old or new snapshot
+        self.snapshot = snapshot
+        return snapshot
+
+    def run(self):
+        next_tick = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                self.errors += 1
+                print(f"❌ Sensor tick failed: {e}")
+
+            next_tick += self.interval
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                # Tick took longer than the interval: skip ahead instead of bursting
+                self.overruns += 1
+                next_tick = time.monotonic()
+                delay = 0
+            self._stop_event.wait(delay)
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
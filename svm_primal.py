@@ -0,0 +1,127 @@
+"""
+Primal Linear SVM for Coal Mine Risk Inference
+Folds StandardScaler + linear-kernel SVC into one weight matrix
+
+The trained SVC (kernel="linear") keeps 434 support vectors and evaluates
+kernels against them at prediction time, after a separate StandardScaler
+step. For a linear kernel all of that collapses to
+
+    decision = x @ W.T + b,   W = coef_ / scale_,   b = intercept_ - W @ mean_
+
+SVC is one-vs-one, so W has one row per class pair (15 x 128 for 6
+classes), not one per class. sklearn's "ovr" decision_function is then a
+fixed function of those pair decisions (votes plus bounded confidences), which
+is two small matrix products against the pair/class incidence matrix:
+
+    sums  = decision @ A              A[k, i] = +1, A[k, j] = -1 for pair (i, j)
+    votes = base + (decision >= 0) @ A
+    ovr   = votes + sums / (3 * (|sums| + 1))
+
+predict() uses the votes alone, like libsvm, so it can differ from the argmax
+of the ovr decision when two classes tie on votes.
+
+The folded arrays are stored with the other models by model_artifacts.py;
+test_svm_primal.py checks them against the pickled scaler + SVC.
+"""
+
+from itertools import combinations
+
+import numpy as np
+
+MODEL_DIR = "model results"
+
+
+def pair_incidence(n_classes):
+    """(pairs, classes) matrix with +1 / -1 for the two classes of each pair"""
+    pairs = list(combinations(range(n_classes), 2))
+    incidence = np.zeros((len(pairs), n_classes))
+    for k, (i, j) in enumerate(pairs):
+        incidence[k, i] = 1.0
+        incidence[k, j] = -1.0
+    return incidence
+
+
+class PrimalSVM:
+    """Pure-NumPy replacement for scaler.transform + SVC.decision_function"""
+
+    def __init__(self, weights, bias, classes):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.bias = np.asarray(bias, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        n_classes = len(self.classes)
+        self.incidence = pair_incidence(n_classes)
+        # Class j collects a vote from every pair (i, j) it loses as "second"
+        self.base_votes = np.arange(n_classes, dtype=np.float64)
+        if self.weights.shape[0] != len(self.incidence):
+            raise ValueError(
+                f"{self.weights.shape[0]} weight rows for {n_classes} classes, "
+                f"expected {len(self.incidence)} one-vs-one pairs"
+            )
+
+    @classmethod
+    def fold(cls, svm, scaler=None):
+        """Fold a fitted StandardScaler into a fitted linear-kernel SVC"""
+        if svm.kernel != "linear":
+            raise ValueError(f"only linear kernels fold, got {svm.kernel!r}")
+        weights = np.asarray(svm.coef_, dtype=np.float64)
+        bias = np.asarray(svm.intercept_, dtype=np.float64)
+        if scaler is not None:
+            scale = scaler.scale_ if scaler.with_std else 1.0
+            weights = weights / scale
+            if scaler.with_mean:
+                bias = bias - weights @ scaler.mean_
+        return cls(weights, bias, svm.classes_)
+
+    def decision_ovo(self, x):
+        """(samples, pairs) one-vs-one decisions on unscaled features"""
+        return x @ self.weights.T + self.bias
+
+    def decision_function(self, x):
+        """Same values as SVC.decision_function with decision_function_shape="ovr" """
+        decision = self.decision_ovo(x)
+        sums = decision @ self.incidence
+        votes = (decision >= 0) @ self.incidence
+        votes += self.base_votes
+        votes += sums / (3 * (np.abs(sums) + 1))
+        return votes
+
+    def predict(self, x):
+        """Same labels as SVC.predict: most one-vs-one votes, ties to the lower class"""
+        votes = (self.decision_ovo(x) > 0) @ self.incidence
+        votes += self.base_votes
+        return self.classes[votes.argmax(axis=1)]
+
+
+def benchmark(model_dir=MODEL_DIR, repeats=200):
+    """Time the pickled scaler + SVC against PrimalSVM, single rows and batches"""
+    import time
+
+    from inference import DatasetReplay, load_artifacts
+
+    artifacts = load_artifacts(model_dir, optional=False)
+    svm, scaler = artifacts["svm"], artifacts["svm_scaler"]
+    if hasattr(scaler, "feature_names_in_"):
+        del scaler.feature_names_in_  # plain arrays below
+    primal = PrimalSVM.fold(svm, scaler)
+    features = DatasetReplay().features
+    x = features[np.random.default_rng(20).integers(len(features), size=10000)]
+
+    for batch in (1, 10000):
+        rows = x[:batch]
+        for label, fn in (
+            ("sklearn", lambda: svm.decision_function(scaler.transform(rows))),
+            ("primal", lambda: primal.decision_function(rows)),
+        ):
+            runs = repeats if batch == 1 else 5
+            started = time.perf_counter()
+            for _ in range(runs):
+                fn()
+            elapsed = (time.perf_counter() - started) / runs
+            print(
+                f"⏱️  {label:>7}, batch {batch:>5}: {elapsed * 1e3:.3f} ms "
+                f"({elapsed / batch * 1e6:.2f} µs/sample)"
+            )
+
+
+if __name__ == "__main__":
+    benchmark()
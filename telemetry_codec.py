@@ -0,0 +1,137 @@
+"""
+Compact Binary Telemetry Codec for Coal Mine Safety Helmets
+Fixed-layout frames as a bandwidth-friendly alternative to JSON payloads
+
+Frame layout (version 1, little-endian, 22 bytes):
+    offset  size  field
+    0       1     magic      0xCB (never a valid first byte of a JSON payload)
+    1       1     version    1
+    2       2     helmet     uint16, numeric part of "HELMET_###"
+    4       4     time_s     uint32 Unix epoch seconds (0 = unknown)
+    8       2     time_ms    uint16 milliseconds
+    10      12    channels   6 x int16: co2, ch4, o2, h2s, temp, humidity,
+                             each multiplied by CHANNEL_SCALES and rounded
+
+Several frames may be concatenated in one payload. The encoder only needs
+`struct`, so this file can be copied as-is onto MicroPython helmets; the
+decoder uses numpy.frombuffer to unpack many frames in one call.
+"""
+
+try:
+    import struct
+except ImportError:  # MicroPython
+    import ustruct as struct
+
+try:
+    import numpy as np
+except ImportError:  # MicroPython helmets only need the encoder
+    np = None
+
+FRAME_MAGIC = 0xCB
+FRAME_VERSION = 1
+FRAME_FORMAT = "<BBHIH6h"
+FRAME_SIZE = struct.calcsize(FRAME_FORMAT)
+
+CHANNELS = ("co2", "ch4", "o2", "h2s", "temp", "humidity")
+
+# Fixed-point scale per channel (resolution / int16 range)
+CHANNEL_SCALES = (
+    10,  # co2: 0.1 ppm, up to 3276.7 ppm
+    1000,  # ch4: 0.001 %, up to 32.767 %
+    100,  # o2: 0.01 %
+    100,  # h2s: 0.01 ppm, up to 327.67 ppm
+    100,  # temp: 0.01 °C
+    100,  # humidity: 0.01 %
+)
+
+HELMET_PREFIX = "HELMET_"
+
+if np is not None:
+    FRAME_DTYPE = np.dtype(
+        [
+            ("magic", "u1"),
+            ("version", "u1"),
+            ("helmet", "<u2"),
+            ("time_s", "<u4"),
+            ("time_ms", "<u2"),
+            ("channels", "<i2", (len(CHANNELS),)),
+        ]
+    )
+    SCALES = np.array(CHANNEL_SCALES, dtype=np.float32)
+
+
+def helmet_number(helmet_id):
+    """'HELMET_007' -> 7; raises ValueError for ids that cannot be encoded"""
+    if not helmet_id.startswith(HELMET_PREFIX):
+        raise ValueError("helmet id not encodable: " + helmet_id)
+    number = int(helmet_id[len(HELMET_PREFIX) :])
+    if not 0 <= number <= 0xFFFF:
+        raise ValueError("helmet number out of range: " + helmet_id)
+    return number
+
+
+def helmet_id_from_number(number):
+    """7 -> 'HELMET_007'"""
+    return "%s%03d" % (HELMET_PREFIX, number)
+
+
+def _scaled(value, scale):
+    scaled = int(round(value * scale))
+    return max(-32768, min(32767, scaled))
+
+
+def encode_frame(helmet_id, readings, timestamp=0):
+    """Pack one reading dict into a binary frame (MicroPython compatible)
+
+    timestamp is Unix epoch seconds (float); 0 lets the server stamp it.
+    """
+    seconds = int(timestamp)
+    millis = int((timestamp - seconds) * 1000)
+    fields = [FRAME_MAGIC, FRAME_VERSION, helmet_number(helmet_id), seconds, millis]
+    for name, scale in zip(CHANNELS, CHANNEL_SCALES):
+        fields.append(_scaled(readings.get(name, 0), scale))
+    return struct.pack(FRAME_FORMAT, *fields)
+
+
+def is_binary_payload(payload):
+    """True if the payload starts with a binary telemetry frame"""
+    return len(payload) >= 1 and payload[0] == FRAME_MAGIC
+
+
+def decode_frames(buffer):
+    """Vectorized decode of one or more concatenated frames
+
+    Returns (helmet_numbers, timestamps, values):
+    - helmet_numbers: (n,) uint16
+    - timestamps: (n,) float64 epoch seconds (0 where the sender had no clock)
+    - values: (n, 6) float32 in CHANNELS order
+    Raises ValueError on truncated buffers, bad magic or unknown versions.
+    """
+    if len(buffer) % FRAME_SIZE:
+        raise ValueError("payload is not a whole number of telemetry frames")
+
+    frames = np.frombuffer(buffer, dtype=FRAME_DTYPE)
+    if frames.size and (
+        (frames["magic"] != FRAME_MAGIC).any()
+        or (frames["version"] != FRAME_VERSION).any()
+    ):
+        raise ValueError("unsupported telemetry frame header")
+
+    timestamps = frames["time_s"] + frames["time_ms"] / 1000.0
+    values = frames["channels"] / SCALES
+    return frames["helmet"].copy(), timestamps, values.astype(np.float32)
+
+
+def decode_readings(buffer):
+    """Decode frames into the JSON-style reading dicts used elsewhere"""
+    numbers, timestamps, values = decode_frames(buffer)
+    readings = []
+    for number, timestamp, row in zip(numbers.tolist(), timestamps.tolist(), values):
+        reading = {"helmet_id": helmet_id_from_number(number)}
+        reading.update(
+            (name, round(float(value), 3)) for name, value in zip(CHANNELS, row)
+        )
+        if timestamp:
+            reading["timestamp"] = timestamp
+        readings.append(reading)
+    return readings
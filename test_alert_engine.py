@@ -0,0 +1,130 @@
+"""
+AlertEngine trigger points and hysteresis on ThresholdEngine levels
+Run with: python -m pytest test_alert_engine.py
+"""
+
+import numpy as np
+
+from alert_engine import CLEAR_TICKS, Alert, AlertEngine, AlertStore
+from sensor_store import SENSOR_CHANNELS
+from threshold_engine import CAUTION, WARNING, ThresholdEngine
+
+HELMETS = ("HELMET_001", "HELMET_002")
+SAFE_READING = {
+    "co2": 420,
+    "ch4": 0.5,
+    "o2": 20.9,
+    "h2s": 2,
+    "temp": 25,
+    "humidity": 60,
+}
+
+
+def tick(engine, thresholds, readings, now):
+    values = np.array([[r[c] for c in SENSOR_CHANNELS] for r in readings], float)
+    return engine.update(HELMETS, thresholds.classify(values), values, now)
+
+
+def open_channels(engine, helmet_id):
+    return sorted(alert.channel for alert in engine.open_alerts(helmet_id))
+
+
+def test_low_oxygen_alerts_below_safe_minimum():
+    """O2 alarms below 19.5% (CAUTION), as the dashboard always has"""
+    thresholds = ThresholdEngine(SENSOR_CHANNELS)
+    engine = AlertEngine(SENSOR_CHANNELS, dict.fromkeys(HELMETS, "Tunnel A-1"))
+    assert thresholds.classify_value("o2", 19.4) == CAUTION
+
+    tick(engine, thresholds, [{**SAFE_READING, "o2": 19.6}, SAFE_READING], 0.0)
+    assert open_channels(engine, "HELMET_001") == []
+
+    changed = tick(
+        engine, thresholds, [{**SAFE_READING, "o2": 19.4}, SAFE_READING], 1.0
+    )
+    assert [(a.helmet_id, a.channel, a.level) for a in changed] == [
+        ("HELMET_001", "o2", CAUTION)
+    ]
+
+
+def test_other_channels_alert_from_warning():
+    """CAUTION on any other channel is not an alert yet"""
+    thresholds = ThresholdEngine(SENSOR_CHANNELS)
+    engine = AlertEngine(SENSOR_CHANNELS, dict.fromkeys(HELMETS, "Tunnel A-1"))
+
+    tick(engine, thresholds, [{**SAFE_READING, "co2": 600}, SAFE_READING], 0.0)
+    assert open_channels(engine, "HELMET_001") == []
+
+    tick(engine, thresholds, [{**SAFE_READING, "co2": 900}, SAFE_READING], 1.0)
+    assert open_channels(engine, "HELMET_001") == ["co2"]
+    assert engine.open_alerts("HELMET_001")[0].level == WARNING
+
+
+def test_alert_closes_after_clear_ticks_quiet_ticks():
+    """A value hovering around the threshold keeps one alert open"""
+    thresholds = ThresholdEngine(SENSOR_CHANNELS)
+    engine = AlertEngine(SENSOR_CHANNELS, dict.fromkeys(HELMETS, "Tunnel A-1"))
+    high = [{**SAFE_READING, "co2": 900}, SAFE_READING]
+    quiet = [SAFE_READING, SAFE_READING]
+
+    tick(engine, thresholds, high, 0.0)
+    (alert,) = engine.open_alerts("HELMET_001")
+    for now in range(1, CLEAR_TICKS):
+        tick(engine, thresholds, quiet, float(now))
+    tick(engine, thresholds, high, float(CLEAR_TICKS))  # flaps back: no new alert
+    assert [a.alert_id for a in engine.open_alerts("HELMET_001")] == [alert.alert_id]
+
+    for now in range(CLEAR_TICKS + 1, 2 * CLEAR_TICKS):
+        tick(engine, thresholds, quiet, float(now))
+    assert alert.is_open
+    changed = tick(engine, thresholds, quiet, float(2 * CLEAR_TICKS))
+    assert changed == [alert]
+    assert not alert.is_open
+    assert alert.closed_at == 2 * CLEAR_TICKS
+    assert engine.stats()["opened"] == engine.stats()["closed"] == 1
+
+
+def test_level_changes_update_severity_and_peak():
+    thresholds = ThresholdEngine(SENSOR_CHANNELS)
+    engine = AlertEngine(SENSOR_CHANNELS, dict.fromkeys(HELMETS, "Tunnel A-1"))
+    tick(engine, thresholds, [{**SAFE_READING, "co2": 900}, SAFE_READING], 0.0)
+    tick(engine, thresholds, [{**SAFE_READING, "co2": 5000}, SAFE_READING], 1.0)
+    tick(engine, thresholds, [{**SAFE_READING, "co2": 900}, SAFE_READING], 2.0)
+    (alert,) = engine.open_alerts("HELMET_001")
+    assert alert.level == WARNING
+    assert alert.peak_level > WARNING
+    assert alert.value == 900
+
+
+def test_open_alerts_escalate_every_period():
+    thresholds = ThresholdEngine(SENSOR_CHANNELS)
+    engine = AlertEngine(
+        SENSOR_CHANNELS, dict.fromkeys(HELMETS, "Tunnel A-1"), escalation_time=10
+    )
+    high = [{**SAFE_READING, "h2s": 50}, SAFE_READING]
+    tick(engine, thresholds, high, 0.0)
+    (alert,) = engine.open_alerts("HELMET_001")
+
+    tick(engine, thresholds, high, 9.0)
+    assert alert.escalations == 0
+    assert tick(engine, thresholds, high, 10.0) == [alert]
+    assert alert.escalations == 1
+    tick(engine, thresholds, high, 25.0)
+    assert alert.escalations == 2
+
+
+def test_store_evicts_closed_alerts_first_and_queries_by_zone():
+    store = AlertStore(capacity=3)
+    alerts = [
+        Alert(i, f"HELMET_00{i}", "co2", zone, WARNING, 900.0, 0.0)
+        for i, zone in enumerate(["Tunnel A-1", "Tunnel B-1", "Tunnel B-2"], 1)
+    ]
+    for alert in alerts:
+        store.add(alert)
+    store.close(alerts[1], 1.0)
+    store.add(Alert(4, "HELMET_004", "ch4", "Tunnel B-1", WARNING, 1.5, 2.0))
+
+    assert 2 not in store.alerts
+    assert store.stats()["evicted"] == 1
+    assert [a.alert_id for a in store.query(zone="Tunnel B")] == [4, 3]
+    assert [a.alert_id for a in store.query(zone="Tunnel B-1", open_only=True)] == [4]
+    assert store.query(helmet_id="HELMET_002") == []
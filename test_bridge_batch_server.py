@@ -0,0 +1,156 @@
+"""
+Batch ingestion endpoint: body formats, coalesced publishes and HTTP handling
+Run with: python -m pytest test_bridge_batch_server.py
+"""
+
+import asyncio
+import http.client
+import json
+import socket
+import time
+
+import pytest
+
+import bridge_batch_server
+from bridge_batch_server import BatchPublisher, BatchServer, parse_batch_body
+from telemetry_codec import decode_readings, encode_frame
+
+READING = {"helmet_id": "HELMET_001", "co2": 450.0, "ch4": 1.2, "o2": 20.5}
+
+
+def recorder():
+    """publish() stand-in: keeps every payload and reports success"""
+    published = []
+
+    def publish(payload):
+        published.append(payload)
+        return True
+
+    return published, publish
+
+
+def frames(n):
+    return b"".join(encode_frame(f"HELMET_{i:03d}", READING) for i in range(1, n + 1))
+
+
+def test_json_array_keeps_valid_readings():
+    body = json.dumps([READING, {"co2": 1}, {**READING, "o2": "low"}, READING])
+    readings, binary, rejected, errors = parse_batch_body(
+        body.encode(), "application/json"
+    )
+    assert len(readings) == 2 and binary == b""
+    assert rejected == 2
+    assert errors == ["reading 1: missing helmet_id", "reading 2: o2 is not a number"]
+    assert all("timestamp" in r for r in readings)
+
+
+def test_ndjson_and_binary_bodies():
+    body = b"\n".join([json.dumps(READING).encode(), b"{oops", b"", b"{}"])
+    readings, _, rejected, errors = parse_batch_body(body, "application/x-ndjson")
+    assert len(readings) == 1
+    assert rejected == 2
+    assert errors[0] == "line 2: invalid JSON"
+
+    assert parse_batch_body(frames(3), "application/octet-stream")[1:] == (
+        frames(3),
+        0,
+        [],
+    )
+    assert parse_batch_body(frames(3)[:-1], "application/octet-stream")[2] == 1
+    assert parse_batch_body(b"[1, 2", "application/json")[2:] == (
+        1,
+        ["body is not valid JSON"],
+    )
+
+
+def test_publisher_coalesces_readings_per_message():
+    published, publish = recorder()
+
+    async def scenario():
+        publisher = BatchPublisher(publish, max_readings=3, max_delay=0.05)
+        task = publisher.start()
+        assert publisher.offer([READING] * 7, frames(2)) == 9
+        while publisher.published_readings < 9:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        return publisher
+
+    publisher = asyncio.run(scenario())
+    kinds = [
+        len(json.loads(p)) if p[:1] == b"[" else -len(decode_readings(p))
+        for p in published
+    ]
+    assert kinds == [3, 3, 1, -2]  # JSON arrays, then the frames as one message
+    assert publisher.stats()["published_messages"] == 4
+
+
+def test_routes_and_status_codes(monkeypatch):
+    monkeypatch.setattr(bridge_batch_server, "QUEUE_MAX_READINGS", 2)
+
+    async def scenario():
+        server = BatchServer(BatchPublisher(lambda p: True), lambda: {"mqtt": True})
+        server.publisher.start().cancel()  # nothing drains the queue
+        body = json.dumps([READING] * 3).encode()
+        return [
+            await server.route("POST", "/sensor_data/batch", {}, body),
+            await server.route("POST", "/sensor_data/batch", {}, body),
+            await server.route("POST", "/sensor_data/batch", {}, b"[{}]"),
+            await server.route("GET", "/sensor_data/batch", {}, b""),
+            await server.route("GET", "/nowhere", {}, b""),
+            await server.route("GET", "/status?x=1", {}, b""),
+        ]
+
+    results = asyncio.run(scenario())
+    (status, first), (queue_full, second) = results[:2]
+    assert (status, first["accepted"], first["rejected"]) == (200, 2, 1)
+    assert first["errors"] == ["1 reading(s) dropped: queue full"]
+    assert queue_full == 503 and second["accepted"] == 0
+    assert [status for status, _ in results[2:]] == [400, 405, 404, 200]
+    status_payload = results[5][1]
+    assert status_payload["mqtt"] is True
+    assert status_payload["batch_server"]["accepted"] == 2
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_http_keep_alive_and_bad_requests():
+    published, publish = recorder()
+    server = BatchServer(BatchPublisher(publish), host="127.0.0.1", port=free_port())
+    server.start_in_thread()
+    deadline = time.monotonic() + 5
+    while True:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+            conn.connect()
+            break
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.02)
+
+    for _ in range(2):  # same connection, two requests
+        conn.request(
+            "POST",
+            "/sensor_data/batch",
+            frames(4),
+            {"Content-Type": "application/octet-stream"},
+        )
+        response = conn.getresponse()
+        assert response.status == 200
+        assert json.loads(response.read())["accepted"] == 4
+    conn.close()
+
+    raw = socket.create_connection(("127.0.0.1", server.port), timeout=5)
+    raw.sendall(b"POST /sensor_data/batch HTTP/1.1\r\nHost: x\r\n\r\n")
+    assert raw.recv(1024).startswith(b"HTTP/1.1 411 Length Required")
+    raw.close()
+
+    # The server thread is a daemon with no shutdown, as in the bridge
+    deadline = time.monotonic() + 5
+    while server.publisher.published_readings < 8 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sum(len(decode_readings(p)) for p in published) == 8
@@ -0,0 +1,122 @@
+"""
+Bridge spool: ordering, persistence across restarts, bounded disk, drain rate
+Run with: python -m pytest test_bridge_spool.py
+"""
+
+import time
+
+import pytest
+
+import bridge_spool
+from bridge_spool import Spool, SpoolDrainer
+
+SEGMENT_BYTES = 4096
+
+
+def payloads(n, start=0):
+    return [f'{{"seq": {i}}}'.encode() for i in range(start, start + n)]
+
+
+def drain(spool, max_records=1000):
+    records, position = spool.peek(max_records)
+    spool.commit(position, len(records))
+    return records
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=SEGMENT_BYTES, max_bytes=8 * 4096)
+    yield spool
+    spool.close()
+
+
+def test_fifo_order_across_segments(spool):
+    sent = payloads(500)
+    assert all(spool.append(p) for p in sent)
+    assert spool.stats()["segments"] > 1
+    assert spool.depth() == 500
+    assert drain(spool, 200) + drain(spool) == sent
+    assert spool.depth() == 0
+    assert spool.stats()["segments"] == 1  # fully read segments are deleted
+
+
+def test_peek_without_commit_replays(spool):
+    for p in payloads(3):
+        spool.append(p)
+    first, _ = spool.peek(10)
+    again, position = spool.peek(2)
+    assert again == first[:2]
+    spool.commit(position, 2)
+    assert drain(spool) == first[2:]
+
+
+def test_backlog_and_cursor_survive_restart(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=SEGMENT_BYTES)
+    for p in payloads(300):
+        spool.append(p)
+    assert len(drain(spool, 120)) == 120
+    spool.close()
+
+    reopened = Spool(str(tmp_path), segment_bytes=SEGMENT_BYTES)
+    try:
+        assert reopened.depth() == 180
+        reopened.append(b"after restart")
+        assert drain(reopened) == payloads(180, start=120) + [b"after restart"]
+    finally:
+        reopened.close()
+
+
+def test_disk_bound_drops_oldest(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=SEGMENT_BYTES, max_bytes=2 * 4096)
+    try:
+        sent = payloads(2000)
+        for p in sent:
+            spool.append(p)
+        stats = spool.stats()
+        assert stats["disk_bytes"] <= stats["max_disk_bytes"]
+        assert stats["dropped"] > 0
+        kept = drain(spool, len(sent))
+        assert len(kept) + stats["dropped"] == len(sent)
+        assert kept == sent[-len(kept) :]  # only the oldest were lost
+    finally:
+        spool.close()
+
+
+def test_oversized_payload_is_rejected(spool):
+    assert not spool.append(b"x" * SEGMENT_BYTES)
+    assert spool.stats()["rejected"] == 1
+    assert spool.depth() == 0
+
+
+def test_drain_rate_follows_ingress(spool, monkeypatch):
+    monkeypatch.setattr(bridge_spool, "INGRESS_WINDOW", 0.0)
+    drainer = SpoolDrainer(spool, lambda p: True, lambda: True, rate=10)
+    drainer._measured_at = time.monotonic() - 1.0
+    for p in payloads(1000):
+        spool.append(p)
+    assert drainer._update_rate_limit() > 10 * drainer.rate
+    assert drainer.rate_limit >= drainer.headroom * drainer.ingress_rate
+
+
+def test_drainer_publishes_in_order_and_stops_on_failure(spool):
+    sent = payloads(20)
+    for p in sent:
+        spool.append(p)
+    published = []
+
+    def publish(payload):
+        if len(published) == 15:
+            return False  # broker went away mid-chunk
+        published.append(payload)
+        return True
+
+    drainer = SpoolDrainer(spool, publish, lambda: True, rate=10_000, chunk=8)
+    drainer.start()
+    deadline = time.monotonic() + 5
+    while drainer.drained < 15 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    drainer.stop(timeout=2)
+
+    assert published == sent[:15]
+    assert spool.depth() == 5  # unsent records stay spooled
+    assert drain(spool) == sent[15:]
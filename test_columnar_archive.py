@@ -0,0 +1,94 @@
+"""
+Columnar archive: day partitions, range and helmet filters, torn writes
+Run with: python -m pytest test_columnar_archive.py
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from columnar_archive import DAY_MS, ArchiveReader, ArchiveWriter, read_header
+from sensor_store import SensorStore
+
+DAY_START = 20_000 * DAY_MS  # 2024-10-04 00:00 UTC
+HOUR_MS = 3600 * 1000
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / "archive")
+
+
+def fill(root, stamps):
+    """One flush from a store: helmets 1-3, co2 = index of the tick"""
+    store = SensorStore(capacity=10, max_helmets=3)
+    writer = ArchiveWriter(root)
+    writer.attach_store(store)
+    rows = store.rows_for(["HELMET_001", "HELMET_002", "HELMET_003"])
+    for i, stamp in enumerate(stamps):
+        store.append_many(rows, np.full((3, 6), float(i), np.float32), stamp)
+    writer.flush()
+    return writer
+
+
+def test_range_read_across_a_day_boundary(root):
+    stamps = [DAY_START - 2 * HOUR_MS, DAY_START - HOUR_MS, DAY_START, DAY_START + 1]
+    fill(root, stamps)
+    reader = ArchiveReader(root)
+    assert reader.days() == ["2024-10-03", "2024-10-04"]
+
+    data = reader.read(DAY_START - HOUR_MS, DAY_START + 1)
+    np.testing.assert_array_equal(data["ts"], np.repeat(stamps[1:3], 3))
+    np.testing.assert_array_equal(data["co2"], np.repeat([1.0, 2.0], 3))
+    assert data["co2"].dtype == np.float32
+    assert data["helmet_id"].tolist() == ["HELMET_001", "HELMET_002", "HELMET_003"] * 2
+
+
+def test_helmet_and_channel_filters(root):
+    fill(root, [DAY_START + i * 1000 for i in range(5)])
+    data = ArchiveReader(root).read(
+        DAY_START, DAY_START + DAY_MS, channels=["o2"], helmet_ids=["HELMET_002"]
+    )
+    assert set(data) == {"ts", "helmet_id", "o2"}
+    assert data["helmet_id"].tolist() == ["HELMET_002"] * 5
+    np.testing.assert_array_equal(data["o2"], np.arange(5))
+
+    empty = ArchiveReader(root).read(DAY_START, DAY_START + DAY_MS, ["o2"], ["NOPE"])
+    assert len(empty["ts"]) == 0
+
+
+def test_appends_and_late_batches(root):
+    writer = fill(root, [DAY_START + 5000])
+    writer.add(["HELMET_004"], [DAY_START + 1000], np.full((1, 6), 9.0))
+    writer.flush()
+
+    header = read_header(os.path.join(root, "2024-10-04", "ts.seg"))
+    assert header["count"] == 4
+    assert header["flags"] == 0  # no longer sorted: read() must scan
+    assert header["min_ts"] == DAY_START + 1000
+
+    data = ArchiveReader(root).read(DAY_START, DAY_START + 2000)
+    assert data["helmet_id"].tolist() == ["HELMET_004"]
+    assert data["co2"].tolist() == [9.0]
+
+
+def test_records_past_the_ts_count_are_invisible_and_overwritten(root):
+    """A crash after the channel columns but before ts.seg loses nothing else"""
+    writer = fill(root, [DAY_START])
+    with open(os.path.join(root, "2024-10-04", "co2.seg"), "ab") as f:
+        f.write(np.full(3, 777.0, np.float32).tobytes())  # torn record
+
+    data = ArchiveReader(root).read(DAY_START, DAY_START + DAY_MS)
+    assert data["co2"].tolist() == [0.0] * 3
+
+    writer.add(["HELMET_001"], [DAY_START + 1], np.full((1, 6), 5.0))
+    writer.flush()
+    data = ArchiveReader(root).read(DAY_START, DAY_START + DAY_MS)
+    assert data["co2"].tolist() == [0.0, 0.0, 0.0, 5.0]
+
+
+def test_missing_archive_reads_empty(tmp_path):
+    reader = ArchiveReader(str(tmp_path / "nothing"))
+    assert reader.days() == []
+    assert len(reader.read(0, DAY_MS)["ts"]) == 0
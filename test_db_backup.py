@@ -0,0 +1,102 @@
+"""
+Online backups: stepped copies, interleaved writes, rotation and step budget
+Run with: python -m pytest test_db_backup.py
+"""
+
+import os
+import sqlite3
+
+import pytest
+
+from db_backup import (
+    MIN_BACKUP_PAGES,
+    BackupScheduler,
+    finish_backup,
+    online_backup,
+    rotate_backups,
+)
+from persistence import INSERT_READING, SCHEMA, PersistenceWriter, connect
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / "coal_mine.db"))
+    conn.executescript(SCHEMA)
+    with conn:
+        conn.executemany(
+            INSERT_READING,
+            [
+                (f"HELMET_{i % 10:03d}", i, 400.0, 1.0, 20.9, 2.0, 25.0, 60.0)
+                for i in range(5000)
+            ],
+        )
+    yield conn
+    conn.close()
+
+
+def count(path):
+    backup = sqlite3.connect(path)
+    try:
+        return backup.execute("SELECT count(*) FROM readings").fetchone()[0]
+    finally:
+        backup.close()
+
+
+def test_copy_is_stepped_and_includes_interleaved_writes(conn, tmp_path):
+    target = str(tmp_path / "backup.db")
+    written = []
+
+    def between_steps():
+        with conn:
+            conn.execute(INSERT_READING, ("HELMET_999", 10**6, 0, 0, 0, 0, 0, 0))
+        written.append(1)
+
+    report = online_backup(conn, target, pages=8, between_steps=between_steps)
+    assert report["steps"] == len(written) > 1
+    assert report["pages_per_step"] == 8
+    assert not os.path.exists(target)  # only the .tmp until finish_backup
+
+    finish_backup(report)
+    assert os.path.exists(target) and "partial" not in report
+    # The last callback follows the final step: that write is after the copy
+    assert count(target) == 5000 + len(written) - 1
+
+
+def test_over_budget_is_flagged(conn, tmp_path):
+    report = online_backup(conn, str(tmp_path / "b.db"), pages=8, budget_ms=0.0)
+    assert report["over_budget"]
+    assert report["max_step_ms"] >= report["median_step_ms"] > 0
+
+
+def test_rotation_keeps_the_newest(tmp_path):
+    names = [f"coal_mine_data-2026010{i}-000000.db" for i in range(1, 6)]
+    for name in names + ["notes.txt"]:
+        (tmp_path / name).write_bytes(b"")
+    deleted = rotate_backups(str(tmp_path), keep=2)
+    assert sorted(os.path.basename(p) for p in deleted) == names[:3]
+    assert sorted(os.listdir(tmp_path)) == names[3:] + ["notes.txt"]
+
+
+def test_scheduler_backs_up_through_the_writer_and_adapts_pages(tmp_path):
+    writer = PersistenceWriter(str(tmp_path / "coal_mine.db"), flush_interval=0.05)
+    writer.start()
+    try:
+        writer.submit_readings(["HELMET_001"] * 100, range(100), [[1] * 6] * 100)
+        scheduler = BackupScheduler(
+            writer, directory=str(tmp_path / "backups"), pages=16, budget_ms=1e9
+        )
+        report = scheduler.backup_now(timeout=30)
+    finally:
+        writer.stop(timeout=5)
+    assert os.path.exists(report["path"])
+    assert scheduler.stats()["backups"] == 1
+
+    scheduler._adapt_pages({"over_budget": True, "max_step_ms": 50.0})
+    scheduler._adapt_pages({"over_budget": True, "max_step_ms": 50.0})
+    assert scheduler.pages == 4 == MIN_BACKUP_PAGES
+    scheduler._adapt_pages({"over_budget": True, "max_step_ms": 50.0})
+    assert scheduler.pages == MIN_BACKUP_PAGES
+    assert scheduler.over_budget == 3
+    for _ in range(5):
+        scheduler._adapt_pages({"over_budget": False, "max_step_ms": 0.1})
+    assert scheduler.pages == 16
@@ -0,0 +1,131 @@
+"""
+EvacuationEvaluator zone decisions and incremental updates from level deltas
+Run with: python -m pytest test_evacuation.py
+"""
+
+import numpy as np
+import pytest
+
+from evacuation import EvacuationEvaluator
+from sensor_store import SENSOR_CHANNELS
+from threshold_engine import CRITICAL, ThresholdEngine
+
+HELMET_ZONES = {
+    "HELMET_001": "Tunnel A-1",
+    "HELMET_002": "Tunnel A-1",
+    "HELMET_003": "Tunnel A-1",
+    "HELMET_004": "Tunnel B-1",
+    "HELMET_005": "Tunnel B-1",
+    "HELMET_006": "Mars Base",
+}
+SAFE_READING = {
+    "co2": 420,
+    "ch4": 0.5,
+    "o2": 20.9,
+    "h2s": 2,
+    "temp": 25,
+    "humidity": 60,
+}
+CH4 = SENSOR_CHANNELS.index("ch4")
+
+
+@pytest.fixture
+def thresholds():
+    return ThresholdEngine(SENSOR_CHANNELS)
+
+
+@pytest.fixture
+def evaluator(thresholds):
+    return EvacuationEvaluator(SENSOR_CHANNELS, HELMET_ZONES, engine=thresholds)
+
+
+def fleet(**overrides):
+    """(helmets, channels) values; overrides map helmet number -> reading changes"""
+    readings = [dict(SAFE_READING) for _ in HELMET_ZONES]
+    for key, changes in overrides.items():
+        readings[int(key[1:]) - 1].update(changes)
+    return np.array([[r[c] for c in SENSOR_CHANNELS] for r in readings], float)
+
+
+def test_methane_past_trigger_evacuates_only_its_zone(thresholds, evaluator):
+    evaluator.update(thresholds.classify(fleet(h4={"ch4": 2.5})), now=0.0)
+    assert evaluator.evacuating_zones() == []  # at the trigger, not past it
+
+    (event,) = evaluator.update(thresholds.classify(fleet(h4={"ch4": 2.6})), now=1.0)
+    assert (event.zone, event.evacuate, event.reasons) == (
+        "Tunnel B-1",
+        True,
+        ("methane",),
+    )
+    assert evaluator.evacuating_zones() == ["Tunnel B-1"]
+    assert evaluator.zone_status("Tunnel B-1")["counts"]["methane"] == 1
+
+    (event,) = evaluator.update(thresholds.classify(fleet()), now=2.0)
+    assert (event.zone, event.evacuate) == ("Tunnel B-1", False)
+    assert evaluator.evacuating_zones() == []
+
+
+def test_multiple_warnings_in_one_zone(thresholds, evaluator):
+    warning = {"co2": 900}
+    evaluator.update(thresholds.classify(fleet(h1=warning, h2=warning, h4=warning)))
+    assert evaluator.evacuating_zones() == []
+
+    (event,) = evaluator.update(
+        thresholds.classify(fleet(h1=warning, h2=warning, h3=warning, h4=warning))
+    )
+    assert event.zone == "Tunnel A-1"
+    assert event.reasons == ("multiple_warnings",)
+
+
+def test_low_oxygen_evacuates_but_offline_helmets_do_not(thresholds, evaluator):
+    offline = dict.fromkeys(SENSOR_CHANNELS, 0)
+    evaluator.update(thresholds.classify(fleet(h1=offline, h6={"o2": 17.5})))
+    assert evaluator.evacuating_zones() == ["Unknown"]
+    assert evaluator.zone_status("Unknown")["reasons"] == ("oxygen",)
+
+
+def test_only_changed_rows_are_read(thresholds, evaluator):
+    values = fleet()
+    levels = thresholds.classify(values)
+    evaluator.update(levels)
+
+    values[0, CH4] = 3.0
+    new_levels = thresholds.classify(values)
+    changed = thresholds.level_delta(new_levels, levels)
+    np.testing.assert_array_equal(changed, [0])
+
+    stale = new_levels.copy()
+    stale[1:] = CRITICAL  # rows outside the delta must be ignored
+    evaluator.update(stale, changed)
+    assert evaluator.last_changed == 1
+    assert evaluator.zone_status("Tunnel A-1")["counts"]["methane"] == 1
+    assert evaluator.evacuating_zones() == ["Tunnel A-1"]
+
+
+def test_incremental_matches_full_recompute(thresholds):
+    rng = np.random.default_rng(3)
+    incremental = EvacuationEvaluator(SENSOR_CHANNELS, HELMET_ZONES)
+    previous = None
+    for _ in range(200):
+        values = fleet()
+        values[:, CH4] = rng.choice([0.5, 1.6, 2.6], size=len(values))
+        levels = thresholds.classify(values)
+        incremental.update(levels, thresholds.level_delta(levels, previous))
+        previous = levels
+
+        full = EvacuationEvaluator(SENSOR_CHANNELS, HELMET_ZONES)
+        full.update(levels)
+        np.testing.assert_array_equal(incremental.counts, full.counts)
+        np.testing.assert_array_equal(incremental.evacuating, full.evacuating)
+
+
+def test_level_delta_and_trigger_level(thresholds):
+    levels = thresholds.classify(fleet())
+    np.testing.assert_array_equal(
+        thresholds.level_delta(levels, None), np.arange(len(levels))
+    )
+    assert len(thresholds.level_delta(levels, levels.copy())) == 0
+    assert thresholds.trigger_level("ch4", 2.5) == CRITICAL
+    assert thresholds.trigger_level("o2", 18.0) == CRITICAL
+    with pytest.raises(ValueError):
+        thresholds.trigger_level("ch4", 2.2)
@@ -0,0 +1,97 @@
+"""
+Streaming sensor-array features against a direct per-helmet computation
+Run with: python -m pytest test_feature_extractor.py
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from feature_extractor import (
+    FEATURES_PER_SENSOR,
+    N_SENSORS,
+    FeatureExtractor,
+    check_against_reference,
+    feature_names,
+)
+from sensor_store import SensorStore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def extractor():
+    return FeatureExtractor(SensorStore(capacity=10, max_helmets=4))
+
+
+def test_matches_direct_computation():
+    check_against_reference(n_helmets=6, n_samples=400)
+
+
+def test_feature_order_matches_trained_models():
+    joblib = pytest.importorskip("joblib")
+    for name in ("coal_mine_svm_feature_names.pkl", "coal_mine_nb_feature_names.pkl"):
+        path = os.path.join(HERE, "model results", name)
+        if not os.path.exists(path):
+            pytest.skip(f"{name} not available")
+        assert list(joblib.load(path)) == feature_names()
+    assert len(feature_names()) == N_SENSORS * FEATURES_PER_SENSOR == 128
+
+
+def test_step_response_features(extractor):
+    """One sensor jumps from 1000 to 1500 ohms; the rest stay flat"""
+    trace = np.full((3, N_SENSORS), 1000.0)
+    trace[1:, 0] = 1500.0
+    extractor.update(["HELMET_001"] * 3, trace)
+
+    features = extractor.features(["HELMET_001"]).reshape(N_SENSORS, -1)
+    np.testing.assert_allclose(features[0, :2], [500.0, 0.5])
+    np.testing.assert_allclose(features[0, 2:5], [0.5, 5.0, 50.0])  # a * dR
+    np.testing.assert_allclose(features[0, 5:], 0.0)
+    np.testing.assert_allclose(features[1:], 0.0)
+
+
+def test_ready_reset_and_unknown_helmets(extractor):
+    extractor.update(["HELMET_001"], np.full((1, N_SENSORS), 1000.0))
+    assert extractor.ready(["HELMET_001", "HELMET_999"]).tolist() == [False, False]
+    extractor.update(["HELMET_001"], np.full((1, N_SENSORS), 2000.0))
+    assert extractor.ready(["HELMET_001"]).tolist() == [True]
+    assert extractor.features(["HELMET_999"]).shape == (1, 128)
+    assert not extractor.features(["HELMET_999"]).any()
+
+    extractor.reset(["HELMET_001"])
+    assert extractor.ready(["HELMET_001"]).tolist() == [False]
+    extractor.update(["HELMET_001"] * 2, np.full((2, N_SENSORS), 3000.0))
+    assert not extractor.features(["HELMET_001"]).any()  # new flat baseline
+
+
+def test_fallback_fills_only_helmets_that_are_not_ready():
+    store = SensorStore(capacity=10, max_helmets=4)
+    asked = []
+
+    def fallback(helmet_ids):
+        asked.extend(helmet_ids)
+        return np.ones((len(helmet_ids), 128))
+
+    extractor = FeatureExtractor(store, fallback=fallback)
+    extractor.update(["HELMET_001"] * 2, np.full((2, N_SENSORS), 1000.0))
+    features = extractor(["HELMET_001", "HELMET_002"])
+    assert asked == ["HELMET_002"]
+    assert not features[0].any()
+    assert features[1].all()
+
+
+def test_subscribers_get_each_updated_helmet_once(extractor):
+    calls = []
+    extractor.subscribe(calls.append)
+    extractor.update(
+        ["HELMET_002", "HELMET_001", "HELMET_002"], np.ones((3, N_SENSORS))
+    )
+    assert calls == [["HELMET_002", "HELMET_001"]]
+    assert extractor.samples == 3
+
+
+def test_wrong_sensor_count_is_rejected(extractor):
+    with pytest.raises(ValueError):
+        extractor.update(["HELMET_001"], np.ones((1, N_SENSORS - 1)))
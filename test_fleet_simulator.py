@@ -0,0 +1,65 @@
+"""
+FleetSimulator: seeding, limits, offline helmets and the per-tick noise model
+Run with: python -m pytest test_fleet_simulator.py
+"""
+
+import numpy as np
+
+from fleet_simulator import BASE_SENSOR_DATA, SENSOR_LIMITS, FleetSimulator
+
+HELMET_IDS = list(BASE_SENSOR_DATA)
+
+
+def run(simulator, ticks):
+    values = simulator.step()
+    for _ in range(ticks - 1):
+        values = simulator.step(values)
+    return values
+
+
+def test_same_seed_same_series():
+    first = run(FleetSimulator.from_helmets(HELMET_IDS, seed=4), 20)
+    second = run(FleetSimulator.from_helmets(HELMET_IDS, seed=4), 20)
+    np.testing.assert_array_equal(first, second)
+    assert first.dtype == np.float32
+    assert first.shape == (len(HELMET_IDS), len(SENSOR_LIMITS))
+
+
+def test_readings_stay_within_limits_and_offline_reads_zero():
+    simulator = FleetSimulator.from_helmets(
+        HELMET_IDS, offline_ids={"HELMET_006"}, seed=1
+    )
+    values = simulator.step()
+    lower = np.array([SENSOR_LIMITS[c][0] for c in simulator.channels])
+    upper = np.array([SENSOR_LIMITS[c][1] for c in simulator.channels])
+    online = np.array([h != "HELMET_006" for h in HELMET_IDS])
+    for _ in range(500):
+        values = simulator.step(values)
+        assert ((values[online] >= lower) & (values[online] <= upper)).all()
+        assert not values[~online].any()
+    np.testing.assert_array_equal(values, np.round(values, 2))
+
+
+def test_rows_without_history_restart_from_base():
+    simulator = FleetSimulator.from_helmets(HELMET_IDS[:2], seed=2)
+    simulator.noise[:] = simulator.drift[:] = simulator.spike_chance[:] = 0
+    previous = np.full((2, len(simulator.channels)), 30.0)
+    values = simulator.step(previous, has_previous=[True, False])
+    np.testing.assert_allclose(
+        values[0], np.clip(30.0, simulator.lower, simulator.upper)
+    )
+    np.testing.assert_allclose(values[1], simulator.base[1])
+
+
+def test_step_noise_matches_variation():
+    """Tick-to-tick changes keep the noise scale of SENSOR_VARIATION"""
+    simulator = FleetSimulator.synthetic(20000, seed=3)
+    simulator.spike_chance[:] = 0
+    first = simulator.step()
+    change = simulator.step(first) - first
+    co2 = simulator.channels.index("co2")
+    expected = np.sqrt(
+        simulator.noise[co2] ** 2 + np.mean(simulator.drift[:, co2] ** 2)
+    )
+    assert abs(change[:, co2].std() / expected - 1) < 0.05
+    assert abs(change[:, co2].mean()) < 1.0
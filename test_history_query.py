@@ -0,0 +1,125 @@
+"""
+History range queries: in-database downsampling, rollups, chunks and HTTP
+Run with: python -m pytest test_history_query.py
+"""
+
+import json
+import time
+
+import pytest
+
+from history_query import HistoryQuery, parse_time_ms, register_routes
+from persistence import INSERT_READING, SCHEMA, connect
+from rollups import HOUR_MS, MINUTE_MS, rollup
+
+# An hour that ended a minute ago, aligned to the minute: raw rows still exist
+START_MS = (int(time.time() * 1000) // MINUTE_MS - 61) * MINUTE_MS
+END_MS = START_MS + HOUR_MS
+
+
+@pytest.fixture
+def history(tmp_path):
+    """Two helmets, one reading per second; co2 counts seconds into the hour"""
+    db_path = str(tmp_path / "coal_mine.db")
+    conn = connect(db_path)
+    conn.executescript(SCHEMA)
+    with conn:
+        conn.executemany(
+            INSERT_READING,
+            [
+                (helmet_id, START_MS + s * 1000, float(s), 1.0, 20.9, 2.0, 25.0, 60.0)
+                for helmet_id in ("HELMET_001", "HELMET_002")
+                for s in range(3600)
+            ],
+        )
+    rollup(conn)
+    conn.close()
+    return HistoryQuery(db_path)
+
+
+def test_raw_rows_are_downsampled_in_sqlite(history):
+    result = history.query(["HELMET_001"], ["co2"], START_MS, END_MS, points=120)
+    assert (result["table"], result["step_ms"]) == ("readings", 30_000)
+    series = result["series"]["HELMET_001"]
+    assert len(series["ts"]) == 120
+    assert series["ts"][:2] == [START_MS, START_MS + 30_000]
+    assert series["co2"][:2] == [14.5, 44.5]
+    assert (series["co2_min"][1], series["co2_max"][1]) == (30.0, 59.0)
+    assert set(series) == {"ts", "co2", "co2_min", "co2_max"}
+
+
+def test_coarse_requests_read_the_rollups(history):
+    raw = history.query(["HELMET_002"], ["co2"], START_MS, END_MS, points=120)
+    result = history.query(["HELMET_002"], ["co2"], START_MS, END_MS, points=30)
+    assert (result["table"], result["step_ms"]) == ("readings_1m", 2 * MINUTE_MS)
+    series = result["series"]["HELMET_002"]
+    assert len(series["ts"]) == 30
+    assert series["co2"][0] == pytest.approx(
+        sum(raw["series"]["HELMET_002"]["co2"][:4]) / 4
+    )
+    assert series["co2_max"][-1] == 3599.0
+
+
+def test_helmets_without_data_are_left_out(history):
+    result = history.query(["HELMET_001", "HELMET_404"], ["o2"], START_MS, END_MS)
+    assert list(result["series"]) == ["HELMET_001"]
+
+
+def test_chunks_cover_every_row(history):
+    chunks = list(
+        history.iter_chunks(
+            ["HELMET_001", "HELMET_002"], ["ch4"], START_MS, END_MS, 120, chunk_rows=50
+        )
+    )
+    assert [len(chunk) for chunk in chunks] == [50] * 4 + [40]
+    assert chunks[0][0] == {
+        "helmet_id": "HELMET_001",
+        "ts": START_MS,
+        "ch4": 1.0,
+        "ch4_min": 1.0,
+        "ch4_max": 1.0,
+    }
+    assert history.stats()["queries"] == 1
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"helmet_ids": [], "start": START_MS, "end": END_MS},
+        {"helmet_ids": ["HELMET_001"], "channels": ["co"], "start": 0, "end": END_MS},
+        {"helmet_ids": ["HELMET_001"], "start": END_MS, "end": START_MS},
+        {"helmet_ids": ["HELMET_001"], "start": "yesterday", "end": END_MS},
+    ],
+)
+def test_bad_parameters(history, kwargs):
+    with pytest.raises(ValueError):
+        history.query(**kwargs)
+
+
+def test_time_formats():
+    assert parse_time_ms(1_700_000_000) == 1_700_000_000_000
+    assert parse_time_ms("1700000000500") == 1_700_000_000_500
+    assert parse_time_ms("2023-11-14T22:13:20+00:00") == 1_700_000_000_000
+
+
+def test_http_routes(history):
+    flask = pytest.importorskip("flask")
+    server = flask.Flask(__name__)
+    register_routes(server, history)
+    client = server.test_client()
+    query = (
+        f"helmet_id=HELMET_001,HELMET_002&channels=co2&start={START_MS}&end={END_MS}"
+    )
+
+    response = client.get(f"/api/history?{query}&points=120")
+    assert response.status_code == 200
+    assert len(response.get_json()["series"]["HELMET_002"]["ts"]) == 120
+
+    response = client.get(f"/api/history?{query}&points=120&stream=1")
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 240
+    assert json.loads(lines[-1])["helmet_id"] == "HELMET_002"
+
+    response = client.get("/api/history?helmet_id=HELMET_001&channels=nope")
+    assert response.status_code == 400
+    assert client.get("/api/history/stats").get_json()["queries"] >= 2
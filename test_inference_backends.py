@@ -0,0 +1,87 @@
+"""
+Inference backends: pooled scoring matches in-process, warmup, close, fallback
+Run with: python -m pytest test_inference_backends.py
+"""
+
+import os
+import signal
+
+import numpy as np
+import pytest
+
+from inference_backends import (
+    INITIAL_ROWS,
+    InlineBackend,
+    ProcessPoolBackend,
+    make_backend,
+)
+
+WORKERS = 2
+
+
+@pytest.fixture(scope="module")
+def model_path(tmp_path_factory):
+    """A small pickled forest with six classes over 128 features"""
+    joblib = pytest.importorskip("joblib")
+    ensemble = pytest.importorskip("sklearn.ensemble")
+    rng = np.random.default_rng(25)
+    features = rng.normal(size=(600, 128))
+    labels = features[:, :6].argmax(axis=1) + 1
+    forest = ensemble.RandomForestClassifier(n_estimators=10, random_state=25)
+    forest.fit(features, labels)
+    path = str(tmp_path_factory.mktemp("models") / "forest.pkl")
+    joblib.dump(forest, path)
+    return path
+
+
+@pytest.fixture(scope="module")
+def pooled(model_path):
+    backend = ProcessPoolBackend(model_path, workers=WORKERS)
+    yield backend
+    backend.close()
+
+
+def rows(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, 128))
+
+
+def test_every_worker_is_warm_before_the_first_batch(pooled):
+    assert len(pooled.executor._processes) == WORKERS
+    assert pooled.n_features_in_ == 128
+    assert pooled.classes_.tolist() == [1, 2, 3, 4, 5, 6]
+
+
+@pytest.mark.parametrize("n_rows", [1, 300, INITIAL_ROWS + 100])
+def test_pool_matches_inline(model_path, pooled, n_rows):
+    x = rows(n_rows, seed=n_rows)
+    inline = InlineBackend(model_path)
+    np.testing.assert_allclose(pooled.predict_proba(x), inline.predict_proba(x))
+    np.testing.assert_array_equal(pooled.predict(x), inline.predict(x))
+    assert pooled.capacity >= n_rows
+
+
+def test_broken_pool_falls_back_to_inline(model_path):
+    backend = ProcessPoolBackend(model_path, workers=1)
+    try:
+        x = rows(10)
+        expected = backend.predict_proba(x)
+        for pid in list(backend.executor._processes):
+            os.kill(pid, signal.SIGKILL)
+        np.testing.assert_allclose(backend.predict_proba(x), expected)
+        assert isinstance(backend.fallback, InlineBackend)
+    finally:
+        backend.close()
+
+
+def test_predict_after_close_is_an_error(model_path):
+    backend = ProcessPoolBackend(model_path, workers=1)
+    backend.close()
+    backend.close()  # idempotent (atexit calls it again)
+    with pytest.raises(RuntimeError, match="closed"):
+        backend.predict_proba(rows(1))
+
+
+def test_make_backend(model_path):
+    assert isinstance(make_backend(model_path, "inline"), InlineBackend)
+    with pytest.raises(ValueError):
+        make_backend(model_path, "gpu")
@@ -0,0 +1,125 @@
+"""
+MicroBatcher deadlines, batch limits, coalescing and result expiry
+Run with: python -m pytest test_micro_batcher.py
+"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from micro_batcher import Histogram, MicroBatcher, size_buckets
+from risk_ensemble import RiskEnsemble
+
+N_CLASSES = RiskEnsemble().classes.size
+
+
+def score(features):
+    """Predicted class = first feature, with full confidence"""
+    probabilities = np.eye(N_CLASSES)[features[:, 0].astype(int)]
+    return RiskEnsemble().combine({"svm": probabilities})
+
+
+def vectors(*classes):
+    return np.array([[c, 0.0] for c in classes])
+
+
+@pytest.fixture
+def batches():
+    """Started batchers and the batches they scored, stopped after the test"""
+    started = []
+    scored = []
+    done = threading.Event()
+
+    def start(batcher):
+        def on_batch(helmet_ids, results):
+            scored.append((time.monotonic(), helmet_ids, results))
+            done.set()
+
+        batcher.subscribe(on_batch)
+        batcher.start()
+        started.append(batcher)
+        return batcher
+
+    yield start, scored, done
+    for batcher in started:
+        batcher.stop(timeout=2)
+
+
+def test_partial_batch_flushes_at_the_deadline(batches):
+    start, scored, done = batches
+    batcher = start(MicroBatcher(score, max_batch=100, max_wait_ms=50))
+    submitted = time.monotonic()
+    batcher.submit(["HELMET_001", "HELMET_002", "HELMET_003"], vectors(0, 1, 2))
+
+    assert done.wait(2)
+    flushed_at, helmet_ids, results = scored[0]
+    assert 0.04 <= flushed_at - submitted < 1.0
+    assert helmet_ids == ["HELMET_001", "HELMET_002", "HELMET_003"]
+    assert [r["predicted_class"] for r in results.values()] == [1, 2, 3]
+    assert batcher.result("HELMET_002")["predicted_class"] == 2
+
+
+def test_full_batch_does_not_wait_for_the_deadline(batches):
+    start, scored, done = batches
+    batcher = start(MicroBatcher(score, max_batch=4, max_wait_ms=5000))
+    submitted = time.monotonic()
+    batcher.submit([f"HELMET_00{i}" for i in range(6)], vectors(*[0] * 6))
+
+    assert done.wait(2)
+    flushed_at, helmet_ids, _ = scored[0]
+    assert flushed_at - submitted < 1.0
+    assert len(helmet_ids) == 4
+    assert batcher.stats()["pending"] == 2
+
+
+def test_resubmitted_helmet_is_scored_once_with_its_newest_vector(batches):
+    start, scored, done = batches
+    batcher = MicroBatcher(score, max_batch=10, max_wait_ms=20, max_pending=2)
+    batcher.submit(["HELMET_001", "HELMET_002"], vectors(0, 0))
+    batcher.submit(["HELMET_001", "HELMET_003"], vectors(3, 0))
+    assert batcher.dropped == 1  # HELMET_003: pending is full
+
+    start(batcher)
+    assert done.wait(2)
+    _, helmet_ids, results = scored[0]
+    assert helmet_ids == ["HELMET_001", "HELMET_002"]
+    assert results["HELMET_001"]["predicted_class"] == 4
+
+
+def test_results_older_than_max_age_are_ignored_and_pruned(batches):
+    start, scored, done = batches
+    batcher = start(MicroBatcher(score, max_batch=1, max_wait_ms=0, max_age=0.05))
+    batcher.submit(["HELMET_001"], vectors(1))
+    assert done.wait(2)
+    assert batcher.result("HELMET_001") is not None
+
+    time.sleep(0.1)
+    assert batcher.result("HELMET_001") is None
+    done.clear()
+    batcher.submit(["HELMET_002"], vectors(1))
+    assert done.wait(2)
+    assert list(batcher.results) == ["HELMET_002"]
+
+
+def test_scoring_failure_is_counted(batches):
+    start, _, _ = batches
+
+    def broken(features):
+        raise RuntimeError("model offline")
+
+    batcher = start(MicroBatcher(broken, max_batch=1, max_wait_ms=0))
+    batcher.submit(["HELMET_001"], vectors(0))
+    deadline = time.monotonic() + 2
+    while not batcher.failures and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert batcher.failures == 1
+    assert batcher.result("HELMET_001") is None
+
+
+def test_histograms():
+    assert size_buckets(100) == (1, 2, 4, 8, 16, 32, 64, 100)
+    histogram = Histogram((1, 10))
+    histogram.add([0.5, 1, 5, 10, 11])
+    assert histogram.to_dict() == {"le": [1.0, 10.0], "counts": [2, 2, 1]}
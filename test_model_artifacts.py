@@ -0,0 +1,111 @@
+"""
+Model artifacts: conversion from the pickles, mmap loading and integrity checks
+Run with: python -m pytest test_model_artifacts.py
+"""
+
+import os
+import shutil
+import warnings
+
+import numpy as np
+import pytest
+
+from inference import ARTIFACTS, load_artifacts
+from model_artifacts import (
+    ARTIFACT_DIR,
+    MANIFEST,
+    MODEL_DIR,
+    convert,
+    load_manifest,
+    load_models,
+    stale_sources,
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(HERE, MODEL_DIR)
+
+pytestmark = pytest.mark.skipif(
+    not all(os.path.exists(os.path.join(SOURCE_DIR, f)) for f in ARTIFACTS.values()),
+    reason="trained model pickles not available",
+)
+
+
+@pytest.fixture(scope="module")
+def converted(tmp_path_factory):
+    """(model_dir, artifact_dir) converted from copies of the shipped pickles"""
+    pytest.importorskip("sklearn")
+    root = tmp_path_factory.mktemp("models")
+    model_dir = str(root / "pickles")
+    os.makedirs(model_dir)
+    for filename in ARTIFACTS.values():
+        shutil.copy(os.path.join(SOURCE_DIR, filename), model_dir)
+    artifact_dir = str(root / "artifacts" / "v1")
+    convert(model_dir, artifact_dir)
+    return model_dir, artifact_dir
+
+
+def test_scores_match_the_pickles(converted):
+    model_dir, artifact_dir = converted
+    models, manifest = load_models(artifact_dir)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        pickled = load_artifacts(model_dir, optional=False)
+        x = np.random.default_rng(23).uniform(0, 5e4, (200, 128))
+        svm = pickled["svm"].decision_function(pickled["svm_scaler"].transform(x))
+        nb = pickled["naive_bayes"].predict_proba(pickled["nb_scaler"].transform(x))
+
+    np.testing.assert_allclose(models["svm"].decision_function(x), svm, atol=1e-6)
+    np.testing.assert_allclose(models["naive_bayes"].predict_proba(x), nb, atol=1e-9)
+    assert manifest["classes"] == [1, 2, 3, 4, 5, 6]
+    # Still the read-only mapped pages, not heap copies
+    assert not models["svm"].weights.flags.writeable
+    assert not models["naive_bayes"].weights.flags.writeable
+
+
+def test_edited_array_is_rejected(converted, tmp_path):
+    _, artifact_dir = converted
+    copy = str(tmp_path / "v1")
+    shutil.copytree(artifact_dir, copy)
+    path = os.path.join(copy, "svm_bias.npy")
+    bias = np.load(path)
+    bias[0] += 1e-3
+    np.save(path, bias)
+
+    with pytest.raises(ValueError, match="model_hash"):
+        load_models(copy)
+    models, _ = load_models(copy, verify=False)
+    assert models["svm"].bias[0] == bias[0]
+
+
+def test_retrained_pickle_makes_the_artifact_stale(converted, tmp_path):
+    model_dir, artifact_dir = converted
+    manifest = load_manifest(artifact_dir)
+    assert stale_sources(manifest, model_dir) == []
+    assert stale_sources(manifest, str(tmp_path)) == []  # pickles not deployed
+
+    retrained = str(tmp_path / "pickles")
+    shutil.copytree(model_dir, retrained)
+    with open(os.path.join(retrained, ARTIFACTS["nb_scaler"]), "ab") as f:
+        f.write(b"\0")
+    assert stale_sources(manifest, retrained) == [ARTIFACTS["nb_scaler"]]
+
+
+def test_unknown_format_version(converted, tmp_path):
+    _, artifact_dir = converted
+    copy = str(tmp_path / "v2")
+    shutil.copytree(artifact_dir, copy)
+    manifest_path = os.path.join(copy, MANIFEST)
+    with open(manifest_path) as f:
+        text = f.read().replace('"format_version": 1', '"format_version": 2')
+    with open(manifest_path, "w") as f:
+        f.write(text)
+    with pytest.raises(ValueError, match="format"):
+        load_models(copy)
+
+
+def test_shipped_artifacts_load_without_sklearn():
+    if not os.path.exists(os.path.join(HERE, ARTIFACT_DIR, MANIFEST)):
+        pytest.skip("no converted artifacts in the tree")
+    models, manifest = load_models(os.path.join(HERE, ARTIFACT_DIR))
+    assert set(models) == {"svm", "naive_bayes"}
+    assert len(manifest["feature_names"]) == 128
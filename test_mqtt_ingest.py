@@ -0,0 +1,100 @@
+"""
+MqttIngestor batch parsing: JSON objects/arrays, binary frames, bad payloads
+Run with: python -m pytest test_mqtt_ingest.py
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from feature_extractor import N_SENSORS, FeatureExtractor
+from mqtt_ingest import MqttIngestor
+from sensor_store import SensorStore
+from telemetry_codec import encode_frame
+
+READING = {"co2": 450.0, "ch4": 1.2, "o2": 20.5, "h2s": 5.0, "temp": 28.5}
+EPOCH = 1_700_000_000.0
+
+
+@pytest.fixture
+def store():
+    return SensorStore(capacity=10, max_helmets=10)
+
+
+def payload(value):
+    return json.dumps(value).encode("utf-8")
+
+
+def latest(store, helmet_id):
+    return store.latest(store.rows_for([helmet_id]))[0]
+
+
+def test_objects_arrays_and_binary_frames(store):
+    ingestor = MqttIngestor(store)
+    ingestor.process_batch(
+        [
+            (payload({"helmet_id": "HELMET_001", **READING}), EPOCH),
+            (
+                payload(
+                    [
+                        {"helmet_id": "HELMET_002", **READING, "co2": 500.0},
+                        {"helmet_id": "HELMET_003", **READING, "co2": 600.0},
+                    ]
+                ),
+                EPOCH,
+            ),
+            (encode_frame("HELMET_004", {**READING, "co2": 700.0}, EPOCH), EPOCH),
+        ]
+    )
+    assert ingestor.readings == 4
+    assert ingestor.parse_errors == 0
+    co2 = store.channels.index("co2")
+    for helmet_id, expected in (
+        ("HELMET_001", 450.0),
+        ("HELMET_002", 500.0),
+        ("HELMET_003", 600.0),
+        ("HELMET_004", 700.0),
+    ):
+        assert latest(store, helmet_id)[co2] == pytest.approx(expected)
+
+
+def test_each_malformed_payload_is_one_error(store):
+    ingestor = MqttIngestor(store)
+    ingestor.process_batch(
+        [(b"{not json", EPOCH), (b"42", EPOCH), (b"null", EPOCH), (b"\xcb\x01", EPOCH)]
+    )
+    assert ingestor.parse_errors == 4
+    assert ingestor.readings == 0
+
+
+def test_bad_resistance_array_keeps_scalars(store):
+    extractor = FeatureExtractor(store)
+    ingestor = MqttIngestor(store, feature_extractor=extractor)
+    good = [1000.0 + i for i in range(N_SENSORS)]
+    ingestor.process_batch(
+        [
+            (
+                payload({"helmet_id": "HELMET_001", **READING, "resistance": [1, 2]}),
+                EPOCH,
+            ),
+            (payload({"helmet_id": "HELMET_002", "resistance": good}), EPOCH),
+        ]
+    )
+    assert ingestor.parse_errors == 1
+    assert ingestor.readings == 1  # HELMET_001's scalars; HELMET_002 is array-only
+    assert latest(store, "HELMET_001")[store.channels.index("o2")] == pytest.approx(
+        20.5
+    )
+    assert ingestor.array_samples == 1
+    assert extractor.samples == 1
+
+
+def test_full_queue_drops_instead_of_blocking(store):
+    ingestor = MqttIngestor(store, max_queue=2)
+    results = [ingestor.submit(payload({"co2": 400 + i})) for i in range(3)]
+    assert results == [True, True, False]
+    assert ingestor.dropped == 1
+    ingestor.drain()
+    assert ingestor.readings == 2
+    assert np.isfinite(latest(store, "HELMET_001")).all()
@@ -0,0 +1,76 @@
+"""
+Load generator: arguments, burst pattern, payload formats and a short run
+Run with: python -m pytest test_mqtt_load_generator.py
+"""
+
+import json
+
+import pytest
+
+from mqtt_load_generator import (
+    burst_multiplier,
+    make_payload_factory,
+    parse_args,
+    run_load_test,
+)
+from telemetry_codec import decode_readings, helmet_id_from_number
+
+HELMET_IDS = [helmet_id_from_number(i) for i in (1, 2, 3, 12345, 65535)]
+
+
+def test_default_rate_is_one_reading_per_helmet_per_tick():
+    args = parse_args(["--helmets", "5000"])
+    assert args.rate == 2500
+    assert parse_args(["--helmets", "10", "--rate", "7"]).rate == 7
+
+
+def test_binary_format_is_limited_to_uint16_helmets(capsys):
+    assert parse_args(["--format", "binary", "--helmets", "65535"]).helmets == 65535
+    with pytest.raises(SystemExit):
+        parse_args(["--format", "binary", "--helmets", "65536"])
+    assert "max 65535" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize(
+    "elapsed, expected", [(0.0, 5.0), (1.9, 5.0), (2.0, 1.0), (9.9, 1.0), (10.5, 5.0)]
+)
+def test_bursts_at_the_start_of_each_period(elapsed, expected):
+    assert burst_multiplier(elapsed, 5.0, 10.0, 0.2) == expected
+    assert burst_multiplier(elapsed, 1.0, 10.0, 0.2) == 1.0
+
+
+def test_payload_formats_keep_helmet_ids_and_counts():
+    binary = make_payload_factory("binary", 100)(HELMET_IDS)
+    assert [count for _, count in binary] == [1] * 5
+    assert [decode_readings(p)[0]["helmet_id"] for p, _ in binary] == HELMET_IDS
+
+    batches = make_payload_factory("json-batch", 2)(HELMET_IDS)
+    assert [count for _, count in batches] == [2, 2, 1]
+    assert [len(json.loads(p)) for p, _ in batches] == [2, 2, 1]
+
+    single = make_payload_factory("json", 100)(HELMET_IDS[:1])
+    assert json.loads(single[0][0])["helmet_id"] == "HELMET_001"
+
+
+@pytest.mark.parametrize("payload_format", ["binary", "json-batch"])
+def test_short_in_process_run_loses_nothing(payload_format):
+    args = parse_args(
+        [
+            "--helmets",
+            "300",
+            "--rate",
+            "2000",
+            "--duration",
+            "0.5",
+            "--format",
+            payload_format,
+            "--settle",
+            "5",
+        ]
+    )
+    result = run_load_test(args)
+    assert result["sent"] > 500
+    assert result["visible"] == result["sent"]
+    assert result["drop_rate"] == 0
+    assert result["ingest"]["parse_errors"] == 0
+    assert 0 <= result["latency_ms"][50] < 5000
@@ -0,0 +1,96 @@
+"""
+FusedNB against the pickled MinMaxScaler + MultinomialNB it replaces
+Run with: python -m pytest test_nb_fused.py
+"""
+
+import tracemalloc
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from inference import DatasetReplay, load_artifacts  # noqa: E402
+from model_artifacts import ARTIFACT_DIR, load_models  # noqa: E402
+from nb_fused import FusedNB  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def pickled():
+    artifacts = load_artifacts(optional=False)
+    scaler = artifacts["nb_scaler"]
+    if hasattr(scaler, "feature_names_in_"):
+        del scaler.feature_names_in_  # plain arrays below, names checked on load
+    return artifacts["naive_bayes"], scaler
+
+
+@pytest.fixture(scope="module")
+def features():
+    rows = DatasetReplay().features
+    rng = np.random.default_rng(21)
+    x = rows[rng.integers(len(rows), size=5000)]
+    # Also well outside the scaler's training range
+    return np.concatenate([x, x * rng.uniform(-1.0, 3.0, x.shape)])
+
+
+@pytest.mark.parametrize("clip", [False, True])
+def test_matches_multinomial_nb(pickled, features, clip):
+    nb, scaler = pickled
+    scaler.clip, original = clip, scaler.clip
+    try:
+        fused = FusedNB.fold(nb, scaler)
+        scaled = scaler.transform(features)
+        jll = nb.predict_joint_log_proba(scaled)
+        proba = nb.predict_proba(scaled)
+        predicted = nb.predict(scaled)
+    finally:
+        scaler.clip = original
+    assert np.abs(fused.joint_log_likelihood(features) - jll).max() < 1e-8
+    assert np.abs(fused.predict_proba(features) - proba).max() < 1e-9
+    np.testing.assert_array_equal(fused.predict(features), predicted)
+
+
+def float32_view(features):
+    """Every other row of a float32 buffer, like a SensorStore column view"""
+    buffer = np.zeros((2 * len(features), features.shape[1]), dtype=np.float32)
+    buffer[::2] = features
+    return buffer[::2]
+
+
+def test_float32_strided_view(pickled, features):
+    """float32 views are scored in float32 and agree with float64 input"""
+    nb, scaler = pickled
+    fused = FusedNB.fold(nb, scaler)
+    view = float32_view(features)
+    expected = nb.predict_proba(scaler.transform(view.astype(np.float64)))
+    proba = fused.predict_proba(view)
+    assert proba.dtype == np.float32
+    assert np.abs(proba - expected).max() < 1e-3
+
+
+def test_float32_view_is_not_copied(pickled, features):
+    """Scoring a float32 view allocates the result only, not a copy of x"""
+    nb, scaler = pickled
+    scaler.clip, original = False, scaler.clip
+    try:
+        fused = FusedNB.fold(nb, scaler)
+    finally:
+        scaler.clip = original
+    view = float32_view(np.tile(features, (10, 1)))
+    tracemalloc.start()
+    try:
+        jll = fused.joint_log_likelihood(view)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < view.nbytes / 4
+    assert peak >= jll.nbytes
+
+
+def test_artifact_matches_pickles(pickled, features):
+    """The memory-mapped artifact the service loads is the folded pickle"""
+    nb, scaler = pickled
+    models, _ = load_models(ARTIFACT_DIR)
+    expected = nb.predict_proba(scaler.transform(features))
+    assert np.abs(models["naive_bayes"].predict_proba(features) - expected).max() < 1e-9
+    assert not models["naive_bayes"].weights.flags.owndata  # still memory-mapped
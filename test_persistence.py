@@ -0,0 +1,88 @@
+"""
+PersistenceWriter: batched WAL writes, alert upserts, jobs and back-pressure
+Run with: python -m pytest test_persistence.py
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from alert_engine import Alert
+from persistence import PersistenceWriter, connect
+from sensor_store import SensorStore
+from threshold_engine import DANGER, WARNING
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "database" / "coal_mine.db")
+
+
+@pytest.fixture
+def writer(db_path):
+    writer = PersistenceWriter(db_path, batch_size=100, flush_interval=0.05)
+    writer.start()
+    assert writer.wait_ready(5)
+    yield writer
+    writer.stop(timeout=5)
+
+
+def query(db_path, sql):
+    conn = connect(db_path, readonly=True)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_store_appends_are_written_in_batches(db_path):
+    writer = PersistenceWriter(db_path, batch_size=100, flush_interval=5.0)
+    store = SensorStore(capacity=10, max_helmets=300)
+    writer.attach_store(store)
+    rows = store.rows_for([f"HELMET_{i:03d}" for i in range(250)])
+    values = np.tile(np.arange(6, dtype=np.float32), (250, 1))
+    store.append_many(rows, values, np.arange(250) + 1_000)
+
+    writer.start()
+    writer.stop(timeout=5)  # flushes everything queued
+    assert writer.written_readings == 250
+    assert writer.commits == 3
+    assert writer.queue_depth() == 0
+    assert query(db_path, "SELECT count(*), min(ts), max(ts) FROM readings") == [
+        (250, 1_000, 1_249)
+    ]
+    assert query(db_path, "SELECT helmet_id, co2, humidity FROM readings LIMIT 1") == [
+        ("HELMET_000", 0.0, 5.0)
+    ]
+    assert query(db_path, "PRAGMA journal_mode") == [("wal",)]
+
+
+def test_alert_changes_are_upserted(writer, db_path):
+    alert = Alert(1, "HELMET_001", "co2", "Tunnel A-1", WARNING, 900.0, 100.0)
+    writer.submit_alerts([alert])
+    alert.level = alert.peak_level = DANGER
+    alert.closed_at = 160.0
+    writer.submit_alerts([alert])
+    writer.stop(timeout=5)
+
+    assert query(
+        db_path, "SELECT helmet_id, severity, peak_severity, closed_at FROM alerts"
+    ) == [("HELMET_001", "DANGER", "DANGER", 160.0)]
+    assert writer.written_alerts == 2
+
+
+def test_jobs_run_on_the_writer_thread(writer):
+    assert writer.run_job(lambda conn: threading.current_thread().name, 5) == (
+        "persistence-writer"
+    )
+    with pytest.raises(ZeroDivisionError):
+        writer.run_job(lambda conn: 1 / 0, 5)
+
+
+def test_full_queue_drops_whole_batches(db_path):
+    writer = PersistenceWriter(db_path, max_queue=10)
+    writer.submit_readings(["HELMET_001"] * 8, [1] * 8, np.zeros((8, 6)))
+    writer.submit_readings(["HELMET_002"] * 3, [2] * 3, np.zeros((3, 6)))
+    assert writer.dropped == 3
+    assert writer.queue_depth() == writer.peak_queue_depth == 8
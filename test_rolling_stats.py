@@ -0,0 +1,68 @@
+"""
+RollingStats incremental windows against a brute-force rescan of the ring
+Run with: python -m pytest test_rolling_stats.py
+"""
+
+import numpy as np
+import pytest
+
+from rolling_stats import RollingStats, check_against_rescan
+from sensor_store import SensorStore
+
+EPOCH_MS = 1_700_000_000_000
+
+
+@pytest.mark.parametrize("seed", [3, 11])
+def test_matches_full_rescan_with_irregular_arrivals(seed):
+    assert check_against_rescan(n_helmets=50, samples=157, seed=seed) < 1e-3
+
+
+def test_linear_ramp_has_exact_slope_and_extremes():
+    store = SensorStore(capacity=40, max_helmets=2)
+    stats = RollingStats(store, windows=(5, 20))
+    co2 = store.channels.index("co2")
+    for i in range(23):
+        store.append("HELMET_001", {"co2": 400 + 2 * i}, EPOCH_MS + 2000 * i)
+
+    trend = stats.trend("HELMET_001", window=5)["co2"]
+    assert trend["rate_per_min"] == pytest.approx(60.0)  # 2 ppm every 2 s
+    assert (trend["min"], trend["max"]) == (436.0, 444.0)
+    assert trend["mean"] == pytest.approx(440.0)
+
+    result = stats.stats(store.rows_for(["HELMET_001"]), 20)
+    assert result["count"][0] == 20
+    assert result["min"][0, co2] == 406.0
+    assert stats.rising(store.rows_for(["HELMET_001"]), "co2", 30.0).all()
+    assert not stats.rising(store.rows_for(["HELMET_001"]), "co2", -30.0).any()
+
+
+def test_ewma_starts_at_first_sample():
+    store = SensorStore(capacity=20, max_helmets=2)
+    stats = RollingStats(store, windows=(5,), alpha=0.5)
+    store.append("HELMET_001", {"temp": 20.0}, EPOCH_MS)
+    store.append("HELMET_001", {"temp": 30.0}, EPOCH_MS + 2000)
+    assert stats.trend("HELMET_001")["temp"]["ewma"] == pytest.approx(25.0)
+
+
+def test_empty_rows_and_unknown_helmets():
+    store = SensorStore(capacity=20, max_helmets=2)
+    stats = RollingStats(store, windows=(5,))
+    rows = store.rows_for(["HELMET_001"])
+    result = stats.stats(rows)
+    assert result["count"][0] == 0
+    assert np.isnan(result["mean"]).all()
+    assert stats.trend("HELMET_001") is None
+    assert stats.trend("HELMET_999") is None
+
+
+def test_rows_added_after_subscribe_grow_the_state():
+    store = SensorStore(capacity=20, max_helmets=1)
+    stats = RollingStats(store, windows=(5,))
+    for i in range(12):
+        store.append(f"HELMET_{i % 4:03d}", {"h2s": float(i)}, EPOCH_MS + 2000 * i)
+    assert stats.trend("HELMET_003")["h2s"]["mean"] == pytest.approx(7.0)
+
+
+def test_window_must_fit_in_half_the_ring():
+    with pytest.raises(ValueError):
+        RollingStats(SensorStore(capacity=20), windows=(11,))
@@ -0,0 +1,109 @@
+"""
+Rollup watermark, bucket aggregates, retention and table choice
+Run with: python -m pytest test_rollups.py
+"""
+
+import pytest
+
+from persistence import INSERT_READING, SCHEMA, connect
+from rollups import (
+    DAY_MS,
+    HOUR_MS,
+    MINUTE_MS,
+    apply_retention,
+    choose_table,
+    fetch_range,
+    get_watermark,
+    rollup,
+)
+from sensor_store import SENSOR_CHANNELS
+
+NOW_MS = 1_700_000_000_000 // HOUR_MS * HOUR_MS
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / "history.db"))
+    conn.executescript(SCHEMA)
+    yield conn
+    conn.close()
+
+
+def insert(conn, helmet_id, ts, co2):
+    values = [co2] + [1.0] * (len(SENSOR_CHANNELS) - 1)
+    with conn:
+        conn.execute(INSERT_READING, (helmet_id, ts, *values))
+
+
+def minute_buckets(conn, helmet_id):
+    return conn.execute(
+        "SELECT bucket, count, co2_min, co2_max, co2_sum FROM readings_1m "
+        "WHERE helmet_id = ? ORDER BY bucket",
+        (helmet_id,),
+    ).fetchall()
+
+
+def test_rollup_merges_new_rows_into_existing_buckets(conn):
+    insert(conn, "HELMET_001", NOW_MS, 400.0)
+    insert(conn, "HELMET_001", NOW_MS + 10_000, 600.0)
+    assert rollup(conn) == 2
+    assert rollup(conn) == 0  # nothing past the watermark
+
+    insert(conn, "HELMET_001", NOW_MS + 20_000, 500.0)
+    insert(conn, "HELMET_001", NOW_MS + MINUTE_MS, 700.0)
+    assert rollup(conn, max_rows=1) == 2  # sliced, same result
+    assert minute_buckets(conn, "HELMET_001") == [
+        (NOW_MS, 3, 400.0, 600.0, 1500.0),
+        (NOW_MS + MINUTE_MS, 1, 700.0, 700.0, 700.0),
+    ]
+    (hour,) = fetch_range(
+        conn, "readings_1h", ["HELMET_001"], ["co2"], NOW_MS, NOW_MS + HOUR_MS
+    )
+    assert hour == ("HELMET_001", NOW_MS, 550.0, 400.0, 700.0)
+
+
+def test_watermark_survives_deleting_the_newest_rows(conn):
+    """AUTOINCREMENT ids are never reused, so re-inserted rows are not skipped"""
+    for i in range(3):
+        insert(conn, "HELMET_001", NOW_MS + i, 400.0)
+    rollup(conn)
+    assert get_watermark(conn) == 3
+    with conn:
+        conn.execute("DELETE FROM readings")
+
+    insert(conn, "HELMET_002", NOW_MS, 450.0)
+    assert rollup(conn) == 1
+    assert minute_buckets(conn, "HELMET_002") == [(NOW_MS, 1, 450.0, 450.0, 450.0)]
+
+
+def test_retention_keeps_raw_rows_until_rolled_up(conn):
+    old = NOW_MS - 10 * DAY_MS
+    insert(conn, "HELMET_001", old, 400.0)
+    rollup(conn)
+    insert(conn, "HELMET_001", old + 1, 500.0)  # old, but not rolled up yet
+
+    deleted = apply_retention(conn, now_ms=NOW_MS, raw_days=7, minute_days=30)
+    assert deleted["readings"] == 1
+    assert conn.execute("SELECT co2 FROM readings").fetchall() == [(500.0,)]
+
+    deleted = apply_retention(conn, now_ms=NOW_MS, raw_days=7, minute_days=5)
+    assert deleted["readings_1m"] == 1
+    assert deleted["readings_1h"] == 0
+
+
+@pytest.mark.parametrize(
+    "age_days, resolution_ms, table",
+    [
+        (0.5, 0, "readings"),
+        (0.5, MINUTE_MS, "readings_1m"),
+        (0.5, HOUR_MS, "readings_1h"),
+        (10, 0, "readings_1m"),
+        (60, 0, "readings_1h"),
+    ],
+)
+def test_choose_table(age_days, resolution_ms, table):
+    start_ms = NOW_MS - int(age_days * DAY_MS)
+    assert (
+        choose_table(start_ms, resolution_ms, NOW_MS, raw_days=7, minute_days=30)
+        == table
+    )
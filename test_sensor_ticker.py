@@ -0,0 +1,80 @@
+"""
+Fleet snapshots are immutable; the ticker publishes them on its own schedule
+Run with: python -m pytest test_sensor_ticker.py
+"""
+
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from sensor_store import SensorStore
+from sensor_ticker import SensorTicker, build_snapshot, thaw_readings
+from threshold_engine import WARNING, ThresholdEngine
+
+HELMET_IDS = ("HELMET_001", "HELMET_002")
+
+
+@pytest.fixture
+def store():
+    store = SensorStore(capacity=10, max_helmets=4)
+    store.append("HELMET_001", {"co2": 900.123, "o2": 20.9}, 1_000)
+    store.append("HELMET_002", {"co2": 420.0, "o2": 20.9}, 1_000)
+    return store
+
+
+def test_snapshot_is_read_only(store):
+    snapshot = build_snapshot(1, store, HELMET_IDS, ThresholdEngine(store.channels))
+    assert snapshot.helmet_ids == HELMET_IDS
+    assert snapshot.readings["HELMET_001"]["co2"] == 900.12
+    assert snapshot.readings["HELMET_001"]["levels"]["co2"] == WARNING
+
+    with pytest.raises(ValueError):
+        snapshot.values[0, 0] = 0
+    with pytest.raises(ValueError):
+        snapshot.levels[0, 0] = 0
+    with pytest.raises(TypeError):
+        snapshot.readings["HELMET_003"] = {}
+    with pytest.raises(TypeError):
+        snapshot.readings["HELMET_001"]["co2"] = 0
+    with pytest.raises(TypeError):
+        snapshot.readings["HELMET_001"]["levels"]["co2"] = 0
+
+
+def test_later_appends_do_not_change_a_published_snapshot(store):
+    snapshot = build_snapshot(1, store, HELMET_IDS)
+    store.append("HELMET_001", {"co2": 1500.0}, 2_000)
+    assert snapshot.readings["HELMET_001"]["co2"] == 900.12
+    assert snapshot.values[0, store.channels.index("co2")] == np.float32(900.123)
+
+
+def test_thawed_readings_are_plain_json_dicts(store):
+    snapshot = build_snapshot(1, store, HELMET_IDS, ThresholdEngine(store.channels))
+    thawed = thaw_readings(snapshot.readings)
+    assert json.loads(json.dumps(thawed)) == thawed
+    thawed["HELMET_001"]["levels"]["co2"] = 0
+    assert snapshot.readings["HELMET_001"]["levels"]["co2"] == WARNING
+
+
+def test_ticker_publishes_and_survives_failing_ticks():
+    ticked = threading.Event()
+    calls = []
+
+    def tick_fn(tick):
+        calls.append(tick)
+        if len(calls) == 1:
+            raise RuntimeError("broker hiccup")
+        ticked.set()
+        return ("snapshot", tick)
+
+    ticker = SensorTicker(tick_fn, interval_ms=10)
+    ticker.start()
+    try:
+        assert ticked.wait(2)
+    finally:
+        ticker.stop(timeout=2)
+    assert ticker.errors == 1
+    assert calls[:2] == [1, 1]  # a failed tick is retried under the same number
+    assert ticker.snapshot == ("snapshot", ticker.ticks)
+    assert not ticker.is_alive()
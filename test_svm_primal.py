@@ -0,0 +1,63 @@
+"""
+PrimalSVM against the pickled StandardScaler + linear SVC it replaces
+Run with: python -m pytest test_svm_primal.py
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from inference import DatasetReplay, load_artifacts  # noqa: E402
+from model_artifacts import ARTIFACT_DIR, load_models  # noqa: E402
+from svm_primal import PrimalSVM  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def pickled():
+    artifacts = load_artifacts(optional=False)
+    scaler = artifacts["svm_scaler"]
+    if hasattr(scaler, "feature_names_in_"):
+        del scaler.feature_names_in_  # plain arrays below, names checked on load
+    return artifacts["svm"], scaler
+
+
+@pytest.fixture(scope="module")
+def features():
+    rows = DatasetReplay().features
+    rng = np.random.default_rng(20)
+    x = rows[rng.integers(len(rows), size=5000)]
+    # Also well outside the training distribution
+    return np.concatenate([x, x * rng.uniform(0.5, 2.0, x.shape)])
+
+
+def test_decision_function_matches_svc(pickled, features):
+    svm, scaler = pickled
+    primal = PrimalSVM.fold(svm, scaler)
+    expected = svm.decision_function(scaler.transform(features))
+    assert np.abs(primal.decision_function(features) - expected).max() < 1e-8
+
+
+def test_predict_matches_svc(pickled, features):
+    svm, scaler = pickled
+    primal = PrimalSVM.fold(svm, scaler)
+    expected = svm.predict(scaler.transform(features))
+    np.testing.assert_array_equal(primal.predict(features), expected)
+
+
+def test_artifact_matches_pickles(pickled, features):
+    """The memory-mapped artifact the service loads is the folded pickle"""
+    svm, scaler = pickled
+    models, _ = load_models(ARTIFACT_DIR)
+    expected = svm.decision_function(scaler.transform(features))
+    assert np.abs(models["svm"].decision_function(features) - expected).max() < 1e-8
+
+
+def test_rejects_non_linear_kernels(pickled):
+    svm, scaler = pickled
+    svm.kernel, kernel = "rbf", svm.kernel
+    try:
+        with pytest.raises(ValueError):
+            PrimalSVM.fold(svm, scaler)
+    finally:
+        svm.kernel = kernel
@@ -0,0 +1,84 @@
+"""
+Binary telemetry frames: round trip, concatenation and rejected payloads
+Run with: python -m pytest test_telemetry_codec.py
+"""
+
+import numpy as np
+import pytest
+
+from telemetry_codec import (
+    CHANNELS,
+    CHANNEL_SCALES,
+    FRAME_SIZE,
+    decode_frames,
+    decode_readings,
+    encode_frame,
+    helmet_id_from_number,
+    helmet_number,
+    is_binary_payload,
+)
+
+READING = {"co2": 452.3, "ch4": 1.234, "o2": 20.51, "h2s": 5.07, "temp": 28.46}
+
+
+def test_round_trip_within_fixed_point_resolution():
+    frame = encode_frame("HELMET_007", {**READING, "humidity": 72.33}, 1700000000.25)
+    assert len(frame) == FRAME_SIZE
+    assert is_binary_payload(frame)
+    (reading,) = decode_readings(frame)
+    assert reading["helmet_id"] == "HELMET_007"
+    assert reading["timestamp"] == pytest.approx(1700000000.25)
+    for name, scale in zip(CHANNELS, CHANNEL_SCALES):
+        expected = {**READING, "humidity": 72.33}[name]
+        assert reading[name] == pytest.approx(expected, abs=0.5 / scale + 1e-6)
+
+
+@pytest.mark.parametrize("number", [1, 7, 999, 1000, 12345, 65535])
+def test_canonical_helmet_ids_round_trip(number):
+    helmet_id = helmet_id_from_number(number)
+    assert helmet_number(helmet_id) == number
+    (reading,) = decode_readings(encode_frame(helmet_id, READING))
+    assert reading["helmet_id"] == helmet_id
+
+
+@pytest.mark.parametrize("helmet_id", ["MINER_1", "HELMET_65536", "HELMET_-1"])
+def test_unencodable_helmet_ids(helmet_id):
+    with pytest.raises(ValueError):
+        encode_frame(helmet_id, READING)
+
+
+def test_concatenated_frames_decode_in_one_call():
+    payload = b"".join(
+        encode_frame(f"HELMET_{i:03d}", {**READING, "co2": 400.0 + i}, 1700000000 + i)
+        for i in range(1, 51)
+    )
+    numbers, timestamps, values = decode_frames(payload)
+    np.testing.assert_array_equal(numbers, np.arange(1, 51))
+    np.testing.assert_array_equal(timestamps, 1700000000 + np.arange(1, 51))
+    np.testing.assert_allclose(values[:, CHANNELS.index("co2")], 400.0 + numbers)
+    assert values.dtype == np.float32
+
+
+def test_out_of_range_values_saturate():
+    (reading,) = decode_readings(encode_frame("HELMET_001", {"co2": 1e6, "o2": -1e6}))
+    assert reading["co2"] == pytest.approx(32767 / 10)
+    assert reading["o2"] == pytest.approx(-32768 / 100)
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        encode_frame("HELMET_001", READING)[:-1],  # truncated
+        b"\x00" + encode_frame("HELMET_001", READING)[1:],  # bad magic
+        encode_frame("HELMET_001", READING)[:1] + b"\x02" + bytes(FRAME_SIZE - 2),
+    ],
+)
+def test_malformed_frames_are_rejected(payload):
+    with pytest.raises(ValueError):
+        decode_frames(payload)
+
+
+def test_json_is_never_mistaken_for_a_frame():
+    assert not is_binary_payload(b'{"helmet_id": "HELMET_001"}')
+    assert not is_binary_payload(b"[]")
+    assert not is_binary_payload(b"")
@@ -0,0 +1,80 @@
+"""
+ThresholdEngine: config.py bands, inverted tables and offline readings
+Run with: python -m pytest test_threshold_engine.py
+"""
+
+import numpy as np
+import pytest
+
+from sensor_store import SENSOR_CHANNELS
+from threshold_engine import (
+    CAUTION,
+    CRITICAL,
+    DANGER,
+    OFFLINE,
+    SAFE,
+    WARNING,
+    ThresholdEngine,
+    compile_threshold,
+    level_name,
+)
+
+
+@pytest.fixture
+def engine():
+    return ThresholdEngine(SENSOR_CHANNELS)
+
+
+@pytest.mark.parametrize(
+    "channel, value, level",
+    [
+        ("co2", 500, SAFE),  # at a limit is still inside the band
+        ("co2", 500.1, CAUTION),
+        ("co2", 801, WARNING),
+        ("co2", 1201, DANGER),
+        ("co2", 1501, CRITICAL),
+        ("o2", 20.9, SAFE),
+        ("o2", 19.5, SAFE),
+        ("o2", 19.4, CAUTION),
+        ("o2", 18.9, WARNING),
+        ("o2", 18.4, DANGER),
+        ("o2", 17.9, CRITICAL),
+        ("temp", 36, WARNING),
+        ("humidity", 99, CRITICAL),
+        ("ch4", 0, OFFLINE),
+    ],
+)
+def test_config_bands(engine, channel, value, level):
+    assert engine.classify_value(channel, value) == level
+
+
+def test_matrix_matches_single_values(engine):
+    rng = np.random.default_rng(9)
+    low = np.array([200, 0, 15, 0, 15, 30])
+    high = np.array([2000, 5, 22, 50, 50, 100])
+    values = rng.uniform(low, high, (500, len(SENSOR_CHANNELS)))
+    values[::50, 2] = np.nan
+    values[::70, 0] = 0
+
+    levels = engine.classify(values)
+    assert levels.dtype == np.int8
+    expected = [
+        [engine.classify_value(c, v) for c, v in zip(SENSOR_CHANNELS, row)]
+        for row in values.tolist()
+    ]
+    np.testing.assert_array_equal(levels, expected)
+    np.testing.assert_array_equal(engine.worst(levels), np.max(expected, axis=1))
+
+
+def test_reading_dicts_and_labels(engine):
+    levels = engine.classify_reading({"co2": 900, "o2": 20.9})
+    assert levels["co2"] == WARNING
+    assert levels["ch4"] == OFFLINE
+    assert level_name(levels["co2"]) == "WARNING"
+    assert engine.describe("o2", "%") == "Safe: >19.5%"
+    assert engine.describe("co2", "ppm") == "Safe: <500ppm"
+
+
+def test_non_monotonic_table_is_rejected():
+    with pytest.raises(ValueError):
+        compile_threshold({"safe": 1, "warning": 3, "danger": 2, "critical": 4})
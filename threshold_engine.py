@@ -0,0 +1,160 @@
+"""
+Threshold Classification Engine for Coal Mine Safety Dashboard
+Classifies whole (helmets x channels) matrices against the config.py tables
+
+Every threshold table in config.py (GAS_SAFETY_THRESHOLDS,
+ENVIRONMENTAL_THRESHOLDS, HEALTH_THRESHOLDS) is compiled once into sorted edge
+arrays. Tables whose limits decrease with severity, like oxygen, are stored
+negated together with a -1 sign so one "value > edge" comparison handles both
+directions. Classifying the fleet is then a single vectorized pass per tick.
+
+Levels (same bands the metric cards have always shown):
+    OFFLINE  -1  no reading (0 or NaN)
+    SAFE      0  within the "safe" limit
+    CAUTION   1  past "safe"
+    WARNING   2  past "warning"
+    DANGER    3  past "danger"
+    CRITICAL  4  past "critical"
+"""
+
+import numpy as np
+
+from config import ENVIRONMENTAL_THRESHOLDS, GAS_SAFETY_THRESHOLDS, HEALTH_THRESHOLDS
+
+OFFLINE, SAFE, CAUTION, WARNING, DANGER, CRITICAL = -1, 0, 1, 2, 3, 4
+
+LEVEL_NAMES = {
+    OFFLINE: "OFFLINE",
+    SAFE: "NORMAL",
+    CAUTION: "CAUTION",
+    WARNING: "WARNING",
+    DANGER: "DANGER",
+    CRITICAL: "CRITICAL",
+}
+
+LEVEL_COLORS = {
+    OFFLINE: "#6c757d",  # Gray
+    SAFE: "#28a745",  # Green
+    CAUTION: "#ffc107",  # Yellow
+    WARNING: "#fd7e14",  # Orange
+    DANGER: "#dc3545",  # Red
+    CRITICAL: "#dc3545",  # Red
+}
+
+THRESHOLD_KEYS = ("safe", "warning", "danger", "critical")
+
+# Dashboard channel -> config.py threshold table entry
+CHANNEL_THRESHOLDS = {
+    "co2": "carbon_dioxide_co2",
+    "ch4": "methane_ch4",
+    "o2": "oxygen_o2",
+    "h2s": "hydrogen_sulfide_h2s",
+    "temp": "temperature",
+    "humidity": "humidity",
+    "co": "carbon_monoxide_co",
+}
+
+ALL_THRESHOLDS = {}
+ALL_THRESHOLDS.update(GAS_SAFETY_THRESHOLDS)
+ALL_THRESHOLDS.update(ENVIRONMENTAL_THRESHOLDS)
+ALL_THRESHOLDS.update(HEALTH_THRESHOLDS)
+
+
+def compile_threshold(limits):
+    """Turn one {"safe", "warning", "danger", "critical"} table into (edges, sign)
+
+    Returns edges sorted ascending in the signed domain and sign = -1 for
+    inverted tables (lower values are worse), +1 otherwise.
+    """
+    edges = np.array([limits[key] for key in THRESHOLD_KEYS], dtype=np.float64)
+    diffs = np.diff(edges)
+    if (diffs >= 0).all():
+        sign = 1.0
+    elif (diffs <= 0).all():
+        sign = -1.0
+    else:
+        raise ValueError(f"thresholds are not monotonic: {limits}")
+    return edges * sign, sign
+
+
+class ThresholdEngine:
+    """Compiled thresholds for a fixed channel order"""
+
+    def __init__(self, channels, tables=None, channel_map=None):
+        tables = ALL_THRESHOLDS if tables is None else tables
+        channel_map = CHANNEL_THRESHOLDS if channel_map is None else channel_map
+
+        self.channels = list(channels)
+        self.channel_index = {name: i for i, name in enumerate(self.channels)}
+        self.limits = {}
+
+        edges = np.empty((len(self.channels), len(THRESHOLD_KEYS)))
+        signs = np.empty(len(self.channels))
+        for i, channel in enumerate(self.channels):
+            limits = tables[channel_map.get(channel, channel)]
+            edges[i], signs[i] = compile_threshold(limits)
+            self.limits[channel] = dict(limits)
+
+        self.edges = edges  # (channels, 4) ascending in the signed domain
+        self.signs = signs  # (channels,) +1 or -1 for inverted tables
+
+    def classify(self, values):
+        """Level codes (int8) for a (helmets, channels) matrix in one pass"""
+        values = np.asarray(values, dtype=np.float64)
+        signed = values * self.signs
+        levels = (signed[..., None] > self.edges).sum(axis=-1, dtype=np.int8)
+        levels[(values == 0) | np.isnan(values)] = OFFLINE
+        return levels
+
+    def level_delta(self, levels, previous):
+        """Rows whose level changed on any channel since `previous`
+
+        Every row when there is no previous classification of the same shape.
+        """
+        levels = np.asarray(levels)
+        if previous is None or np.shape(previous) != levels.shape:
+            return np.arange(len(levels))
+        return np.flatnonzero((levels != previous).any(axis=1))
+
+    def trigger_level(self, channel, value):
+        """Level at which `value` is crossed, for a value that is one of the
+        channel's threshold limits (e.g. critical methane -> CRITICAL)"""
+        i = self.channel_index[channel]
+        matches = np.flatnonzero(self.edges[i] == value * self.signs[i])
+        if not len(matches):
+            raise ValueError(
+                f"{channel} trigger {value} is not one of its thresholds "
+                f"{self.limits[channel]}"
+            )
+        return CAUTION + int(matches[0])
+
+    def classify_reading(self, reading):
+        """{channel: level} for one reading dict (missing channels are OFFLINE)"""
+        row = [reading.get(channel, 0) for channel in self.channels]
+        levels = self.classify(np.array([row], dtype=np.float64))[0]
+        return dict(zip(self.channels, levels.tolist()))
+
+    def classify_value(self, channel, value):
+        """Level of a single value, for one-off checks outside the tick"""
+        if not value or value != value:
+            return OFFLINE
+        i = self.channel_index[channel]
+        return int((value * self.signs[i] > self.edges[i]).sum())
+
+    def worst(self, levels):
+        """Worst level per helmet row"""
+        return np.asarray(levels).max(axis=-1)
+
+    def describe(self, channel, unit=""):
+        """Short 'Safe: <500ppm' style hint for a channel's safe band"""
+        i = self.channel_index[channel]
+        symbol = "<" if self.signs[i] > 0 else ">"
+        return f"Safe: {symbol}{self.limits[channel]['safe']}{unit}"
+
+
+def level_name(level):
+    return LEVEL_NAMES[int(level)]
+
+
+def level_color(level):
+    return LEVEL_COLORS[int(level)]
@@ -9,6 +9,8 @@ import random
 from machine import Pin, ADC
 import dht
 
+from telemetry_codec import encode_frame  # copy telemetry_codec.py next to main.py
+
 # WiFi Configuration (Wokwi default)
 WIFI_SSID = "Wokwi-GUEST"
 WIFI_PASSWORD = ""
@@ -45,6 +47,13 @@ h2s_adc.atten(ADC.ATTN_11DB)
 # Helmet identifier
 HELMET_ID = "HELMET_001"
 
+# Payload format: "json" (verbose, human readable) or "binary" (22-byte frames
+# from telemetry_codec, for bandwidth-starved LoRa/ZigBee links)
+PAYLOAD_FORMAT = "json"
+
+# MicroPython ports count time from 2000-01-01; shift to the Unix epoch
+EPOCH_OFFSET = 946684800 if time.gmtime(0)[0] == 2000 else 0
+
 
 def connect_wifi():
     """Connect to WiFi network"""
@@ -138,31 +147,44 @@ def create_sensor_data():
         "h2s": gas_data["h2s"],
         "temp": round(temp, 1),
         "humidity": round(humidity, 1),
-        "timestamp": time.time(),
+        "timestamp": time.time() + EPOCH_OFFSET,
     }
 
     return sensor_data
 
 
+def encode_payload(data):
+    """Serialize sensor data in the configured PAYLOAD_FORMAT"""
+    if PAYLOAD_FORMAT == "binary":
+        try:
+            return encode_frame(data["helmet_id"], data, data["timestamp"])
+        except ValueError as e:
+            print(f"Binary encoding failed, falling back to JSON: {e}")
+    return ujson.dumps(data)
+
+
 def send_data_http(data):
     """Send sensor data via HTTP POST (alternative to MQTT for Wokwi)"""
     try:
-        # Convert data to JSON
-        json_data = ujson.dumps(data)
+        # Convert data to JSON or a binary telemetry frame
+        payload = encode_payload(data)
 
         # Send HTTP POST (you'll need to set up an endpoint)
         # For testing, you can use webhook.site or RequestBin
 
         # Example using a webhook service
-        headers = {"Content-Type": "application/json"}
+        if isinstance(payload, bytes):
+            headers = {"Content-Type": "application/octet-stream"}
+        else:
+            headers = {"Content-Type": "application/json"}
 
         # Uncomment and modify URL for your endpoint
-        # response = urequests.post(HTTP_ENDPOINT, data=json_data, headers=headers)
+        # response = urequests.post(HTTP_ENDPOINT, data=payload, headers=headers)
         # print(f"HTTP Response: {response.status_code}")
         # response.close()
 
         # For now, just print the data
-        print("Sensor Data:", json_data)
+        print("Sensor Data:", payload)
 
         return True
 
@@ -33,6 +33,13 @@ const int HUMIDITY_PIN = A5; // Humidity sensor pin
 
 // Helmet ID (change for different helmets)
 const char* helmet_id = "HELMET_001";
+const uint16_t helmet_number = 1;  // numeric part of helmet_id for binary frames
+
+// Payload format: false = JSON, true = 22-byte binary frame (see telemetry_codec.py)
+const bool USE_BINARY_PAYLOAD = false;
+const uint8_t FRAME_MAGIC = 0xCB;
+const uint8_t FRAME_VERSION = 1;
+const size_t FRAME_SIZE = 22;
 
 WiFiClient espClient;
 PubSubClient client(espClient);
@@ -126,6 +133,38 @@ void mqttCallback(char* topic, byte* payload, unsigned int length) {
   Serial.println();
 }
 
+int16_t scaleReading(float value, float scale) {
+  long scaled = lround(value * scale);
+  if (scaled > 32767) return 32767;
+  if (scaled < -32768) return -32768;
+  return (int16_t)scaled;
+}
+
+void putLE16(uint8_t* buf, size_t offset, uint16_t value) {
+  buf[offset] = value & 0xFF;
+  buf[offset + 1] = (value >> 8) & 0xFF;
+}
+
+// Pack readings into a version 1 telemetry frame (little-endian).
+// time_s = 0 tells the dashboard to stamp the reading on arrival, since
+// millis() is an uptime counter rather than wall clock time.
+size_t packSensorFrame(uint8_t* buf, float co2, float ch4, float o2,
+                       float h2s, float temp, float humidity) {
+  buf[0] = FRAME_MAGIC;
+  buf[1] = FRAME_VERSION;
+  putLE16(buf, 2, helmet_number);
+  putLE16(buf, 4, 0);  // time_s low word
+  putLE16(buf, 6, 0);  // time_s high word
+  putLE16(buf, 8, 0);  // time_ms
+  putLE16(buf, 10, (uint16_t)scaleReading(co2, 10));
+  putLE16(buf, 12, (uint16_t)scaleReading(ch4, 1000));
+  putLE16(buf, 14, (uint16_t)scaleReading(o2, 100));
+  putLE16(buf, 16, (uint16_t)scaleReading(h2s, 100));
+  putLE16(buf, 18, (uint16_t)scaleReading(temp, 100));
+  putLE16(buf, 20, (uint16_t)scaleReading(humidity, 100));
+  return FRAME_SIZE;
+}
+
 void readAndSendSensorData() {
   // Read analog values and convert to sensor readings
   // These conversions are simplified - adjust based on your actual sensors
@@ -137,6 +176,17 @@ void readAndSendSensorData() {
   float temp = map(analogRead(TEMP_PIN), 0, 4095, 20, 40) + (random(-10, 10) / 10.0);
   float humidity = map(analogRead(HUMIDITY_PIN), 0, 4095, 40, 90) + random(-5, 5);
   
+  if (USE_BINARY_PAYLOAD) {
+    uint8_t frame[FRAME_SIZE];
+    size_t length = packSensorFrame(frame, co2, ch4, o2, h2s, temp, humidity);
+    if (client.publish(mqtt_topic, frame, length)) {
+      Serial.println("Binary sensor frame sent");
+    } else {
+      Serial.println("Failed to send sensor data");
+    }
+    return;
+  }
+  
   // Create JSON payload
   DynamicJsonDocument doc(1024);
   doc["helmet_id"] = helmet_id;